@@ -1,129 +1,656 @@
-from flask import Flask, render_template, request, redirect, url_for, session
-import os, random, spacy, PyPDF2
-from docx import Document
+from flask import Flask, render_template, request, redirect, url_for, session, jsonify, abort, g, Response
+import dataclasses
+import io
+import itertools
+import json
+import logging
+import os
+import random
+import secrets
+import shutil
+import tempfile
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+from batch import ArchiveTooLarge, default_params, extract_archive, is_archive, iter_batch
+from cache import AnalysisCache, content_key
+from grading import grade_quiz_batch, grade_puzzles_batch, mark_quiz, mark_puzzles
+from instrumentation import (
+    registry, begin_request, end_request, timed, annotate, report, RequestProfiler, configure_logging,
+)
+from jobs import JobQueue, QueueFull, StageTimer, DONE, FAILED
+from limits import ResourceLimits
+from nlp_models import preload
+from question_bank import QuestionBank, analyze_blocks, create_bank_store
+from quiz_store import create_store, new_quiz_id
+from rendering import (
+    PageCache, compile_quiz_page, compile_puzzle_page, compile_quiz_result, compile_puzzle_result, fill_result,
+)
+from rooms import RoomRegistry
+from text_utils import (
+    sniff_format, SNIFF_BYTES, derive_seed, generate_from_seed, stream_from_seed, pack_question, unpack_question,
+    iter_text_from_stream, bank_from_analysis, analyze_bounded,
+    MAX_DOCX_MB, MAX_DOCX_PARAGRAPHS, EXTRACT_TIME_BUDGET,
+)
 
-app = Flask(__name__)
+# Templates and static assets live at the repository root, next to backend/.
+app = Flask(__name__, template_folder="../templates", static_folder="../static")
 app.secret_key = os.environ.get("FLASK_SECRET_KEY", "default_key_for_dev")  # Use env variable for security
 UPLOAD_FOLDER = "uploads"
 os.makedirs(UPLOAD_FOLDER, exist_ok=True)
 
-nlp = spacy.load("en_core_web_sm")
+# Requests larger than this are rejected with 413 before the body is read;
+# Werkzeug spools accepted uploads above 500 KB to a temporary file.
+app.config["MAX_CONTENT_LENGTH"] = int(os.environ.get("QUIZSPARK_MAX_UPLOAD_MB", "25")) * 1024 * 1024
+# PDF pages beyond this limit are ignored.
+MAX_UPLOAD_PAGES = int(os.environ.get("QUIZSPARK_MAX_UPLOAD_PAGES", "500"))
+logger = logging.getLogger(__name__)
+
+# QUIZSPARK_LOG_JSON=1 switches to one JSON object per log line.
+if os.environ.get("QUIZSPARK_LOG_JSON") == "1":
+    configure_logging(json_format=True)
+
+# With QUIZSPARK_PROFILING=1, adding ?profile=1 to a request runs it under
+# cProfile; stats are logged and dumped to QUIZSPARK_PROFILE_DIR if set.
+PROFILING_ENABLED = os.environ.get("QUIZSPARK_PROFILING") == "1"
+PROFILE_DIR = os.environ.get("QUIZSPARK_PROFILE_DIR")
+
+# The spaCy model loads on first use; preload it here when the app is imported
+# in a parent process that forks workers (e.g. gunicorn --preload).
+if os.environ.get("QUIZSPARK_PRELOAD_MODEL") == "1":
+    preload()
+
+# Repeat uploads of the same file skip extraction and parsing.
+# Set QUIZSPARK_DISK_CACHE=1 to also keep analyses under uploads/cache.
+analysis_cache = AnalysisCache(
+    max_entries=int(os.environ.get("QUIZSPARK_CACHE_SIZE", "128")),
+    disk_dir=os.path.join(UPLOAD_FOLDER, "cache") if os.environ.get("QUIZSPARK_DISK_CACHE") == "1" else None,
+)
+
+# Analyses of single pages/paragraphs, so re-uploading an edited document
+# only re-analyses the blocks that changed.
+block_cache = AnalysisCache(
+    max_entries=int(os.environ.get("QUIZSPARK_BLOCK_CACHE_SIZE", "4096")),
+    disk_dir=os.path.join(UPLOAD_FOLDER, "cache", "blocks") if os.environ.get("QUIZSPARK_DISK_CACHE") == "1" else None,
+)
+
+# Documents longer than this many characters skip the block cache and are
+# analysed within per-document resource limits (see analyze_bounded and
+# QUIZSPARK_MAX_DOC_TOKENS / QUIZSPARK_MAX_DOC_MEMORY_MB).
+BOUNDED_MIN_CHARS = int(os.environ.get("QUIZSPARK_BOUNDED_MIN_CHARS", "2000000"))
+
+# Settings that change what an upload's analysis holds. They are part of its
+# cache key, so an analysis made under other limits is never served.
+ANALYSIS_LIMITS = {
+    "max_pages": MAX_UPLOAD_PAGES,
+    "max_docx_mb": MAX_DOCX_MB,
+    "max_docx_paragraphs": MAX_DOCX_PARAGRAPHS,
+    "extract_budget": EXTRACT_TIME_BUDGET,
+    "bounded_min_chars": BOUNDED_MIN_CHARS,
+    **dataclasses.asdict(ResourceLimits()),
+}
+
+# Uploads larger than this that are not cached yet get their first quiz from
+# the opening pages (see text_utils.stream_from_seed), so it is ready in time
+# that depends on where the material is rather than on document size; the
+# full analysis and the question bank follow in a second job.
+STREAM_MIN_BYTES = int(os.environ.get("QUIZSPARK_STREAM_MIN_KB", "1024")) * 1024
+
+# Uploads are processed in the background; QUIZSPARK_JOB_EXECUTOR may be
+# "thread" (the default, though asgi.py defaults to "process") or "process".
+# Beyond QUIZSPARK_MAX_PENDING_JOBS waiting jobs, or QUIZSPARK_MAX_PENDING_MB
+# of uploads held by unfinished jobs, uploads are turned away with 503
+# instead of queueing without bound.
+upload_jobs = JobQueue(
+    max_workers=int(os.environ.get("QUIZSPARK_JOB_WORKERS", "2")),
+    executor=os.environ.get("QUIZSPARK_JOB_EXECUTOR", "thread"),
+    max_pending=int(os.environ.get("QUIZSPARK_MAX_PENDING_JOBS", "32")),
+    max_pending_bytes=int(os.environ.get("QUIZSPARK_MAX_PENDING_MB", "128")) * 1024 * 1024,
+)
+# Seconds a client is asked to wait before retrying a rejected upload.
+RETRY_AFTER = 5
+
+# /batch requests share one process pool; beyond QUIZSPARK_MAX_BATCHES
+# archives in progress, further requests are turned away with 503.
+batch_pool = ProcessPoolExecutor(max_workers=int(os.environ.get("QUIZSPARK_BATCH_WORKERS", "0")) or None)
+batch_slots = threading.BoundedSemaphore(int(os.environ.get("QUIZSPARK_MAX_BATCHES", "2")))
+
+# Generated quizzes are kept server-side; the session cookie holds only the
+# quiz ID. QUIZSPARK_QUIZ_STORE may be "memory" or "sqlite:///path/to/file.db".
+QUIZ_STORE_URL = os.environ.get("QUIZSPARK_QUIZ_STORE", "memory")
+quiz_store = create_store(QUIZ_STORE_URL, ttl=int(os.environ.get("QUIZSPARK_QUIZ_TTL", str(6 * 60 * 60))))
+
+# Classroom rooms share one stored quiz between many participants. Rooms are
+# kept in this process, so run a single (threaded) worker when using them.
+rooms = RoomRegistry(ttl=quiz_store.ttl)
+# How many rooms one session keeps owning; see create_room().
+MAX_OWNED_ROOMS = 20
+
+# Every question and puzzle of each uploaded document, so a fresh quiz can be
+# drawn without uploading or parsing again. Banks use the quiz store's backend
+# but a store of their own (at most QUIZSPARK_BANK_CACHE_SIZE banks in memory).
+question_banks = create_bank_store(
+    QUIZ_STORE_URL, ttl=quiz_store.ttl, max_entries=int(os.environ.get("QUIZSPARK_BANK_CACHE_SIZE", "256")),
+)
+NEW_QUIZ_QUESTIONS = 5
+NEW_QUIZ_PUZZLES = 5
+
+# Quiz, puzzle and result pages are rendered once per quiz, the first time
+# each is requested, so quizzes nobody submits never render a result page;
+# later requests only fill in answers and marks (see rendering.py).
+page_cache = PageCache(max_entries=int(os.environ.get("QUIZSPARK_PAGE_CACHE_SIZE", "512")))
+PAGE_COMPILERS = {
+    "quiz": lambda record, room: compile_quiz_page(record["quiz"], room),
+    "puzzle": lambda record, room: compile_puzzle_page(record["puzzles"]),
+    "quiz_result": lambda record, room: compile_quiz_result(record["quiz"]),
+    "puzzle_result": lambda record, room: compile_puzzle_result(record["puzzles"]),
+}
 
 # ---------- UTILITIES ----------
-def extract_text(path):
-    ext = path.split(".")[-1].lower()
-    if ext == "pdf":
-        text = ""
-        with open(path, "rb") as f:
-            reader = PyPDF2.PdfReader(f)
-            for page in reader.pages:
-                text += page.extract_text() or ""
-        return text
-    elif ext == "docx":
-        doc = Document(path)
-        return "\n".join(p.text for p in doc.paragraphs)
-    else:
-        return open(path, encoding="utf-8", errors="ignore").read()
-
-def generate_quiz(text):
-    doc = nlp(text)
-    quiz = []
-    sentences = [s.text for s in doc.sents if len(s.text) > 30]
-    for s in sentences[:5]:
-        nouns = [t.text for t in nlp(s) if t.pos_ in ["NOUN", "PROPN"]]
-        if not nouns:
-            continue
-        ans = random.choice(nouns)
-        q = s.replace(ans, "_____")
-        options = list(set(random.sample(nouns, min(3, len(nouns))) + [ans]))
-        random.shuffle(options)
-        quiz.append({"question": q, "choices": options, "answer": ans})
-    return quiz
-
-def generate_puzzles(text):
-    words = [w.text.lower() for w in nlp(text) if w.is_alpha and len(w.text) > 5]
-    unique = list(set(words))
-    random.shuffle(unique)
-    puzzles = []
-    for w in unique[:5]:
-        j = "".join(random.sample(w, len(w)))
-        puzzles.append({"puzzle": f"Unscramble this word: {j}", "answer": w})
-    return puzzles
+# Text extraction and generation live in text_utils; process_upload() parses
+# once and shares the analysis between the quiz and puzzle generators.
+def process_upload(data, ext, cache_key, salt="", build_bank=True):
+    """
+    Background job: sample the quiz and puzzles for an uploaded file, from
+    its cached analysis or after analysing it (see _analyze_upload).
+    Sampling is seeded from the document hash and salt, so the result can
+    be regenerated from them. Large uncached uploads instead get a first
+    quiz streamed from their opening pages, under a seed of its own, and
+    are flagged for index_upload(), which _after_upload() queues once this
+    job finishes; its quiz then replaces the streamed one unless that has
+    already been opened. With build_bank, the result also carries the
+    document's question bank, which _after_upload() moves to the bank store.
+    Returns the result together with per-stage timings.
+    """
+    timer = StageTimer()
+    seed = derive_seed(cache_key, salt)
+    analysis = analysis_cache.get(cache_key)
+    if analysis is None and len(data) > STREAM_MIN_BYTES:
+        with timer.stage("stream"):
+            result = stream_from_seed(
+                lambda: iter_text_from_stream(io.BytesIO(data), "upload" + ext, max_pages=MAX_UPLOAD_PAGES),
+                derive_seed(cache_key, f"{salt}:stream"),
+            )
+        result["doc_key"] = cache_key
+        result["index_seed"] = seed
+        return result, timer.timings
+    if analysis is None:
+        analysis = _analyze_upload(data, ext, cache_key, timer)
+    with timer.stage("generate"):
+        result = generate_from_seed(analysis, seed)
+    result["doc_key"] = cache_key
+    if build_bank:
+        result["bank"] = _build_bank(analysis, seed, timer)
+    return result, timer.timings
+
+def index_upload(data, ext, cache_key, seed, build_bank=True):
+    """
+    Background job following a streamed first quiz: analyse the whole
+    upload into the analysis cache, then generate the quiz a cached upload
+    with the same seed gets and build the question bank.
+    """
+    timer = StageTimer()
+    analysis = analysis_cache.get(cache_key) or _analyze_upload(data, ext, cache_key, timer)
+    with timer.stage("generate"):
+        result = generate_from_seed(analysis, seed)
+    result["doc_key"] = cache_key
+    if build_bank:
+        result["bank"] = _build_bank(analysis, seed, timer)
+    return result, timer.timings
+
+def _analyze_upload(data, ext, cache_key, timer):
+    # The upload is read from memory and never written to disk, and analysed
+    # page by page (or paragraph by paragraph) so unchanged blocks of an
+    # edited document come from the block cache; very long documents are
+    # instead analysed within resource limits, from a sample of their
+    # sentences. Only the first BOUNDED_MIN_CHARS characters are held to
+    # choose between the two; past that, the rest of the document is
+    # extracted as analyze_bounded reads it (and timed as "analyze").
+    blocks = iter_text_from_stream(io.BytesIO(data), "upload" + ext, max_pages=MAX_UPLOAD_PAGES)
+    with timer.stage("extract"):
+        head, chars = [], 0
+        for block in blocks:
+            head.append(block)
+            chars += len(block)
+            if chars > BOUNDED_MIN_CHARS:
+                break
+    with timer.stage("analyze"):
+        if chars > BOUNDED_MIN_CHARS:
+            analysis, _ = analyze_bounded(itertools.chain(head, blocks), rng=random.Random(f"{cache_key}:sample"))
+        else:
+            analysis, analysed = analyze_blocks(head, block_cache)
+            annotate("blocks_analysed", analysed)
+    analysis_cache.put(cache_key, analysis)
+    return analysis
+
+def _build_bank(analysis, seed, timer):
+    with timer.stage("bank"):
+        questions, puzzles = bank_from_analysis(analysis, rng=random.Random(f"{seed}:bank"))
+    return QuestionBank(questions, puzzles)
+
+def _after_upload(result, reindex=None):
+    # Runs in this process when an upload job finishes, whichever executor
+    # ran it, so the bank lands in this process's store and the job keeps
+    # only the quiz. A bank stored meanwhile keeps its draw state. reindex
+    # queues index_upload() for a streamed quiz; only uploads large enough
+    # to be streamed get one, so smaller ones keep no reference to their
+    # bytes.
+    bank = result.pop("bank", None)
+    if bank is not None and not question_banks.has(result["doc_key"]):
+        question_banks.put(result["doc_key"], bank)
+    seed = result.pop("index_seed", None)
+    if seed is not None and reindex is not None:
+        reindex(result, seed)
+    return result
+
+def _on_upload_done(data, ext):
+    # The on_done callback of an upload job; see _after_upload().
+    if len(data) <= STREAM_MIN_BYTES:
+        return _after_upload
+    return lambda result: _after_upload(result, lambda streamed, seed: _queue_index(streamed, seed, data, ext))
+
+def _queue_index(streamed, seed, data, ext):
+    try:
+        upload_jobs.submit(index_upload, data, ext, streamed["doc_key"], seed,
+                           not question_banks.has(streamed["doc_key"]), size=len(data),
+                           on_done=lambda indexed: _after_index(indexed, streamed))
+    except QueueFull:
+        # The quiz is ready; the next upload of this document indexes it.
+        logger.warning("Queue full; not indexing document %s", streamed["doc_key"])
+
+def _after_index(indexed, streamed):
+    # streamed is the upload job's own result, so updating it gives anyone
+    # opening the quiz from now on the one generate_from_seed() gives, as a
+    # cached upload of the document would. A quiz opened before this point
+    # was stored as streamed and keeps its questions.
+    _after_upload(indexed)
+    streamed.update({key: indexed.pop(key) for key in ("quiz", "puzzles", "seed")}, streamed=False)
+    return indexed
+
+def _render(template, **context):
+    with timed("render"):
+        return render_template(template, **context)
+
+def _store_quiz(quiz_id, record):
+    # Questions are stored as [sentence, blanks, choices]; see pack_question().
+    quiz_store.set(quiz_id, {**record, "quiz": [pack_question(unpack_question(q)) for q in record["quiz"]]})
+
+def _load_quiz(quiz_id):
+    record = quiz_store.get(quiz_id)
+    if record is not None:
+        record["quiz"] = [unpack_question(q) for q in record["quiz"]]
+    return record
+
+def _page(quiz_id, name, room=None, record=None):
+    """
+    Compiled page for a quiz, from the page cache or rendered now.
+    """
+    def compile_page():
+        return PAGE_COMPILERS[name](record or _load_quiz(quiz_id) or {"quiz": [], "puzzles": []}, room)
+    if quiz_id is None:
+        return compile_page()
+    return page_cache.get_or_compile((quiz_id, name, room), compile_page)
+
+def _cached_page(quiz_id, name, room=None, record=None):
+    """
+    Serve a page without answer slots, with an ETag so browsers can
+    revalidate it with a conditional GET (304 Not Modified).
+    """
+    page = _page(quiz_id, name, room, record)
+    response = app.make_response(page.fill())
+    response.set_etag(page.etag)
+    response.headers["Cache-Control"] = "private, no-cache"
+    # /puzzle depends on the quiz in the session cookie.
+    response.vary.add("Cookie")
+    return response.make_conditional(request)
+
+def _participant_id():
+    if "participant" not in session:
+        session["participant"] = secrets.token_hex(8)
+    return session["participant"]
+
+def _wants_json():
+    return request.args.get("format") == "json" or request.accept_mimetypes.best == "application/json"
 
 # ---------- REDUCED DUPLICATION ----------
-def grade_quiz(quiz, user_answers):
-    results = []
-    score = 0
-    for i, q in enumerate(quiz):
-        user = user_answers.get(f"q{i}")
-        correct = q["answer"]
-        is_correct = user == correct
-        if is_correct:
-            score += 1
-        results.append({
-            "question": q["question"],
-            "user": user,
-            "correct": correct,
-            "status": "✅" if is_correct else "❌"
-        })
-    return results, score
-
-def grade_puzzles(puzzles, user_answers):
-    results = []
-    correct_count = 0
-    for i, p in enumerate(puzzles):
-        user = user_answers.get(f"p{i}", "").strip().lower()
-        ans = p["answer"].lower()
-        is_correct = user == ans
-        if is_correct:
-            correct_count += 1
-        results.append({
-            "puzzle": p["puzzle"],
-            "user": user,
-            "answer": ans,
-            "is_correct": is_correct
-        })
-    return results, correct_count
+# Grading lives in grading.py alongside the batch graders; result pages are
+# pre-rendered per quiz in rendering.py.
+
+# ---------- INSTRUMENTATION ----------
+@app.before_request
+def _start_request_timing():
+    begin_request()
+    g.request_start = time.perf_counter()
+    g.profiler = None
+    if PROFILING_ENABLED and request.args.get("profile") == "1":
+        g.profiler = RequestProfiler(request.endpoint or "unknown", PROFILE_DIR)
+        g.profiler.start()
+
+@app.after_request
+def _finish_request_timing(response):
+    if g.get("profiler") is not None:
+        g.profiler.stop()
+    record = end_request()
+    if record is None:
+        return response
+    total = time.perf_counter() - g.request_start
+    registry.observe(f"route.{request.endpoint}", total)
+    response.headers["Server-Timing"] = record.server_timing(total)
+    logger.info(
+        "request %s %s %s %.1fms", request.method, request.path, response.status_code, total * 1000,
+        extra={"endpoint": request.endpoint, "status": response.status_code, "duration": total,
+               "stages": record.stages, **record.attrs},
+    )
+    return response
 
 # ---------- ROUTES ----------
 @app.route("/")
 def index():
-    return render_template("index.html")
+    return _render("index.html")
 
 @app.route("/upload", methods=["POST"])
 def upload():
-    file = request.files["file"]
-    path = os.path.join(UPLOAD_FOLDER, file.filename)
-    file.save(path)
-    text = extract_text(path)
-    quiz = generate_quiz(text)
-    puzzles = generate_puzzles(text)
-    session["quiz"] = quiz
-    session["puzzles"] = puzzles
-    return render_template("quiz.html", quiz=quiz)
+    file = request.files.get("file")
+    ext = sniff_format(file.stream.read(SNIFF_BYTES), file.filename) if file else None
+    if ext is None:
+        message = "Please upload a .txt, .pdf or .docx file whose contents match its extension."
+        if _wants_json():
+            return jsonify({"error": message}), 415
+        return _render("index.html", error=message), 415
+    file.stream.seek(0)
+    data = file.read()
+    annotate("upload_bytes", len(data))
+    # A user-supplied salt makes the quiz reproducible across uploads; without
+    # one a random salt still yields a recorded, regenerable seed.
+    salt = request.form.get("salt") or secrets.token_hex(8)
+    try:
+        doc_key = content_key(data, ext=ext, **ANALYSIS_LIMITS)
+        job_id = upload_jobs.submit(process_upload, data, ext, doc_key, salt, not question_banks.has(doc_key),
+                                    size=len(data), on_done=_on_upload_done(data, ext))
+    except QueueFull:
+        message = "QuizSpark is busy right now; please try again in a few seconds."
+        if _wants_json():
+            response = jsonify({"error": message})
+        else:
+            response = app.make_response(_render("index.html", error=message))
+        response.status_code = 503
+        response.headers["Retry-After"] = str(RETRY_AFTER)
+        return response
+    if _wants_json():
+        return jsonify({"job_id": job_id, "status_url": url_for("job_status", job_id=job_id)}), 202
+    return redirect(url_for("quiz_page", job_id=job_id))
+
+@app.errorhandler(413)
+def upload_too_large(e):
+    message = f"File is too large; the limit is {app.config['MAX_CONTENT_LENGTH'] // (1024 * 1024)} MB."
+    if _wants_json():
+        return jsonify({"error": message}), 413
+    return _render("index.html", error=message), 413
+
+@app.route("/jobs/<job_id>")
+def job_status(job_id):
+    job = upload_jobs.get(job_id)
+    if job is None:
+        abort(404)
+    _report_job(job)
+    return jsonify(job.to_dict())
+
+def _report_job(job):
+    # Upload work runs outside the request, so its stages reach this
+    # request's Server-Timing header and log line as job.* entries.
+    if job.status == DONE:
+        report({**job.timings, **job.stages}, job.attrs, prefix="job.")
+
+@app.route("/jobs/stats")
+def job_stats():
+    return jsonify(upload_jobs.stats())
+
+@app.route("/quiz/<job_id>")
+def quiz_page(job_id):
+    # The job ID doubles as the quiz ID, so reloading this page reuses the
+    # stored quiz and its rendered pages, even after the job itself has
+    # been pruned from the queue.
+    record = None
+    if quiz_store.get(job_id) is None:
+        job = upload_jobs.get(job_id)
+        if job is None:
+            abort(404)
+        if job.status == FAILED:
+            return _render("processing.html", job=job.to_dict()), 500
+        if job.status != DONE:
+            return _render("processing.html", job=job.to_dict())
+        _report_job(job)
+        # A copy, as _after_index() may swap a streamed result meanwhile.
+        record = dict(job.result)
+        _store_quiz(job_id, record)
+    session["quiz_id"] = job_id
+    session.pop("room", None)
+    return _cached_page(job_id, "quiz", record=record)
+
+@app.route("/quiz/<quiz_id>/snapshot")
+def quiz_snapshot(quiz_id):
+    """
+    The document key and seed that regenerate this quiz via generate_from_seed(),
+    or via stream_from_seed() when it was streamed. A streamed quiz has a
+    seed of its own, which a later upload of the document does not reuse.
+    """
+    record = quiz_store.get(quiz_id)
+    if record is None:
+        abort(404)
+    return jsonify({"doc_key": record.get("doc_key"), "seed": record.get("seed"),
+                    "streamed": record.get("streamed", False)})
+
+@app.route("/new_quiz", methods=["POST"])
+def new_quiz():
+    """
+    Draw a fresh quiz for the document behind the current quiz from its
+    question bank, without uploading or parsing it again.
+    """
+    record = quiz_store.get(session.get("quiz_id"))
+    doc_key = record.get("doc_key") if record else None
+    drawn = question_banks.draw(doc_key, NEW_QUIZ_QUESTIONS, NEW_QUIZ_PUZZLES)
+    if drawn is None:
+        if _wants_json():
+            return jsonify({"error": "no question bank for this quiz"}), 404
+        return redirect(url_for("index"))
+    drawn["doc_key"] = doc_key
+    quiz_id = new_quiz_id()
+    _store_quiz(quiz_id, drawn)
+    session["quiz_id"] = quiz_id
+    session.pop("room", None)
+    if _wants_json():
+        return jsonify({"quiz_id": quiz_id, **drawn})
+    return _cached_page(quiz_id, "quiz", record=drawn)
 
 @app.route("/submit", methods=["POST"])
 def submit():
-    quiz = session.get("quiz", [])
-    user_answers = request.form
-    results, score = grade_quiz(quiz, user_answers)
-    return render_template("quiz_result.html", results=results, score=score, total=len(quiz))
+    page = _page(session.get("quiz_id"), "quiz_result")
+    users, flags = mark_quiz(page.data, request.form)
+    room = rooms.get(session.get("room"))
+    if room is not None and room.quiz_id == session.get("quiz_id"):
+        room.record_quiz(_participant_id(), flags)
+    return fill_result(page, users, flags)
 
 @app.route("/puzzle")
 def puzzle():
-    puzzles = session.get("puzzles", [])
-    return render_template("puzzle.html", puzzles=puzzles)
+    return _cached_page(session.get("quiz_id"), "puzzle")
 
 @app.route("/check_puzzles", methods=["POST"])
 def check_puzzles():
-    puzzles = session.get("puzzles", [])
-    user_answers = request.form
-    results, correct_count = grade_puzzles(puzzles, user_answers)
-    return render_template("puzzle_result.html", results=results, correct=correct_count, total=len(puzzles))
+    page = _page(session.get("quiz_id"), "puzzle_result")
+    users, flags = mark_puzzles(page.data, request.form)
+    room = rooms.get(session.get("room"))
+    if room is not None and room.quiz_id == session.get("quiz_id"):
+        room.record_puzzles(_participant_id(), flags)
+    return fill_result(page, users, flags, marks=("✅ Correct", "❌ Incorrect"))
+
+@app.route("/rooms", methods=["POST"])
+def create_room():
+    """
+    Open a classroom room for the quiz in the caller's session (or the
+    quiz_id form field), so a whole class can take the same quiz.
+    """
+    quiz_id = request.form.get("quiz_id") or session.get("quiz_id")
+    record = _load_quiz(quiz_id)
+    if record is None:
+        if _wants_json():
+            return jsonify({"error": "no quiz to share"}), 400
+        return redirect(url_for("index"))
+    # Re-storing refreshes the quiz TTL so it lives as long as the room.
+    _store_quiz(quiz_id, record)
+    room = rooms.create(quiz_id, len(record["quiz"]), len(record["puzzles"]))
+    # The session remembers the rooms it opened, so their owner can submit
+    # from the browser; API clients use the owner token instead.
+    session["owned_rooms"] = (session.get("owned_rooms", []) + [room.code])[-MAX_OWNED_ROOMS:]
+    if _wants_json():
+        return jsonify({
+            "code": room.code,
+            "join_url": url_for("join_room", code=room.code, _external=True),
+            "results_url": url_for("room_results", code=room.code),
+            "owner_token": room.owner_token,
+        }), 201
+    return redirect(url_for("room_page", code=room.code))
+
+@app.route("/rooms/<code>")
+def room_page(code):
+    room = rooms.get(code)
+    if room is None:
+        abort(404)
+    return _render("room.html", room=room.to_dict(),
+                   join_url=url_for("join_room", code=room.code, _external=True))
+
+@app.route("/rooms/<code>/results")
+def room_results(code):
+    room = rooms.get(code)
+    if room is None:
+        abort(404)
+    return jsonify(room.to_dict())
+
+@app.route("/rooms/<code>/submissions", methods=["POST"])
+def room_submissions(code):
+    """
+    Record many participants' answers at once, such as a class's answers
+    collected offline. The JSON body is a list of answer mappings
+    ({"participant": "ann", "q0": ..., "p0": ...}) or the same as columns
+    ({"participant": [...], "q0": [...], ...}). A participant's earlier
+    submission is replaced, as for /submit. Only the room's owner may do
+    this: the session that opened the room, or a request carrying its
+    owner token as "Authorization: Bearer <token>".
+    """
+    room = rooms.get(code)
+    record = _load_quiz(room.quiz_id) if room else None
+    if record is None:
+        abort(404)
+    if not _is_room_owner(room):
+        return jsonify({"error": "only the room's owner can record submissions"}), 403
+    submissions = request.get_json(silent=True)
+    if isinstance(submissions, dict):
+        participants = submissions.get("participant") or []
+    elif isinstance(submissions, list) and all(isinstance(s, dict) for s in submissions):
+        participants = [s.get("participant") for s in submissions]
+    else:
+        return jsonify({"error": "expected a JSON list of answers or answer columns"}), 400
+    try:
+        quiz = grade_quiz_batch(record["quiz"], submissions)
+        puzzles = grade_puzzles_batch(record["puzzles"], submissions)
+    except (TypeError, ValueError) as e:
+        return jsonify({"error": str(e)}), 400
+    if len(participants) != len(quiz.scores) or not all(isinstance(p, str) and p for p in participants):
+        return jsonify({"error": "every submission needs a participant"}), 400
+    room.record_many(participants, quiz.correct, puzzles.correct)
+    return jsonify({"quiz": quiz.to_dict(), "puzzles": puzzles.to_dict()})
+
+def _is_room_owner(room):
+    scheme, _, token = request.headers.get("Authorization", "").partition(" ")
+    if scheme.lower() == "bearer" and room.is_owner(token.strip()):
+        return True
+    return room.code in session.get("owned_rooms", [])
+
+@app.route("/join/<code>")
+def join_room(code):
+    room = rooms.get(code)
+    record = _load_quiz(room.quiz_id) if room else None
+    if record is None:
+        abort(404)
+    session["quiz_id"] = room.quiz_id
+    session["room"] = room.code
+    return _cached_page(room.quiz_id, "quiz", room=room.code, record=record)
+
+@app.route("/batch", methods=["POST"])
+def batch():
+    """
+    Bulk generation: upload a zip/tar archive of documents and receive
+    one JSON object per document as JSON Lines, streamed as they finish.
+    """
+    file = request.files.get("file")
+    if file is None:
+        return jsonify({"error": "missing file"}), 400
+    if not batch_slots.acquire(blocking=False):
+        response = jsonify({"error": "QuizSpark is busy with other batches; please try again shortly."})
+        response.status_code = 503
+        response.headers["Retry-After"] = str(RETRY_AFTER)
+        return response
+    scratch = tempfile.mkdtemp(prefix="quizspark-batch-")
+    released = False
+
+    def cleanup():
+        nonlocal released
+        shutil.rmtree(scratch, ignore_errors=True)
+        if not released:
+            released = True
+            batch_slots.release()
+    path = os.path.join(scratch, "upload.archive")
+    file.save(path)
+    if not is_archive(path):
+        cleanup()
+        return jsonify({"error": "expected a zip or tar archive"}), 400
+    # Unpack before streaming starts, so an oversized archive is a 413
+    # rather than a truncated response.
+    documents = os.path.join(scratch, "documents")
+    try:
+        extract_archive(path, documents)
+    except ArchiveTooLarge as e:
+        cleanup()
+        return jsonify({"error": str(e)}), 413
+    except Exception:
+        cleanup()
+        raise
+    os.remove(path)
+    params = default_params(
+        max_questions=request.args.get("max_questions", type=int),
+        max_puzzles=request.args.get("max_puzzles", type=int),
+    )
+
+    def generate():
+        try:
+            for result in iter_batch(documents, params=params, pool=batch_pool):
+                yield json.dumps(result) + "\n"
+        finally:
+            cleanup()
+
+    response = Response(generate(), mimetype="application/x-ndjson")
+    # Runs even if the client disconnects before the stream is consumed.
+    response.call_on_close(cleanup)
+    return response
+
+@app.route("/metrics")
+def metrics():
+    return jsonify({
+        "histograms": registry.to_dict(),
+        "jobs": upload_jobs.stats(),
+        "cache": analysis_cache.stats(),
+        "pages": page_cache.stats(),
+    })
+
+@app.route("/cache/stats")
+def cache_stats():
+    return jsonify(analysis_cache.stats())
 
 @app.route("/thankyou")
 def thankyou():
-    return render_template("thankyou.html")
+    return _render("thankyou.html")
 
 if __name__ == "__main__":
+    # Development server; see asgi.py for the async serving mode.
+    configure_logging()
     app.run(debug=True)
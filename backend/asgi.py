@@ -0,0 +1,216 @@
+"""
+Async serving mode for QuizSpark.
+
+    uvicorn asgi:application --app-dir backend
+
+Request bodies are read on the event loop, so slow uploads never tie up a
+thread per connection. Flask views then run on a thread pool
+(QUIZSPARK_ASGI_THREADS threads), except a few known to be cheap (job
+status, metrics, room results), which run on the loop directly. Responses
+that stream (/batch) are iterated on the same pool.
+
+Extraction and spaCy analysis run in the upload job queue, which this mode
+backs with a process pool (QUIZSPARK_JOB_WORKERS processes) unless
+QUIZSPARK_JOB_EXECUTOR says otherwise, so CPU-heavy work never holds the
+GIL the event loop needs. Each worker process has analysis and block
+caches of its own; QUIZSPARK_JOB_EXECUTOR=thread keeps them shared in this
+process, at the cost of analysis competing with the loop. Once
+QUIZSPARK_MAX_PENDING_JOBS uploads are waiting, new ones get 503 with a
+Retry-After header.
+
+A quiz page requested while its upload is still being processed waits for
+the job on the loop, for up to QUIZSPARK_ASYNC_WAIT seconds, instead of
+returning the polling page straight away.
+"""
+import asyncio
+import io
+import os
+import re
+import sys
+from concurrent.futures import ThreadPoolExecutor
+
+# Must be set before app is imported, since it creates the job queue.
+os.environ.setdefault("QUIZSPARK_JOB_EXECUTOR", "process")
+
+import app as quiz_app  # noqa: E402
+
+STREAMED_PATHS = ("/batch",)
+# Views that only read in-memory state; everything else runs on the pool.
+INLINE_PATHS = re.compile(r"^/(jobs/[^/]+|metrics|cache/stats|rooms/[^/]+/results)$")
+DEFAULT_JOB_WAIT = float(os.environ.get("QUIZSPARK_ASYNC_WAIT", "20"))
+DEFAULT_THREADS = int(os.environ.get("QUIZSPARK_ASGI_THREADS", "16"))
+QUIZ_PATH = re.compile(r"^/quiz/([0-9a-f]{32})$")
+
+
+def build_environ(scope, body):
+    """
+    WSGI environ for an ASGI HTTP scope whose body has already been read.
+    """
+    server = scope.get("server") or ("localhost", 80)
+    environ = {
+        "REQUEST_METHOD": scope["method"],
+        "SCRIPT_NAME": scope.get("root_path", "").encode("utf-8").decode("latin-1"),
+        "PATH_INFO": scope["path"].encode("utf-8").decode("latin-1"),
+        "QUERY_STRING": scope.get("query_string", b"").decode("latin-1"),
+        "SERVER_NAME": server[0],
+        "SERVER_PORT": str(server[1]),
+        "SERVER_PROTOCOL": f"HTTP/{scope.get('http_version', '1.1')}",
+        "CONTENT_LENGTH": str(len(body)),
+        "wsgi.version": (1, 0),
+        "wsgi.url_scheme": scope.get("scheme", "http"),
+        "wsgi.input": io.BytesIO(body),
+        "wsgi.errors": sys.stderr,
+        "wsgi.multithread": True,
+        "wsgi.multiprocess": True,
+        "wsgi.run_once": False,
+    }
+    if scope.get("client"):
+        environ["REMOTE_ADDR"] = scope["client"][0]
+    for raw_name, raw_value in scope.get("headers", []):
+        name = raw_name.decode("latin-1").upper().replace("-", "_")
+        if name == "CONTENT_LENGTH":
+            continue
+        key = name if name == "CONTENT_TYPE" else "HTTP_" + name
+        value = raw_value.decode("latin-1")
+        environ[key] = f"{environ[key]},{value}" if key in environ else value
+    return environ
+
+
+def _call_wsgi(wsgi_app, environ):
+    started = {}
+
+    def start_response(status, headers, exc_info=None):
+        started["status"] = int(status.split(" ", 1)[0])
+        started["headers"] = [(k.lower().encode("latin-1"), v.encode("latin-1")) for k, v in headers]
+
+    body = wsgi_app(environ, start_response)
+    return started["status"], started["headers"], body
+
+
+def _call_wsgi_buffered(wsgi_app, environ):
+    status, headers, body = _call_wsgi(wsgi_app, environ)
+    try:
+        return status, headers, b"".join(body)
+    finally:
+        _close(body)
+
+
+def _close(body):
+    if hasattr(body, "close"):
+        body.close()
+
+
+class AsyncFlask:
+    """
+    ASGI adapter for a Flask app.
+
+    Views run on a thread pool so none of them can stall the event loop;
+    paths matching inline_paths are cheap enough to run on the loop itself.
+    Responses for paths in streamed_paths are sent chunk by chunk as the
+    pool produces them. CPU-heavy work belongs in the job queue, which the
+    loop can wait on without blocking (see wait_for_job).
+    """
+
+    def __init__(self, flask_app, jobs=None, streamed_paths=STREAMED_PATHS, inline_paths=INLINE_PATHS,
+                 job_wait=DEFAULT_JOB_WAIT, threads=DEFAULT_THREADS):
+        self.flask_app = flask_app
+        self.jobs = jobs
+        self.streamed_paths = tuple(streamed_paths)
+        self.inline_paths = inline_paths
+        self.job_wait = job_wait
+        self._threads = ThreadPoolExecutor(max_workers=threads, thread_name_prefix="quizspark-asgi")
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] == "lifespan":
+            await self._lifespan(receive, send)
+        elif scope["type"] == "http":
+            await self._http(scope, receive, send)
+
+    async def _lifespan(self, receive, send):
+        while True:
+            message = await receive()
+            if message["type"] == "lifespan.startup":
+                await send({"type": "lifespan.startup.complete"})
+            elif message["type"] == "lifespan.shutdown":
+                if self.jobs is not None:
+                    self.jobs.shutdown(wait=False)
+                self._threads.shutdown(wait=False)
+                await send({"type": "lifespan.shutdown.complete"})
+                return
+
+    async def read_body(self, receive):
+        """
+        Read the request body, stopping one byte past MAX_CONTENT_LENGTH so
+        that Flask rejects oversized uploads with 413 without buffering them.
+        """
+        limit = self.flask_app.config.get("MAX_CONTENT_LENGTH")
+        chunks = []
+        size = 0
+        while True:
+            message = await receive()
+            if message["type"] == "http.disconnect":
+                return None
+            chunk = message.get("body", b"")
+            chunks.append(chunk)
+            size += len(chunk)
+            if limit is not None and size > limit:
+                break
+            if not message.get("more_body", False):
+                break
+        return b"".join(chunks)
+
+    async def wait_for_job(self, path):
+        """
+        If path is the quiz page of an unfinished upload job, wait for the
+        job (at most job_wait seconds) so the page can be rendered directly.
+        """
+        match = QUIZ_PATH.match(path)
+        if self.jobs is None or match is None:
+            return
+        future = self.jobs.future(match.group(1))
+        if future is None:
+            return
+        try:
+            await asyncio.wait_for(asyncio.shield(asyncio.wrap_future(future)), self.job_wait)
+        except Exception:
+            # Timeouts and failed jobs are reported by the quiz page itself.
+            pass
+
+    async def _http(self, scope, receive, send):
+        body = await self.read_body(receive)
+        if body is None:
+            return
+        await self.wait_for_job(scope["path"])
+        environ = build_environ(scope, body)
+        if scope["path"].startswith(self.streamed_paths):
+            await self._send_streamed(environ, send)
+            return
+        if self.inline_paths.match(scope["path"]):
+            status, headers, content = _call_wsgi_buffered(self.flask_app.wsgi_app, environ)
+        else:
+            status, headers, content = await asyncio.get_running_loop().run_in_executor(
+                self._threads, _call_wsgi_buffered, self.flask_app.wsgi_app, environ
+            )
+        await send({"type": "http.response.start", "status": status, "headers": headers})
+        await send({"type": "http.response.body", "body": content})
+
+    async def _send_streamed(self, environ, send):
+        loop = asyncio.get_running_loop()
+        status, headers, response = await loop.run_in_executor(
+            self._threads, _call_wsgi, self.flask_app.wsgi_app, environ
+        )
+        try:
+            await send({"type": "http.response.start", "status": status, "headers": headers})
+            chunks = iter(response)
+            while True:
+                chunk = await loop.run_in_executor(self._threads, next, chunks, None)
+                if chunk is None:
+                    break
+                if chunk:
+                    await send({"type": "http.response.body", "body": chunk, "more_body": True})
+            await send({"type": "http.response.body", "body": b""})
+        finally:
+            await loop.run_in_executor(self._threads, _close, response)
+
+
+application = AsyncFlask(quiz_app.app, jobs=quiz_app.upload_jobs)
@@ -0,0 +1,209 @@
+"""
+Bulk quiz generation for folders or archives of documents.
+
+    python backend/batch.py lectures/ --workers 8 --output quizzes.jsonl
+    python backend/batch.py notes.zip
+
+Files are grouped into small batches and spread over a process pool; each
+worker extracts its batch and analyses the texts in one nlp.pipe stream.
+One JSON object per document is written as soon as its batch finishes.
+"""
+import argparse
+import json
+import logging
+import os
+import sys
+import tarfile
+import tempfile
+import time
+import zipfile
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+from text_utils import analyze_texts, extract_text, quiz_from_analysis, puzzles_from_analysis
+
+SUPPORTED_EXTENSIONS = (".txt", ".pdf", ".docx")
+DEFAULT_FILES_PER_TASK = 4
+# Caps on what one archive may unpack to, counted while extracting.
+MAX_ARCHIVE_FILES = int(os.environ.get("QUIZSPARK_BATCH_MAX_FILES", "1000"))
+MAX_ARCHIVE_MB = int(os.environ.get("QUIZSPARK_BATCH_MAX_MB", "500"))
+COPY_CHUNK = 1024 * 1024
+
+logger = logging.getLogger(__name__)
+
+
+def find_documents(directory):
+    """
+    Sorted paths of supported documents under directory, recursively.
+    """
+    found = []
+    for root, _, files in os.walk(directory):
+        for name in files:
+            if os.path.splitext(name)[1].lower() in SUPPORTED_EXTENSIONS:
+                found.append(os.path.join(root, name))
+    return sorted(found)
+
+
+class ArchiveTooLarge(ValueError):
+    pass
+
+
+def is_archive(path):
+    return zipfile.is_zipfile(path) or tarfile.is_tarfile(path)
+
+
+def extract_archive(path, destination, max_files=MAX_ARCHIVE_FILES, max_bytes=MAX_ARCHIVE_MB * 1024 * 1024):
+    """
+    Unpack the supported documents in a zip or tar archive into destination,
+    skipping members that would land outside it or that are not regular
+    files. Raises ArchiveTooLarge once more than max_files documents or
+    max_bytes of uncompressed data have been written; the bytes are counted
+    as they are copied, so sizes claimed in the archive headers are not trusted.
+    """
+    root = os.path.realpath(destination)
+    files = 0
+    written = 0
+
+    def target_for(name):
+        if os.path.splitext(name)[1].lower() not in SUPPORTED_EXTENSIONS:
+            return None
+        target = os.path.realpath(os.path.join(root, name))
+        return target if target.startswith(root + os.sep) else None
+
+    def copy(source, target):
+        nonlocal files, written
+        files += 1
+        if max_files is not None and files > max_files:
+            raise ArchiveTooLarge(f"archive has more than {max_files} documents")
+        os.makedirs(os.path.dirname(target), exist_ok=True)
+        with open(target, "wb") as out:
+            while True:
+                chunk = source.read(COPY_CHUNK)
+                if not chunk:
+                    break
+                written += len(chunk)
+                if max_bytes is not None and written > max_bytes:
+                    raise ArchiveTooLarge(f"archive unpacks to more than {max_bytes // (1024 * 1024)} MB")
+                out.write(chunk)
+
+    if zipfile.is_zipfile(path):
+        with zipfile.ZipFile(path) as archive:
+            for member in archive.infolist():
+                target = None if member.is_dir() else target_for(member.filename)
+                if target is not None:
+                    with archive.open(member) as source:
+                        copy(source, target)
+    else:
+        with tarfile.open(path) as archive:
+            for member in archive:
+                target = target_for(member.name) if member.isfile() else None
+                if target is not None:
+                    with archive.extractfile(member) as source:
+                        copy(source, target)
+
+
+def process_files(paths, base_dir, params):
+    """
+    Worker task: extract a batch of files and analyse them together.
+    Returns one result dict per file.
+    """
+    start = time.perf_counter()
+    texts = [extract_text(path) for path in paths]
+    analyses = analyze_texts(texts)
+    elapsed = (time.perf_counter() - start) / max(len(paths), 1)
+    results = []
+    for path, text, analysis in zip(paths, texts, analyses):
+        result = {"file": os.path.relpath(path, base_dir), "chars": len(text), "seconds": elapsed}
+        if not text:
+            result["error"] = "no text extracted"
+        result["quiz"] = quiz_from_analysis(
+            analysis, params["sentence_length"], params["max_questions"], params["max_options"], params["min_nouns"]
+        )
+        result["puzzles"] = puzzles_from_analysis(analysis, params["min_word_length"], params["max_puzzles"])
+        results.append(result)
+    return results
+
+
+def default_params(**overrides):
+    params = {
+        "sentence_length": 30,
+        "max_questions": 5,
+        "max_options": 3,
+        "min_nouns": 1,
+        "min_word_length": 6,
+        "max_puzzles": 5,
+    }
+    params.update({k: v for k, v in overrides.items() if v is not None})
+    return params
+
+
+def iter_batch(source, workers=None, files_per_task=DEFAULT_FILES_PER_TASK, params=None, pool=None):
+    """
+    Yield a result dict per document in source (a directory or archive),
+    in completion order. Work runs on pool when given (the web app shares
+    one across requests), otherwise on a pool of workers processes owned
+    by this call.
+    """
+    params = params or default_params()
+    with tempfile.TemporaryDirectory() as scratch:
+        if os.path.isdir(source):
+            base_dir = source
+        else:
+            extract_archive(source, scratch)
+            base_dir = scratch
+        paths = find_documents(base_dir)
+        tasks = [paths[i:i + files_per_task] for i in range(0, len(paths), files_per_task)]
+        if not tasks:
+            return
+        own_pool = pool is None
+        if own_pool:
+            pool = ProcessPoolExecutor(max_workers=workers or os.cpu_count())
+        futures = {pool.submit(process_files, task, base_dir, params): task for task in tasks}
+        try:
+            for future in as_completed(futures):
+                try:
+                    yield from future.result()
+                except Exception as e:
+                    logger.warning("Batch task failed: %s", e)
+                    for path in futures[future]:
+                        yield {"file": os.path.relpath(path, base_dir), "error": str(e)}
+        finally:
+            # A consumer that stops early (a disconnected client) leaves no
+            # queued work behind on a shared pool.
+            for future in futures:
+                future.cancel()
+            if own_pool:
+                pool.shutdown()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Generate quizzes for every document in a folder or archive.")
+    parser.add_argument("source", help="directory, .zip or .tar(.gz) archive")
+    parser.add_argument("--workers", type=int, default=None, help="worker processes (default: CPU count)")
+    parser.add_argument("--files-per-task", type=int, default=DEFAULT_FILES_PER_TASK)
+    parser.add_argument("--output", help="JSON Lines output file (default: stdout)")
+    parser.add_argument("--max-questions", type=int)
+    parser.add_argument("--max-puzzles", type=int)
+    args = parser.parse_args(argv)
+
+    if not os.path.isdir(args.source) and not (os.path.isfile(args.source) and is_archive(args.source)):
+        parser.error(f"{args.source} is not a directory or a zip/tar archive")
+
+    params = default_params(max_questions=args.max_questions, max_puzzles=args.max_puzzles)
+    out = open(args.output, "w", encoding="utf-8") if args.output else sys.stdout
+    start = time.perf_counter()
+    count = 0
+    try:
+        for result in iter_batch(args.source, args.workers, args.files_per_task, params):
+            out.write(json.dumps(result) + "\n")
+            out.flush()
+            count += 1
+    finally:
+        if out is not sys.stdout:
+            out.close()
+    elapsed = time.perf_counter() - start
+    print(f"{count} documents in {elapsed:.2f}s ({count / elapsed if elapsed else 0:.2f} docs/s)", file=sys.stderr)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
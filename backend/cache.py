@@ -0,0 +1,166 @@
+import hashlib
+import json
+import logging
+import os
+import threading
+from collections import OrderedDict
+
+from text_utils import DocumentAnalysis
+
+logger = logging.getLogger(__name__)
+
+# Upper bound on the JSON files a cache keeps on disk.
+DEFAULT_MAX_DISK_BYTES = int(os.environ.get("QUIZSPARK_DISK_CACHE_MB", "512")) * 1024 * 1024
+
+
+def content_key(data, **params):
+    """
+    Build a cache key from the SHA-256 of the uploaded bytes and the
+    parameters that influence extraction and generation.
+    """
+    digest = hashlib.sha256(data).hexdigest()
+    if not params:
+        return digest
+    suffix = json.dumps(params, sort_keys=True, separators=(",", ":"))
+    return digest + "-" + hashlib.sha256(suffix.encode("utf-8")).hexdigest()[:16]
+
+
+class AnalysisCache:
+    """
+    Content-addressed cache of DocumentAnalysis objects.
+    Entries live in an in-memory LRU; when disk_dir is set, they are also
+    written there as JSON and reloaded on a memory miss. The disk tier holds
+    at most max_disk_bytes; the least recently used files are removed first.
+    """
+
+    def __init__(self, max_entries=128, disk_dir=None, max_disk_bytes=DEFAULT_MAX_DISK_BYTES):
+        self.max_entries = max_entries
+        self.disk_dir = disk_dir
+        self.max_disk_bytes = max_disk_bytes
+        self._entries = OrderedDict()
+        self._files = OrderedDict()
+        self._disk_bytes = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        if disk_dir:
+            os.makedirs(disk_dir, exist_ok=True)
+            self._scan_disk()
+
+    def get(self, key):
+        """
+        Return the analysis for key, or None on a miss.
+        """
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return entry
+        entry = self._load(key)
+        with self._lock:
+            if entry is None:
+                self.misses += 1
+                return None
+            self.disk_hits += 1
+            self._remember(key, entry)
+        return entry
+
+    def put(self, key, analysis):
+        with self._lock:
+            self._remember(key, analysis)
+        self._store(key, analysis)
+
+    def get_or_compute(self, key, compute):
+        """
+        Return the cached analysis for key, calling compute() to produce and
+        store it on a miss.
+        """
+        analysis = self.get(key)
+        if analysis is None:
+            analysis = compute()
+            self.put(key, analysis)
+        return analysis
+
+    def stats(self):
+        with self._lock:
+            return {
+                "entries": len(self._entries),
+                "max_entries": self.max_entries,
+                "hits": self.hits,
+                "disk_hits": self.disk_hits,
+                "misses": self.misses,
+                "disk_bytes": self._disk_bytes,
+                "max_disk_bytes": self.max_disk_bytes if self.disk_dir else None,
+            }
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def _remember(self, key, entry):
+        self._entries[key] = entry
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def _path(self, key):
+        return os.path.join(self.disk_dir, f"{key}.json")
+
+    def _scan_disk(self):
+        # Files left by earlier runs, oldest access first.
+        found = []
+        for entry in os.scandir(self.disk_dir):
+            if entry.is_file() and entry.name.endswith(".json"):
+                stat = entry.stat()
+                found.append((stat.st_atime, entry.name[:-len(".json")], stat.st_size))
+        for _, key, size in sorted(found):
+            self._files[key] = size
+            self._disk_bytes += size
+        self._evict_disk()
+
+    def _load(self, key):
+        if not self.disk_dir:
+            return None
+        try:
+            with open(self._path(key), encoding="utf-8") as f:
+                # Files written before text was dropped from entries also hold it.
+                analysis = DocumentAnalysis.from_dict(json.load(f)["analysis"])
+        except FileNotFoundError:
+            return None
+        except Exception as e:
+            # A truncated or outdated file is a miss; the next put replaces it.
+            logger.warning("Cache read error for %s: %s", key, e)
+            return None
+        with self._lock:
+            if key in self._files:
+                self._files.move_to_end(key)
+        return analysis
+
+    def _store(self, key, analysis):
+        if not self.disk_dir:
+            return
+        path = self._path(key)
+        tmp_path = f"{path}.{threading.get_ident()}.tmp"
+        try:
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                json.dump({"analysis": analysis.to_dict()}, f)
+            size = os.path.getsize(tmp_path)
+            os.replace(tmp_path, path)
+        except Exception as e:
+            logger.warning("Cache write error for %s: %s", key, e)
+            return
+        with self._lock:
+            self._disk_bytes += size - self._files.pop(key, 0)
+            self._files[key] = size
+            self._evict_disk()
+
+    def _evict_disk(self):
+        while self._disk_bytes > self.max_disk_bytes and self._files:
+            key, size = self._files.popitem(last=False)
+            self._disk_bytes -= size
+            try:
+                os.remove(self._path(key))
+            except OSError as e:
+                logger.warning("Cache eviction error for %s: %s", key, e)
@@ -0,0 +1,111 @@
+import random
+
+# Distractors are drawn from the most frequent nouns of a bucket only, which
+# keeps them plausible and makes every draw O(max_options).
+DEFAULT_POOL_SIZE = 50
+# Vector neighbours are computed for at most this many of the most frequent nouns.
+MAX_VECTOR_NOUNS = 1000
+# Nouns less similar than this are not treated as vector neighbours.
+MIN_SIMILARITY = 0.3
+NEIGHBOURS_PER_NOUN = 10
+
+
+class DistractorIndex:
+    """
+    Per-document index of candidate wrong answers for multiple-choice questions.
+
+    Built from noun statistics (text -> [count, pos, ent_type]) collected during
+    analysis. Nouns are grouped into buckets by POS and entity type and ranked
+    by frequency, so a distractor for "Paris" comes from other proper nouns
+    rather than from arbitrary words; entity types are only set when the
+    model runs NER (QUIZSPARK_ENTITY_DISTRACTORS=1), and then "Paris" draws
+    other places first. When vocab has word vectors, the nearest neighbours
+    of each noun are used before either.
+    """
+
+    def __init__(self, noun_stats=None, pool_size=DEFAULT_POOL_SIZE, vocab=None):
+        self.pool_size = pool_size
+        self.vocab = vocab
+        self._stats = {}
+        self._buckets = {}
+        self._overall = []
+        self._neighbours = {}
+        self._dirty = False
+        if noun_stats:
+            self.add(noun_stats)
+
+    def add(self, noun_stats):
+        """
+        Merge more noun statistics (e.g. from the next streamed chunk).
+        The index is rebuilt lazily on the next lookup.
+        """
+        for text, (count, pos, ent_type) in noun_stats.items():
+            entry = self._stats.get(text)
+            if entry is None:
+                self._stats[text] = [count, pos, ent_type]
+            else:
+                entry[0] += count
+        self._dirty = self._dirty or bool(noun_stats)
+
+    def __len__(self):
+        return len(self._stats)
+
+    def distractors(self, answer, k, rng=random):
+        """
+        Return up to k distinct nouns other than answer, preferring
+        vector neighbours, then the answer's bucket, then the whole document.
+        """
+        if k <= 0:
+            return []
+        if self._dirty:
+            self._rebuild()
+        entry = self._stats.get(answer)
+        key = (entry[1], entry[2]) if entry else None
+        chosen = []
+        seen = {answer.lower()}
+        pools = [self._neighbours.get(answer, ()), self._buckets.get(key, ()), self._overall]
+        for pool in pools:
+            if len(chosen) == k:
+                break
+            # Draw k + len(seen) so that skipping the answer and repeats
+            # still leaves k picks; sampling stays O(k) per pool.
+            for word in rng.sample(pool, min(len(pool), k + len(seen))):
+                if word.lower() not in seen:
+                    seen.add(word.lower())
+                    chosen.append(word)
+                    if len(chosen) == k:
+                        break
+        return chosen
+
+    def _rebuild(self):
+        ranked = sorted(self._stats.items(), key=lambda item: -item[1][0])
+        buckets = {}
+        for text, (_, pos, ent_type) in ranked:
+            bucket = buckets.setdefault((pos, ent_type), [])
+            if len(bucket) < self.pool_size:
+                bucket.append(text)
+        self._buckets = buckets
+        self._overall = [text for text, _ in ranked[:self.pool_size]]
+        self._neighbours = self._vector_neighbours([text for text, _ in ranked[:MAX_VECTOR_NOUNS]])
+        self._dirty = False
+
+    def _vector_neighbours(self, nouns):
+        vocab = self.vocab
+        vectors = getattr(vocab, "vectors", None)
+        if vectors is None or vectors.size == 0:
+            return {}
+        import numpy
+        words = [w for w in nouns if vocab.has_vector(w)]
+        if len(words) < 2:
+            return {}
+        matrix = numpy.array([vocab.get_vector(w) for w in words], dtype="float32")
+        norms = numpy.linalg.norm(matrix, axis=1, keepdims=True)
+        matrix /= numpy.where(norms == 0, 1, norms)
+        similarity = matrix @ matrix.T
+        numpy.fill_diagonal(similarity, -1)
+        width = min(NEIGHBOURS_PER_NOUN, len(words) - 1)
+        nearest = numpy.argsort(-similarity, axis=1)[:, :width]
+        return {
+            word: [words[j] for j in row if similarity[i, j] >= MIN_SIMILARITY]
+            for i, (word, row) in enumerate(zip(words, nearest))
+        }
@@ -0,0 +1,306 @@
+import importlib
+import io
+import logging
+import multiprocessing
+import os
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+# Preferred PDF backend by name; by default the fastest installed one is used.
+DEFAULT_PDF_BACKEND = os.environ.get("QUIZSPARK_PDF_BACKEND") or None
+
+
+class ExtractionTimeout(TimeoutError):
+    """
+    Raised when a document's extraction time budget runs out.
+    """
+
+
+class TimeBudget:
+    """
+    Per-document extraction time budget shared by every backend tried on a
+    document. Only time charged to it counts, which KillableBackend does for
+    the time spent waiting on a backend, so a slow consumer of lazily
+    extracted pages does not use it up. A budget of None never runs out.
+    """
+
+    def __init__(self, budget=None):
+        self.budget = budget
+        self.spent = 0.0
+
+    def charge(self, seconds):
+        self.spent += seconds
+
+    def check(self):
+        if self.budget is not None and self.spent >= self.budget:
+            raise ExtractionTimeout(f"extraction exceeded its {self.budget}s budget")
+
+    def remaining(self):
+        """
+        Seconds left, never negative, or None without a budget.
+        """
+        if self.budget is None:
+            return None
+        return max(self.budget - self.spent, 0.0)
+
+
+class PdfBackend:
+    """
+    A PDF text extractor. open() takes a path or a seekable binary stream and
+    returns a document handle for page_count(), page_text() and close().
+    modules lists the import names tried, in order, by load().
+    """
+
+    name = None
+    modules = ()
+
+    def __init__(self):
+        self._module = None
+
+    def load(self):
+        """
+        Import the backing library, or return None when it is not installed.
+        """
+        if self._module is None:
+            for module in self.modules:
+                try:
+                    self._module = importlib.import_module(module)
+                    break
+                except ImportError:
+                    continue
+        return self._module
+
+    def available(self):
+        return self.load() is not None
+
+    def open(self, source):
+        raise NotImplementedError
+
+    def page_count(self, doc):
+        raise NotImplementedError
+
+    def page_text(self, doc, index):
+        raise NotImplementedError
+
+    def close(self, doc):
+        pass
+
+
+# PyMuPDF and pypdfium2 are not thread-safe, so each is only called by one
+# thread of a process at a time, whichever document it is working on. Worker
+# processes (the PDF pool, KillableBackend) each have their own library state.
+_PYMUPDF_LOCK = threading.Lock()
+_PDFIUM_LOCK = threading.Lock()
+
+
+def _acquire_backend_locks():
+    _PYMUPDF_LOCK.acquire()
+    _PDFIUM_LOCK.acquire()
+
+
+def _release_backend_locks():
+    _PDFIUM_LOCK.release()
+    _PYMUPDF_LOCK.release()
+
+
+# A forked child (KillableBackend, a fork-started pool) must not inherit a
+# lock held by another thread, or a library caught in the middle of a call.
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(before=_acquire_backend_locks, after_in_parent=_release_backend_locks,
+                        after_in_child=_release_backend_locks)
+
+
+class PyMuPDFBackend(PdfBackend):
+    name = "pymupdf"
+    modules = ("pymupdf", "fitz")
+
+    def open(self, source):
+        if not isinstance(source, (str, os.PathLike)):
+            source = source.read()
+        with _PYMUPDF_LOCK:
+            if isinstance(source, bytes):
+                return self.load().open(stream=source, filetype="pdf")
+            return self.load().open(source)
+
+    def page_count(self, doc):
+        with _PYMUPDF_LOCK:
+            return doc.page_count
+
+    def page_text(self, doc, index):
+        with _PYMUPDF_LOCK:
+            return doc.load_page(index).get_text()
+
+    def close(self, doc):
+        with _PYMUPDF_LOCK:
+            doc.close()
+
+
+class PdfiumBackend(PdfBackend):
+    name = "pdfium"
+    modules = ("pypdfium2",)
+
+    def open(self, source):
+        if not isinstance(source, (str, os.PathLike)):
+            source = source.read()
+        with _PDFIUM_LOCK:
+            return self.load().PdfDocument(source)
+
+    def page_count(self, doc):
+        with _PDFIUM_LOCK:
+            return len(doc)
+
+    def page_text(self, doc, index):
+        with _PDFIUM_LOCK:
+            page = doc[index]
+            textpage = page.get_textpage()
+            try:
+                return textpage.get_text_range()
+            finally:
+                textpage.close()
+                page.close()
+
+    def close(self, doc):
+        with _PDFIUM_LOCK:
+            doc.close()
+
+
+class PyPDF2Backend(PdfBackend):
+    name = "pypdf2"
+    modules = ("PyPDF2",)
+
+    def open(self, source):
+        return self.load().PdfReader(source)
+
+    def page_count(self, doc):
+        return len(doc.pages)
+
+    def page_text(self, doc, index):
+        return doc.pages[index].extract_text() or ""
+
+
+class KillableBackend(PdfBackend):
+    """
+    Runs another backend in a child process, one call at a time, and charges
+    the time spent waiting for each call to budget. When the budget runs out
+    during a call, the child is killed and ExtractionTimeout raised, so even
+    a backend stuck inside one page cannot hold extraction past its budget.
+    The child is idle between calls, so time the caller spends elsewhere is
+    never charged.
+    """
+
+    def __init__(self, backend, budget):
+        super().__init__()
+        self.backend = backend
+        self.budget = budget
+        self.name = backend.name
+
+    def available(self):
+        return self.backend.available()
+
+    def open(self, source):
+        if not isinstance(source, (str, os.PathLike)):
+            source = source.read()
+        conn, child_conn = multiprocessing.Pipe()
+        process = multiprocessing.Process(target=_serve_backend, args=(child_conn, self.backend.name, source),
+                                          daemon=True)
+        process.start()
+        child_conn.close()
+        try:
+            page_count = self._call((process, conn), None)
+        except BaseException:
+            self.close((process, conn))
+            raise
+        return process, conn, page_count
+
+    def page_count(self, doc):
+        return doc[2]
+
+    def page_text(self, doc, index):
+        return self._call(doc, index)
+
+    def close(self, doc):
+        process, conn = doc[:2]
+        conn.close()
+        process.kill()
+        process.join()
+
+    def _call(self, doc, index):
+        process, conn = doc[:2]
+        self.budget.check()
+        start = time.monotonic()
+        try:
+            if index is not None:
+                conn.send(index)
+            ready = conn.poll(self.budget.remaining())
+        finally:
+            self.budget.charge(time.monotonic() - start)
+        if not ready:
+            process.kill()
+            raise ExtractionTimeout(f"extraction exceeded its {self.budget.budget}s budget")
+        try:
+            ok, value = conn.recv()
+        except EOFError:
+            raise RuntimeError(f"{self.name} worker exited with status {process.exitcode}")
+        if not ok:
+            raise RuntimeError(value)
+        return value
+
+
+def _serve_backend(conn, name, source):
+    # Child side of KillableBackend: open the document, report its page
+    # count, then answer page indices until the parent goes away.
+    backend = get_backend(".pdf", name)
+    try:
+        doc = backend.open(source if isinstance(source, (str, os.PathLike)) else io.BytesIO(source))
+        conn.send((True, backend.page_count(doc)))
+    except Exception as e:
+        conn.send((False, f"{e.__class__.__name__}: {e}"))
+        return
+    try:
+        while True:
+            try:
+                index = conn.recv()
+            except EOFError:
+                return
+            try:
+                conn.send((True, backend.page_text(doc, index)))
+            except Exception as e:
+                conn.send((False, f"{e.__class__.__name__}: {e}"))
+    finally:
+        backend.close(doc)
+
+
+# format -> [(priority, backend)]; lower priority numbers are tried first.
+_registry = {}
+
+
+def register(fmt, backend, priority):
+    entries = _registry.setdefault(fmt, [])
+    entries[:] = [(p, b) for p, b in entries if b.name != backend.name]
+    entries.append((priority, backend))
+    entries.sort(key=lambda entry: entry[0])
+
+
+def backends_for(fmt, preferred=None):
+    """
+    Installed backends for a format, fastest first; the backend named
+    preferred (or QUIZSPARK_PDF_BACKEND) is moved to the front.
+    """
+    preferred = preferred or DEFAULT_PDF_BACKEND
+    found = [backend for _, backend in _registry.get(fmt, ()) if backend.available()]
+    found.sort(key=lambda backend: backend.name != preferred)
+    return found
+
+
+def get_backend(fmt, name):
+    for _, backend in _registry.get(fmt, ()):
+        if backend.name == name:
+            return backend
+    raise KeyError(f"no {fmt} backend named {name!r}")
+
+
+register(".pdf", PyMuPDFBackend(), 10)
+register(".pdf", PdfiumBackend(), 20)
+register(".pdf", PyPDF2Backend(), 100)
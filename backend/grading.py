@@ -0,0 +1,173 @@
+from dataclasses import dataclass
+
+import numpy
+
+from instrumentation import timed
+
+# Code used for a missing answer or one that is not among a question's choices.
+NO_ANSWER = -1
+
+
+@timed("grade_quiz")
+def grade_quiz(quiz, user_answers):
+    results = []
+    score = 0
+    for i, q in enumerate(quiz):
+        user = user_answers.get(f"q{i}")
+        correct = q["answer"]
+        is_correct = user == correct
+        if is_correct:
+            score += 1
+        results.append({
+            "question": q["question"],
+            "user": user,
+            "correct": correct,
+            "status": "✅" if is_correct else "❌"
+        })
+    return results, score
+
+@timed("grade_puzzles")
+def grade_puzzles(puzzles, user_answers):
+    results = []
+    correct_count = 0
+    for i, p in enumerate(puzzles):
+        user = user_answers.get(f"p{i}", "").strip().lower()
+        ans = p["answer"].lower()
+        is_correct = user == ans
+        if is_correct:
+            correct_count += 1
+        results.append({
+            "puzzle": p["puzzle"],
+            "user": user,
+            "answer": ans,
+            "is_correct": is_correct
+        })
+    return results, correct_count
+
+@timed("grade_quiz")
+def mark_quiz(quiz, user_answers):
+    """
+    Each question's submitted answer and whether it is correct, without
+    building per-question result dicts (see rendering.fill_result).
+    """
+    users = [user_answers.get(f"q{i}") for i in range(len(quiz))]
+    return users, [user == q["answer"] for user, q in zip(users, quiz)]
+
+@timed("grade_puzzles")
+def mark_puzzles(puzzles, user_answers):
+    users = [user_answers.get(f"p{i}", "").strip().lower() for i in range(len(puzzles))]
+    return users, [user == p["answer"].lower() for user, p in zip(users, puzzles)]
+
+
+@dataclass
+class BatchGrade:
+    """
+    Results of grading many submissions against one quiz.
+    correct is a (submissions x questions) boolean matrix.
+    """
+    correct: numpy.ndarray
+
+    @property
+    def scores(self):
+        return self.correct.sum(axis=1)
+
+    @property
+    def total(self):
+        return self.correct.shape[1]
+
+    @property
+    def question_accuracy(self):
+        if not len(self.correct):
+            return numpy.zeros(self.total)
+        return self.correct.mean(axis=0)
+
+    def to_dict(self):
+        scores = self.scores
+        return {
+            "submissions": len(scores),
+            "total": self.total,
+            "scores": scores.tolist(),
+            "mean_score": float(scores.mean()) if len(scores) else 0.0,
+            "question_accuracy": self.question_accuracy.tolist(),
+            "score_histogram": numpy.bincount(scores, minlength=self.total + 1).tolist(),
+        }
+
+
+class QuizAnswerKey:
+    """
+    Array-backed answer key for a quiz, built once and reused for every
+    submission. Answers are encoded as the index of the chosen option.
+    """
+
+    def __init__(self, quiz):
+        self.choice_codes = [{choice: j for j, choice in enumerate(q["choices"])} for q in quiz]
+        self.key = numpy.array(
+            [codes.get(q["answer"], NO_ANSWER) for codes, q in zip(self.choice_codes, quiz)], dtype=numpy.int32
+        )
+
+    def encode(self, submissions):
+        """
+        Encode submissions into a (submissions x questions) int matrix.
+        submissions is either a list of mappings like request.form
+        ({"q0": "answer", ...}) or columns ({"q0": [answers...], ...}).
+        """
+        columns, rows = _as_columns(submissions, "q", len(self.key))
+        matrix = numpy.full((rows, len(self.key)), NO_ANSWER, dtype=numpy.int32)
+        for i, (codes, column) in enumerate(zip(self.choice_codes, columns)):
+            matrix[:, i] = [codes.get(answer, NO_ANSWER) for answer in column]
+        return matrix
+
+    def grade(self, submissions):
+        matrix = self.encode(submissions)
+        return BatchGrade((matrix == self.key) & (self.key != NO_ANSWER))
+
+
+class PuzzleAnswerKey:
+    """
+    Array-backed answer key for word puzzles; answers are compared after
+    stripping and lowercasing, as in grade_puzzles.
+    """
+
+    def __init__(self, puzzles):
+        self.key = numpy.array([p["answer"].lower() for p in puzzles], dtype=object)
+
+    def grade(self, submissions):
+        columns, rows = _as_columns(submissions, "p", len(self.key))
+        matrix = numpy.empty((rows, len(self.key)), dtype=object)
+        for i, column in enumerate(columns):
+            matrix[:, i] = [str(answer or "").strip().lower() for answer in column]
+        return BatchGrade((matrix == self.key).astype(bool))
+
+
+@timed("grade_quiz_batch")
+def grade_quiz_batch(quiz, submissions):
+    """
+    Grade many submissions against the same quiz at once.
+    """
+    return QuizAnswerKey(quiz).grade(submissions)
+
+
+@timed("grade_puzzles_batch")
+def grade_puzzles_batch(puzzles, submissions):
+    """
+    Grade many puzzle submissions against the same puzzles at once.
+    """
+    return PuzzleAnswerKey(puzzles).grade(submissions)
+
+
+def _as_columns(submissions, prefix, count):
+    """
+    Return (columns, rows): one list of answers per question. Columnar
+    input must have one answer per submission in every column; a missing
+    column counts as unanswered. Raises ValueError otherwise.
+    """
+    if isinstance(submissions, dict):
+        lengths = {name: len(c) for name, c in submissions.items() if not isinstance(c, str)}
+        if len(lengths) != len(submissions):
+            raise ValueError("every column must be a list of answers")
+        rows = max(lengths.values(), default=0)
+        short = sorted(name for name, length in lengths.items() if length != rows)
+        if short:
+            raise ValueError(f"columns {', '.join(short)} have fewer than {rows} answers")
+        return [submissions.get(f"{prefix}{i}") or [None] * rows for i in range(count)], rows
+    return [[s.get(f"{prefix}{i}") for s in submissions] for i in range(count)], len(submissions)
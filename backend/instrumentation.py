@@ -0,0 +1,212 @@
+import bisect
+import contextvars
+import cProfile
+import io
+import json
+import logging
+import os
+import pstats
+import threading
+import time
+from contextlib import contextmanager
+
+# Histogram bucket upper bounds: seconds for stage timings, counts for sizes.
+TIME_BUCKETS = (0.001, 0.005, 0.01, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60)
+SIZE_BUCKETS = (1_000, 10_000, 100_000, 1_000_000, 10_000_000, 100_000_000)
+
+
+class Histogram:
+    def __init__(self, buckets):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.count = 0
+        self.sum = 0.0
+
+    def observe(self, value):
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.count += 1
+        self.sum += value
+
+    def to_dict(self):
+        bounds = [str(b) for b in self.buckets] + ["+Inf"]
+        return {
+            "count": self.count,
+            "sum": self.sum,
+            "mean": self.sum / self.count if self.count else 0.0,
+            "buckets": dict(zip(bounds, self.counts)),
+        }
+
+
+class MetricsRegistry:
+    """
+    Thread-safe collection of named histograms.
+    """
+
+    def __init__(self):
+        self._histograms = {}
+        self._lock = threading.Lock()
+
+    def observe(self, name, value, buckets=TIME_BUCKETS):
+        with self._lock:
+            histogram = self._histograms.get(name)
+            if histogram is None:
+                histogram = self._histograms[name] = Histogram(buckets)
+            histogram.observe(value)
+
+    def to_dict(self):
+        with self._lock:
+            return {name: h.to_dict() for name, h in sorted(self._histograms.items())}
+
+    def reset(self):
+        with self._lock:
+            self._histograms.clear()
+
+
+class RequestRecord:
+    """
+    Stage durations and annotations (document size, token counts) collected
+    while handling one request.
+    """
+
+    def __init__(self):
+        self.start = time.perf_counter()
+        self.stages = {}
+        self.attrs = {}
+
+    def server_timing(self, total=None):
+        parts = [f"{name};dur={seconds * 1000:.2f}" for name, seconds in self.stages.items()]
+        if total is not None:
+            parts.append(f"total;dur={total * 1000:.2f}")
+        return ", ".join(parts)
+
+
+registry = MetricsRegistry()
+_current = contextvars.ContextVar("quizspark_request_record", default=None)
+
+
+def begin_request():
+    record = RequestRecord()
+    _current.set(record)
+    return record
+
+
+def end_request():
+    record = _current.get()
+    _current.set(None)
+    return record
+
+
+def current_record():
+    return _current.get()
+
+
+@contextmanager
+def timed(stage):
+    """
+    Time a block (or, used as a decorator, a function call). The duration is
+    added to the stage histogram and to the current request record, if any.
+    """
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        elapsed = time.perf_counter() - start
+        registry.observe(stage, elapsed)
+        record = _current.get()
+        if record is not None:
+            record.stages[stage] = record.stages.get(stage, 0.0) + elapsed
+
+
+def annotate(name, value):
+    """
+    Record a size measurement such as document characters or token count.
+    """
+    registry.observe(name, value, buckets=SIZE_BUCKETS)
+    record = _current.get()
+    if record is not None:
+        record.attrs[name] = record.attrs.get(name, 0) + value
+
+
+def report(stages, attrs, prefix=""):
+    """
+    Add stage timings and annotations measured elsewhere, such as in a
+    background job, to the current request record, with names prefixed.
+    """
+    record = _current.get()
+    if record is None:
+        return
+    for name, seconds in stages.items():
+        record.stages[prefix + name] = record.stages.get(prefix + name, 0.0) + seconds
+    for name, value in attrs.items():
+        record.attrs[prefix + name] = record.attrs.get(prefix + name, 0) + value
+
+
+def observe_record(stages, attrs):
+    """
+    Add a record collected in another process to this process's histograms.
+    """
+    for name, seconds in stages.items():
+        registry.observe(name, seconds)
+    for name, value in attrs.items():
+        registry.observe(name, value, buckets=SIZE_BUCKETS)
+
+
+class RequestProfiler:
+    """
+    Opt-in cProfile run around a single request. Stats are logged, and
+    also dumped to profile_dir when one is given.
+    """
+
+    def __init__(self, name, profile_dir=None, limit=25):
+        self.name = name
+        self.profile_dir = profile_dir
+        self.limit = limit
+        self._profile = cProfile.Profile()
+
+    def start(self):
+        self._profile.enable()
+
+    def stop(self):
+        self._profile.disable()
+        out = io.StringIO()
+        pstats.Stats(self._profile, stream=out).sort_stats("cumulative").print_stats(self.limit)
+        logging.getLogger(__name__).info("profile %s\n%s", self.name, out.getvalue())
+        if self.profile_dir:
+            os.makedirs(self.profile_dir, exist_ok=True)
+            path = os.path.join(self.profile_dir, f"{int(time.time() * 1000)}-{self.name}.prof")
+            self._profile.dump_stats(path)
+            return path
+        return None
+
+
+class JsonLogFormatter(logging.Formatter):
+    """
+    One JSON object per line, including any fields passed via extra=.
+    """
+
+    _RESERVED = set(vars(logging.makeLogRecord({}))) | {"message", "asctime"}
+
+    def format(self, record):
+        data = {
+            "ts": record.created,
+            "level": record.levelname,
+            "logger": record.name,
+            "msg": record.getMessage(),
+        }
+        for key, value in vars(record).items():
+            if key not in self._RESERVED:
+                data[key] = value
+        if record.exc_info:
+            data["exc"] = self.formatException(record.exc_info)
+        return json.dumps(data, default=str)
+
+
+def configure_logging(level=logging.INFO, json_format=False):
+    handler = logging.StreamHandler()
+    if json_format:
+        handler.setFormatter(JsonLogFormatter())
+    else:
+        handler.setFormatter(logging.Formatter("%(asctime)s %(levelname)s %(name)s: %(message)s"))
+    root = logging.getLogger()
+    root.addHandler(handler)
+    root.setLevel(level)
@@ -0,0 +1,226 @@
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from contextlib import contextmanager
+
+from instrumentation import begin_request, end_request, observe_record
+
+QUEUED = "queued"
+RUNNING = "running"
+DONE = "done"
+FAILED = "failed"
+
+
+class QueueFull(Exception):
+    """
+    Raised by JobQueue.submit when the queue already holds max_pending
+    jobs; callers should ask the client to retry later.
+    """
+
+
+class StageTimer:
+    """
+    Records how long each named stage of a job takes, in seconds.
+    Plain data, so it can be returned from a worker process.
+    """
+
+    def __init__(self):
+        self.timings = {}
+
+    @contextmanager
+    def stage(self, name):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.timings[name] = self.timings.get(name, 0.0) + time.perf_counter() - start
+
+
+class Job:
+    def __init__(self, job_id):
+        self.id = job_id
+        self.status = QUEUED
+        self.result = None
+        self.error = None
+        self.created = time.time()
+        self.started = None
+        self.finished = None
+        self.timings = {}
+        # Finer-grained timed() stages and annotate() sizes from inside the job.
+        self.stages = {}
+        self.attrs = {}
+        self._future = None
+        self._size = 0
+        self._on_done = None
+
+    def refresh(self):
+        # Pools mark a future as running once a worker picks it up.
+        if self.status == QUEUED and self._future is not None and self._future.running():
+            self.status = RUNNING
+
+    def to_dict(self):
+        data = {"id": self.id, "status": self.status, "timings": self.timings, "stages": self.stages,
+                "attrs": self.attrs}
+        if self.started is not None:
+            data["wait"] = self.started - self.created
+        if self.finished is not None:
+            data["total"] = self.finished - self.created
+        if self.error:
+            data["error"] = self.error
+        return data
+
+
+class JobQueue:
+    """
+    Runs work in a thread or process pool and tracks it by job ID.
+    Job functions must return a (result, timings) pair, where timings maps
+    stage names to seconds (see StageTimer); timed() stages and annotate()
+    sizes recorded while a job runs are kept on the job as well. Only the
+    most recent max_jobs finished jobs are kept. With max_pending set, at
+    most that many jobs may wait for a worker; with max_pending_bytes set,
+    the sizes passed to submit() of unfinished jobs may not add up to more
+    than that. Either way, further submissions raise QueueFull.
+    """
+
+    def __init__(self, max_workers=2, executor="thread", max_jobs=1000, max_pending=None, max_pending_bytes=None):
+        if executor == "process":
+            self._executor = ProcessPoolExecutor(max_workers=max_workers)
+        else:
+            self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="quizspark-job")
+        self.executor_kind = executor
+        self.max_workers = max_workers
+        self.max_jobs = max_jobs
+        self.max_pending = max_pending
+        self.max_pending_bytes = max_pending_bytes
+        self._active = 0
+        self._active_bytes = 0
+        self._jobs = OrderedDict()
+        self._lock = threading.Lock()
+        self._stage_totals = {}
+        self._stage_counts = {}
+
+    def submit(self, fn, *args, size=0, on_done=None):
+        """
+        Queue fn(*args) and return the job ID. size is how many bytes the
+        job holds until it finishes, such as an upload's length. on_done,
+        if given, is called in this process with the job's result before
+        the job is marked done, and returns the result to keep on the job.
+        """
+        job = Job(uuid.uuid4().hex)
+        job._size = size
+        job._on_done = on_done
+        with self._lock:
+            if self.max_pending is not None and self._active >= self.max_workers + self.max_pending:
+                raise QueueFull(f"{self._active} jobs already queued or running")
+            # A job larger than the whole cap still runs when nothing else is held.
+            if (self.max_pending_bytes is not None and self._active_bytes
+                    and self._active_bytes + size > self.max_pending_bytes):
+                raise QueueFull(f"{self._active_bytes} bytes already queued or running")
+            self._active += 1
+            self._active_bytes += size
+            self._jobs[job.id] = job
+            self._prune()
+        future = self._executor.submit(_run_job, fn, *args)
+        with self._lock:
+            job._future = future
+        future.add_done_callback(lambda f: self._finish(job, f))
+        return job.id
+
+    def get(self, job_id):
+        with self._lock:
+            job = self._jobs.get(job_id)
+            if job is not None:
+                job.refresh()
+            return job
+
+    def future(self, job_id):
+        """
+        The concurrent.futures.Future of a job that has not finished yet,
+        or None. Async callers can wait on it with asyncio.wrap_future().
+        """
+        with self._lock:
+            job = self._jobs.get(job_id)
+            return job._future if job is not None else None
+
+    def stats(self):
+        """
+        Queue depth, job counts by status and mean duration per stage.
+        """
+        with self._lock:
+            counts = {QUEUED: 0, RUNNING: 0, DONE: 0, FAILED: 0}
+            for job in self._jobs.values():
+                job.refresh()
+                counts[job.status] += 1
+            stages = {
+                name: {"count": self._stage_counts[name], "mean": total / self._stage_counts[name]}
+                for name, total in self._stage_totals.items()
+            }
+        return {
+            "executor": self.executor_kind,
+            "workers": self.max_workers,
+            "queue_depth": counts[QUEUED],
+            "max_pending": self.max_pending,
+            "pending_bytes": self._active_bytes,
+            "max_pending_bytes": self.max_pending_bytes,
+            "jobs": counts,
+            "stages": stages,
+        }
+
+    def shutdown(self, wait=True):
+        self._executor.shutdown(wait=wait)
+
+    def _finish(self, job, future):
+        try:
+            started, finished, result, timings, stages, attrs = future.result()
+            if job._on_done is not None:
+                result = job._on_done(result)
+            error = None
+        except Exception as e:
+            started = finished = time.time()
+            result, timings, stages, attrs, error = None, {}, {}, {}, str(e) or e.__class__.__name__
+        finally:
+            # The callback may hold the job's input, such as an upload's bytes,
+            # which must not outlive the job's share of max_pending_bytes.
+            job._on_done = None
+        if self.executor_kind == "process":
+            # Worker processes have histograms of their own.
+            observe_record(stages, attrs)
+        with self._lock:
+            self._active -= 1
+            self._active_bytes -= job._size
+            job.started = started
+            job.finished = finished
+            job.timings = timings
+            job.stages = stages
+            job.attrs = attrs
+            job._future = None
+            if error is None:
+                job.result = result
+                job.status = DONE
+            else:
+                job.error = error
+                job.status = FAILED
+            for name, seconds in timings.items():
+                self._stage_totals[name] = self._stage_totals.get(name, 0.0) + seconds
+                self._stage_counts[name] = self._stage_counts.get(name, 0) + 1
+
+    def _prune(self):
+        excess = len(self._jobs) - self.max_jobs
+        if excess <= 0:
+            return
+        for job_id in [j.id for j in self._jobs.values() if j.status in (DONE, FAILED)][:excess]:
+            del self._jobs[job_id]
+
+
+def _run_job(fn, *args):
+    # Workers do not see the submitting request's context, so the job
+    # collects its own record, which the app reports when the job is read.
+    started = time.time()
+    record = begin_request()
+    try:
+        result, timings = fn(*args)
+    finally:
+        end_request()
+    return started, time.time(), result, timings, record.stages, record.attrs
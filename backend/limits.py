@@ -0,0 +1,120 @@
+import os
+import random
+import sys
+from array import array
+from dataclasses import dataclass
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+# Per-document caps for analyze_bounded(). The memory cap is on how much the
+# process grows while one document is analysed, not on its total size, so
+# models and caches loaded earlier do not count; QUIZSPARK_MAX_DOC_MEMORY_MB=0
+# turns it off.
+MAX_DOC_TOKENS = int(os.environ.get("QUIZSPARK_MAX_DOC_TOKENS", "2000000"))
+MAX_DOC_MEMORY_MB = int(os.environ.get("QUIZSPARK_MAX_DOC_MEMORY_MB", "2048")) or None
+SENTENCE_SAMPLE = 2000
+WORD_SAMPLE = 5000
+MAX_VOCABULARY = 200_000
+
+
+def rss_mb():
+    """
+    Resident set size of this process in MB: current where /proc is
+    available, otherwise the peak so far. None when it cannot be read.
+    """
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE") / 2**20
+    except (OSError, ValueError, AttributeError):
+        pass
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak / 2**20 if sys.platform == "darwin" else peak / 1024
+
+
+@dataclass
+class ResourceLimits:
+    """
+    Caps for analysing one document: tokens read, process memory, and how
+    many sentences, puzzle words and distinct words are kept.
+    The memory cap (2048 MB unless QUIZSPARK_MAX_DOC_MEMORY_MB says
+    otherwise; None for no cap) limits how much the process grows from the
+    start of the document. It is checked between chunks and growth from
+    other work in the same process counts too, so it is most meaningful
+    with the process job executor.
+    """
+    max_tokens: int = MAX_DOC_TOKENS
+    max_memory_mb: int = MAX_DOC_MEMORY_MB
+    sentence_sample: int = SENTENCE_SAMPLE
+    word_sample: int = WORD_SAMPLE
+    max_vocabulary: int = MAX_VOCABULARY
+
+
+class Reservoir:
+    """
+    Uniform random sample of at most size items from a stream of unknown
+    length (Algorithm R): memory stays O(size) however long the stream is.
+    """
+
+    def __init__(self, size, rng=None):
+        self.size = size
+        self.rng = rng or random
+        self.items = []
+        self.seen = 0
+
+    def offer(self, item):
+        self.seen += 1
+        if len(self.items) < self.size:
+            self.items.append(item)
+            return
+        j = self.rng.randrange(self.seen)
+        if j < self.size:
+            self.items[j] = item
+
+    def __len__(self):
+        return len(self.items)
+
+
+class Vocabulary:
+    """
+    Interned words: each distinct word is stored once and given an integer
+    id, and counts live in an array indexed by id instead of one Python int
+    per word. Once max_size words are interned, new words are not counted.
+    """
+
+    def __init__(self, max_size=MAX_VOCABULARY):
+        self.max_size = max_size
+        self.ids = {}
+        self.words = []
+        self.counts = array("L")
+
+    def add(self, word, count=1):
+        """
+        Count word and return its id, or None when the vocabulary is full.
+        """
+        word_id = self.ids.get(word)
+        if word_id is None:
+            if len(self.words) >= self.max_size:
+                return None
+            word_id = self.ids[word] = len(self.words)
+            self.words.append(word)
+            self.counts.append(0)
+        self.counts[word_id] += count
+        return word_id
+
+    def count(self, word):
+        word_id = self.ids.get(word)
+        return 0 if word_id is None else self.counts[word_id]
+
+    def full(self):
+        return len(self.words) >= self.max_size
+
+    def __contains__(self, word):
+        return word in self.ids
+
+    def __len__(self):
+        return len(self.words)
@@ -0,0 +1,43 @@
+# Process-wide registry of spaCy pipelines. Models load on first use rather
+# than at import time, with unused components excluded. Set
+# QUIZSPARK_PRELOAD_MODEL=1 (e.g. with gunicorn --preload) to load the model in
+# the parent before workers fork so they share it copy-on-write.
+import os
+import threading
+
+DEFAULT_MODEL = os.environ.get("QUIZSPARK_SPACY_MODEL", "en_core_web_sm")
+# Only tok2vec, tagger, attribute_ruler (POS) and parser (sentences) are used,
+# plus ner when QUIZSPARK_ENTITY_DISTRACTORS=1, so that distractors for a
+# named entity come from entities of the same type (slower to analyse).
+ENTITY_DISTRACTORS = os.environ.get("QUIZSPARK_ENTITY_DISTRACTORS") == "1"
+EXCLUDE = ("lemmatizer",) if ENTITY_DISTRACTORS else ("ner", "lemmatizer")
+
+_models = {}
+_lock = threading.Lock()
+
+
+def get_nlp(name=None):
+    """
+    Return the shared pipeline for name, loading it on first call.
+    """
+    name = name or DEFAULT_MODEL
+    nlp = _models.get(name)
+    if nlp is None:
+        with _lock:
+            nlp = _models.get(name)
+            if nlp is None:
+                import spacy
+                nlp = spacy.load(name, exclude=list(EXCLUDE))
+                _models[name] = nlp
+    return nlp
+
+
+def preload(name=None):
+    """
+    Load the model now; call before forking worker processes.
+    """
+    return get_nlp(name)
+
+
+def is_loaded(name=None):
+    return (name or DEFAULT_MODEL) in _models
@@ -0,0 +1,374 @@
+import hashlib
+import random
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+from quiz_store import DEFAULT_TTL, decode, encode
+from text_utils import DocumentAnalysis, analyze_texts, unpack_question
+
+# Draws skip items that repeat a sentence or word already in the same quiz;
+# after this many skips per requested item the draw returns what it has.
+DRAW_RETRY_FACTOR = 4
+# Banks kept by the in-process store; the least recently used is dropped first.
+DEFAULT_MAX_BANKS = 256
+KINDS = ("questions", "puzzles")
+
+
+def _question_key(question):
+    return question[0]
+
+
+def _puzzle_key(puzzle):
+    return puzzle["answer"]
+
+
+KEYS = {"questions": _question_key, "puzzles": _puzzle_key}
+
+
+def partial_shuffle(slots, size, remaining, k, rng, key):
+    """
+    Draw up to k items without replacement by a partial Fisher-Yates shuffle
+    over slots (anything indexable and assignable): slots[:remaining] are
+    still undrawn, and each pick swaps a random undrawn slot to the end of
+    that range, so a draw costs O(k) whatever the size. Items whose key(item)
+    repeats one already chosen are put back; once every slot has been drawn
+    a new round starts. Returns (chosen, remaining).
+    """
+    k = min(k, size)
+    chosen = []
+    seen = set()
+    misses = 0
+    while len(chosen) < k and misses <= k * DRAW_RETRY_FACTOR:
+        if remaining == 0:
+            remaining = size
+        j = rng.randrange(remaining)
+        remaining -= 1
+        slots[j], slots[remaining] = slots[remaining], slots[j]
+        item = slots[remaining]
+        if key(item) in seen:
+            # Put it back for a later quiz.
+            remaining += 1
+            misses += 1
+            continue
+        seen.add(key(item))
+        chosen.append(item)
+    return chosen, remaining
+
+
+class QuestionBank:
+    """
+    Every eligible question (packed, see pack_question) and puzzle of one
+    document, built in a single pass by bank_from_analysis().
+
+    Quizzes are drawn without replacement with a partial Fisher-Yates
+    shuffle: items[:remaining] are still undrawn, so a draw of k items costs
+    O(k) and needs no per-item bookkeeping. Once every item has been drawn
+    a new round starts.
+    """
+
+    def __init__(self, questions=None, puzzles=None, remaining=None):
+        self.questions = list(questions or [])
+        self.puzzles = list(puzzles or [])
+        self.remaining = remaining or {"questions": len(self.questions), "puzzles": len(self.puzzles)}
+
+    def draw_quiz(self, k, rng=random):
+        return [unpack_question(q) for q in self._draw("questions", k, rng)]
+
+    def draw_puzzles(self, k, rng=random):
+        return self._draw("puzzles", k, rng)
+
+    def _draw(self, kind, k, rng):
+        items = getattr(self, kind)
+        chosen, self.remaining[kind] = partial_shuffle(items, len(items), self.remaining[kind], k, rng, KEYS[kind])
+        return chosen
+
+    def to_dict(self):
+        return {"questions": self.questions, "puzzles": self.puzzles, "remaining": self.remaining}
+
+    @classmethod
+    def from_dict(cls, data):
+        return cls(data["questions"], data["puzzles"], data.get("remaining"))
+
+
+def block_key(text):
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+def analyze_blocks(blocks, cache):
+    """
+    Analyse a document given as text blocks (pages or paragraphs, see
+    iter_text), reusing cached analyses of blocks seen before, so an edited
+    document only pays for the blocks that changed.
+    Returns the merged DocumentAnalysis and the number of blocks analysed.
+    """
+    keys = [block_key(block) for block in blocks]
+    parts = {}
+    missing = {}
+    for key, block in zip(keys, blocks):
+        analysis = cache.get(key)
+        if analysis is not None:
+            parts[key] = analysis
+        else:
+            missing.setdefault(key, block)
+    for (key, block), analysis in zip(missing.items(), analyze_texts(list(missing.values()))):
+        cache.put(key, analysis)
+        parts[key] = analysis
+    merged = DocumentAnalysis()
+    for key in keys:
+        merged.extend(parts[key])
+    return merged, len(missing)
+
+
+class MemoryBankStore:
+    """
+    Question banks by document key, held as QuestionBank objects in this
+    process, with LRU eviction and a per-bank TTL. Banks have a store of
+    their own, so they never push quizzes out of the quiz store. A draw
+    updates the bank in place under a lock, in O(k).
+    """
+
+    def __init__(self, max_entries=DEFAULT_MAX_BANKS, ttl=DEFAULT_TTL):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._banks = OrderedDict()
+        self._lock = threading.Lock()
+
+    def has(self, doc_key):
+        with self._lock:
+            return self._get(doc_key) is not None
+
+    def put(self, doc_key, bank):
+        with self._lock:
+            self._banks[doc_key] = (time.time() + self.ttl, bank)
+            self._banks.move_to_end(doc_key)
+            while len(self._banks) > self.max_entries:
+                self._banks.popitem(last=False)
+
+    def draw(self, doc_key, questions, puzzles, rng=random):
+        """
+        Draw a fresh quiz and puzzle set for doc_key, or None without a bank.
+        """
+        with self._lock:
+            bank = self._get(doc_key)
+            if bank is None:
+                return None
+            return {"quiz": bank.draw_quiz(questions, rng), "puzzles": bank.draw_puzzles(puzzles, rng)}
+
+    def clear(self):
+        with self._lock:
+            self._banks.clear()
+
+    def _get(self, doc_key):
+        entry = self._banks.get(doc_key) if doc_key else None
+        if entry is None:
+            return None
+        if entry[0] < time.time():
+            del self._banks[doc_key]
+            return None
+        self._banks.move_to_end(doc_key)
+        return entry[1]
+
+    def __len__(self):
+        return len(self._banks)
+
+
+class SQLiteBankStore:
+    """
+    Question banks in a SQLite file, shared by every worker on the host.
+    Items are written once, one row each, when the bank is stored; a draw
+    only reads the k items it picks and records its swaps in a sparse
+    permutation table (slots never swapped have no row), all in one
+    transaction, so concurrent draws from several processes never repeat
+    an item and no draw rewrites the bank.
+    """
+
+    def __init__(self, path, ttl=DEFAULT_TTL):
+        self.path = path
+        self.ttl = ttl
+        self._local = threading.local()
+        with self._connect() as conn:
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS banks "
+                "(doc_key TEXT NOT NULL, kind TEXT NOT NULL, size INTEGER NOT NULL, remaining INTEGER NOT NULL, "
+                "expires REAL NOT NULL, PRIMARY KEY (doc_key, kind))"
+            )
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS bank_items "
+                "(doc_key TEXT NOT NULL, kind TEXT NOT NULL, position INTEGER NOT NULL, data BLOB NOT NULL, "
+                "PRIMARY KEY (doc_key, kind, position))"
+            )
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS bank_order "
+                "(doc_key TEXT NOT NULL, kind TEXT NOT NULL, slot INTEGER NOT NULL, position INTEGER NOT NULL, "
+                "PRIMARY KEY (doc_key, kind, slot))"
+            )
+            conn.execute("CREATE INDEX IF NOT EXISTS banks_expires ON banks (expires)")
+
+    def _connect(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            # Autocommit mode, so draws can open their own BEGIN IMMEDIATE.
+            conn = sqlite3.connect(self.path, timeout=10, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            self._local.conn = conn
+        return conn
+
+    def has(self, doc_key):
+        if not doc_key:
+            return False
+        row = self._connect().execute(
+            "SELECT 1 FROM banks WHERE doc_key = ? AND expires >= ?", (doc_key, time.time())
+        ).fetchone()
+        return row is not None
+
+    def put(self, doc_key, bank):
+        conn = self._connect()
+        expires = time.time() + self.ttl
+        with _transaction(conn):
+            self._delete(conn, doc_key)
+            for kind in KINDS:
+                items = getattr(bank, kind)
+                conn.execute(
+                    "INSERT INTO banks (doc_key, kind, size, remaining, expires) VALUES (?, ?, ?, ?, ?)",
+                    (doc_key, kind, len(items), bank.remaining[kind], expires),
+                )
+                conn.executemany(
+                    "INSERT INTO bank_items (doc_key, kind, position, data) VALUES (?, ?, ?, ?)",
+                    ((doc_key, kind, i, encode(item)) for i, item in enumerate(items)),
+                )
+
+    def draw(self, doc_key, questions, puzzles, rng=random):
+        """
+        Draw a fresh quiz and puzzle set for doc_key, or None without a bank.
+        """
+        if not doc_key:
+            return None
+        conn = self._connect()
+        with _transaction(conn):
+            rows = conn.execute(
+                "SELECT kind, size, remaining FROM banks WHERE doc_key = ? AND expires >= ?", (doc_key, time.time())
+            ).fetchall()
+            if not rows:
+                return None
+            state = {kind: (size, remaining) for kind, size, remaining in rows}
+            drawn = {}
+            for kind, k in (("questions", questions), ("puzzles", puzzles)):
+                size, remaining = state[kind]
+                order = _SparseOrder(conn, doc_key, kind)
+                items = _ItemLoader(conn, doc_key, kind)
+                positions, remaining = partial_shuffle(order, size, remaining, k, rng,
+                                                       lambda position: KEYS[kind](items[position]))
+                order.save()
+                conn.execute("UPDATE banks SET remaining = ? WHERE doc_key = ? AND kind = ?",
+                             (remaining, doc_key, kind))
+                drawn[kind] = [items[position] for position in positions]
+        return {"quiz": [unpack_question(q) for q in drawn["questions"]], "puzzles": drawn["puzzles"]}
+
+    def clear(self):
+        conn = self._connect()
+        with _transaction(conn):
+            for table in ("banks", "bank_items", "bank_order"):
+                conn.execute(f"DELETE FROM {table}")
+
+    def purge_expired(self):
+        conn = self._connect()
+        with _transaction(conn):
+            expired = [row[0] for row in conn.execute(
+                "SELECT DISTINCT doc_key FROM banks WHERE expires < ?", (time.time(),)
+            )]
+            for doc_key in expired:
+                self._delete(conn, doc_key)
+
+    @staticmethod
+    def _delete(conn, doc_key):
+        for table in ("banks", "bank_items", "bank_order"):
+            conn.execute(f"DELETE FROM {table} WHERE doc_key = ?", (doc_key,))
+
+
+class _transaction:
+    """
+    BEGIN IMMEDIATE ... COMMIT on an autocommit connection, rolled back on
+    error. Taking the write lock up front keeps concurrent draws serialised.
+    """
+
+    def __init__(self, conn):
+        self.conn = conn
+
+    def __enter__(self):
+        self.conn.execute("BEGIN IMMEDIATE")
+        return self.conn
+
+    def __exit__(self, exc_type, exc, tb):
+        self.conn.execute("COMMIT" if exc_type is None else "ROLLBACK")
+        return False
+
+
+class _SparseOrder:
+    """
+    The permutation of one bank's items as partial_shuffle sees it: slot i
+    holds item position i unless a bank_order row says otherwise. Slots are
+    read on demand and changed ones written back by save().
+    """
+
+    def __init__(self, conn, doc_key, kind):
+        self.conn = conn
+        self.doc_key = doc_key
+        self.kind = kind
+        self.changed = {}
+
+    def __getitem__(self, slot):
+        if slot in self.changed:
+            return self.changed[slot]
+        row = self.conn.execute(
+            "SELECT position FROM bank_order WHERE doc_key = ? AND kind = ? AND slot = ?",
+            (self.doc_key, self.kind, slot),
+        ).fetchone()
+        return row[0] if row else slot
+
+    def __setitem__(self, slot, position):
+        self.changed[slot] = position
+
+    def save(self):
+        moved = [(self.doc_key, self.kind, slot, position) for slot, position in self.changed.items()
+                 if slot != position]
+        back = [(self.doc_key, self.kind, slot) for slot, position in self.changed.items() if slot == position]
+        self.conn.executemany(
+            "INSERT OR REPLACE INTO bank_order (doc_key, kind, slot, position) VALUES (?, ?, ?, ?)", moved
+        )
+        self.conn.executemany("DELETE FROM bank_order WHERE doc_key = ? AND kind = ? AND slot = ?", back)
+
+
+class _ItemLoader:
+    """
+    Bank items by position, read from bank_items once each.
+    """
+
+    def __init__(self, conn, doc_key, kind):
+        self.conn = conn
+        self.doc_key = doc_key
+        self.kind = kind
+        self._items = {}
+
+    def __getitem__(self, position):
+        item = self._items.get(position)
+        if item is None:
+            row = self.conn.execute(
+                "SELECT data FROM bank_items WHERE doc_key = ? AND kind = ? AND position = ?",
+                (self.doc_key, self.kind, position),
+            ).fetchone()
+            item = self._items[position] = decode(row[0])
+        return item
+
+
+def create_bank_store(url="memory", ttl=DEFAULT_TTL, max_entries=DEFAULT_MAX_BANKS):
+    """
+    Build a bank store from the same URLs as quiz_store.create_store:
+    "memory" or "sqlite:///path/to/quizzes.db" (banks get tables of their own).
+    """
+    if url.startswith("sqlite:///"):
+        return SQLiteBankStore(url[len("sqlite:///"):], ttl=ttl)
+    if url == "memory":
+        return MemoryBankStore(max_entries=max_entries, ttl=ttl)
+    raise ValueError(f"Unknown bank store: {url}")
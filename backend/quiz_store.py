@@ -0,0 +1,141 @@
+import json
+import sqlite3
+import threading
+import time
+import uuid
+import zlib
+from collections import OrderedDict
+
+DEFAULT_TTL = 6 * 60 * 60
+
+
+def encode(record):
+    """
+    Compact serialized form of a quiz record: minified JSON, zlib-compressed.
+    """
+    return zlib.compress(json.dumps(record, separators=(",", ":")).encode("utf-8"))
+
+
+def decode(blob):
+    return json.loads(zlib.decompress(blob).decode("utf-8"))
+
+
+def new_quiz_id():
+    return uuid.uuid4().hex
+
+
+class MemoryStore:
+    """
+    In-process quiz store with LRU eviction and a per-entry TTL.
+    """
+
+    def __init__(self, max_entries=1000, ttl=DEFAULT_TTL):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def put(self, record):
+        quiz_id = new_quiz_id()
+        self.set(quiz_id, record)
+        return quiz_id
+
+    def set(self, quiz_id, record):
+        blob = encode(record)
+        with self._lock:
+            self._entries[quiz_id] = (time.time() + self.ttl, blob)
+            self._entries.move_to_end(quiz_id)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def get(self, quiz_id):
+        if not quiz_id:
+            return None
+        with self._lock:
+            entry = self._entries.get(quiz_id)
+            if entry is None:
+                return None
+            expires, blob = entry
+            if expires < time.time():
+                del self._entries[quiz_id]
+                return None
+            self._entries.move_to_end(quiz_id)
+        return decode(blob)
+
+    def delete(self, quiz_id):
+        with self._lock:
+            self._entries.pop(quiz_id, None)
+
+    def purge_expired(self):
+        now = time.time()
+        with self._lock:
+            for quiz_id in [k for k, (expires, _) in self._entries.items() if expires < now]:
+                del self._entries[quiz_id]
+
+    def __len__(self):
+        return len(self._entries)
+
+
+class SQLiteStore:
+    """
+    Quiz store backed by a SQLite file, shared by every worker on the host.
+    Expired rows are skipped on read and removed by purge_expired().
+    """
+
+    def __init__(self, path, ttl=DEFAULT_TTL):
+        self.path = path
+        self.ttl = ttl
+        self._local = threading.local()
+        with self._connect() as conn:
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS quizzes "
+                "(id TEXT PRIMARY KEY, data BLOB NOT NULL, expires REAL NOT NULL)"
+            )
+            conn.execute("CREATE INDEX IF NOT EXISTS quizzes_expires ON quizzes (expires)")
+
+    def _connect(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=10)
+            conn.execute("PRAGMA journal_mode=WAL")
+            self._local.conn = conn
+        return conn
+
+    def put(self, record):
+        quiz_id = new_quiz_id()
+        self.set(quiz_id, record)
+        return quiz_id
+
+    def set(self, quiz_id, record):
+        with self._connect() as conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO quizzes (id, data, expires) VALUES (?, ?, ?)",
+                (quiz_id, encode(record), time.time() + self.ttl),
+            )
+
+    def get(self, quiz_id):
+        if not quiz_id:
+            return None
+        row = self._connect().execute(
+            "SELECT data FROM quizzes WHERE id = ? AND expires >= ?", (quiz_id, time.time())
+        ).fetchone()
+        return decode(row[0]) if row else None
+
+    def delete(self, quiz_id):
+        with self._connect() as conn:
+            conn.execute("DELETE FROM quizzes WHERE id = ?", (quiz_id,))
+
+    def purge_expired(self):
+        with self._connect() as conn:
+            conn.execute("DELETE FROM quizzes WHERE expires < ?", (time.time(),))
+
+
+def create_store(url="memory", ttl=DEFAULT_TTL):
+    """
+    Build a store from a URL: "memory" or "sqlite:///path/to/quizzes.db".
+    """
+    if url.startswith("sqlite:///"):
+        return SQLiteStore(url[len("sqlite:///"):], ttl=ttl)
+    if url == "memory":
+        return MemoryStore(ttl=ttl)
+    raise ValueError(f"Unknown quiz store: {url}")
@@ -0,0 +1,142 @@
+import hashlib
+import secrets
+import threading
+from collections import OrderedDict
+
+from flask import render_template
+from markupsafe import escape
+
+from instrumentation import timed
+
+
+def new_marker():
+    """
+    Delimiter for the slots of one page. It is random, so no document text
+    rendered into the page can be mistaken for a slot.
+    """
+    return f"slot{secrets.token_hex(8)}"
+
+
+class Slot:
+    """
+    Placeholder rendered into a template at compile time and filled in per
+    request. It renders as its name between two copies of the page's
+    marker, which Jinja does not escape.
+    """
+
+    def __init__(self, name, marker):
+        self.name = name
+        self.marker = marker
+
+    def __str__(self):
+        return f"{self.marker}{self.name}{self.marker}"
+
+    __html__ = __str__
+
+
+class CompiledPage:
+    """
+    A rendered page split into static text and named slots. fill() only
+    joins strings, so per-request work is proportional to the number of
+    slots, not to the template.
+    """
+
+    def __init__(self, html, data=None, marker=None):
+        # data is whatever fill()'s caller needs besides the page, such as
+        # the answer key of a result page; marker delimits its slots.
+        self.data = data
+        parts = html.split(marker) if marker else [html]
+        self.static = parts[0::2]
+        self.slots = parts[1::2]
+        self.etag = hashlib.sha1(html.encode("utf-8")).hexdigest()
+
+    def fill(self, values=None):
+        if not self.slots:
+            return self.static[0]
+        out = [self.static[0]]
+        for name, text in zip(self.slots, self.static[1:]):
+            out.append(escape(values[name]))
+            out.append(text)
+        return "".join(out)
+
+
+class PageCache:
+    """
+    Thread-safe LRU of compiled pages, keyed by (quiz_id, page, variant).
+    """
+
+    def __init__(self, max_entries=512):
+        self.max_entries = max_entries
+        self._pages = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get_or_compile(self, key, compile_page):
+        with self._lock:
+            page = self._pages.get(key)
+            if page is not None:
+                self._pages.move_to_end(key)
+                self.hits += 1
+                return page
+            self.misses += 1
+        with timed("render_compile"):
+            page = compile_page()
+        with self._lock:
+            self._pages[key] = page
+            while len(self._pages) > self.max_entries:
+                self._pages.popitem(last=False)
+        return page
+
+    def stats(self):
+        with self._lock:
+            return {"entries": len(self._pages), "max_entries": self.max_entries,
+                    "hits": self.hits, "misses": self.misses}
+
+
+def compile_quiz_page(quiz, room=None):
+    return CompiledPage(render_template("quiz.html", quiz=quiz, room=room))
+
+
+def compile_puzzle_page(puzzles):
+    return CompiledPage(render_template("puzzle.html", puzzles=puzzles))
+
+
+def _answer_slots(i, marker):
+    return {"user": Slot(f"user{i}", marker), "status": Slot(f"status{i}", marker),
+            "status_class": Slot(f"class{i}", marker)}
+
+
+def compile_quiz_result(quiz):
+    marker = new_marker()
+    results = [
+        {"question": q["question"], "correct": q["answer"], **_answer_slots(i, marker)}
+        for i, q in enumerate(quiz)
+    ]
+    html = render_template("quiz_result.html", results=results, score=Slot("score", marker), total=len(quiz))
+    return CompiledPage(html, data=quiz, marker=marker)
+
+
+def compile_puzzle_result(puzzles):
+    marker = new_marker()
+    results = [
+        {"puzzle": p["puzzle"], "answer": p["answer"].lower(), **_answer_slots(i, marker)}
+        for i, p in enumerate(puzzles)
+    ]
+    html = render_template("puzzle_result.html", results=results, correct=Slot("score", marker),
+                           total=len(puzzles))
+    return CompiledPage(html, data=puzzles, marker=marker)
+
+
+def fill_result(page, users, flags, marks=("✅", "❌")):
+    """
+    Fill a compiled quiz or puzzle result page with one submission's
+    answers (see grading.mark_quiz) and correctness flags.
+    """
+    values = {"score": sum(flags)}
+    for i, (user, ok) in enumerate(zip(users, flags)):
+        values[f"user{i}"] = user or "No Answer"
+        values[f"status{i}"] = marks[0] if ok else marks[1]
+        values[f"class{i}"] = "correct" if ok else "incorrect"
+    with timed("render"):
+        return page.fill(values)
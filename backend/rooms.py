@@ -0,0 +1,145 @@
+import secrets
+import string
+import threading
+import time
+
+# Room codes are short enough to read out in class, from an alphabet without
+# look-alike characters.
+CODE_ALPHABET = "".join(c for c in string.ascii_uppercase + string.digits if c not in "0O1IL")
+CODE_LENGTH = 6
+
+
+class ScoreAggregate:
+    """
+    Running totals for one kind of submission (quiz or puzzles). Each
+    submission updates the totals in O(questions), independent of how many
+    submissions came before; a participant's resubmission replaces their
+    previous contribution instead of being counted twice.
+    """
+
+    def __init__(self, total):
+        self.total = total
+        self.submissions = 0
+        self.score_sum = 0
+        self.histogram = [0] * (total + 1)
+        self.question_correct = [0] * total
+        self._by_participant = {}
+
+    def record(self, participant, correct_flags):
+        flags = [bool(f) for f in correct_flags[:self.total]]
+        flags += [False] * (self.total - len(flags))
+        previous = self._by_participant.get(participant)
+        if previous is not None:
+            self._apply(previous, -1)
+        else:
+            self.submissions += 1
+        self._apply(flags, 1)
+        self._by_participant[participant] = flags
+
+    def record_many(self, participants, correct):
+        """
+        Record one row of correct (a submissions x questions matrix, such
+        as grading.BatchGrade.correct) per participant.
+        """
+        for participant, flags in zip(participants, correct):
+            self.record(participant, flags.tolist() if hasattr(flags, "tolist") else flags)
+
+    def _apply(self, flags, sign):
+        score = sum(flags)
+        self.score_sum += sign * score
+        self.histogram[score] += sign
+        for i, flag in enumerate(flags):
+            if flag:
+                self.question_correct[i] += sign
+
+    def to_dict(self):
+        n = self.submissions
+        return {
+            "submissions": n,
+            "total": self.total,
+            "mean_score": self.score_sum / n if n else 0.0,
+            "score_histogram": list(self.histogram),
+            "question_accuracy": [c / n if n else 0.0 for c in self.question_correct],
+        }
+
+
+class Room:
+    def __init__(self, code, quiz_id, quiz_total, puzzle_total):
+        self.code = code
+        self.quiz_id = quiz_id
+        self.created = time.time()
+        # Given only to whoever opened the room; it authorises recording
+        # answers on behalf of others (see is_owner).
+        self.owner_token = secrets.token_urlsafe(16)
+        self.quiz = ScoreAggregate(quiz_total)
+        self.puzzles = ScoreAggregate(puzzle_total)
+        self.lock = threading.Lock()
+
+    def is_owner(self, token):
+        return bool(token) and secrets.compare_digest(token, self.owner_token)
+
+    def record_quiz(self, participant, correct_flags):
+        with self.lock:
+            self.quiz.record(participant, correct_flags)
+
+    def record_puzzles(self, participant, correct_flags):
+        with self.lock:
+            self.puzzles.record(participant, correct_flags)
+
+    def record_many(self, participants, quiz_correct, puzzle_correct):
+        """
+        Record a batch of graded submissions (see grading.grade_quiz_batch)
+        under one lock acquisition.
+        """
+        with self.lock:
+            self.quiz.record_many(participants, quiz_correct)
+            self.puzzles.record_many(participants, puzzle_correct)
+
+    def to_dict(self):
+        with self.lock:
+            return {
+                "code": self.code,
+                "quiz_id": self.quiz_id,
+                "created": self.created,
+                "quiz": self.quiz.to_dict(),
+                "puzzles": self.puzzles.to_dict(),
+            }
+
+
+class RoomRegistry:
+    """
+    In-process registry of classroom rooms. Each room shares one stored quiz
+    between all participants and aggregates their results live.
+    Rooms older than ttl seconds are dropped when new rooms are created.
+    """
+
+    def __init__(self, ttl=12 * 60 * 60):
+        self.ttl = ttl
+        self._rooms = {}
+        self._lock = threading.Lock()
+
+    def create(self, quiz_id, quiz_total, puzzle_total):
+        with self._lock:
+            self._purge_expired()
+            code = _new_code()
+            while code in self._rooms:
+                code = _new_code()
+            room = Room(code, quiz_id, quiz_total, puzzle_total)
+            self._rooms[code] = room
+            return room
+
+    def get(self, code):
+        with self._lock:
+            return self._rooms.get((code or "").upper())
+
+    def __len__(self):
+        return len(self._rooms)
+
+    def _purge_expired(self):
+        cutoff = time.time() - self.ttl
+        for code in [c for c, room in self._rooms.items() if room.created < cutoff]:
+            del self._rooms[code]
+
+
+def _new_code():
+    return "".join(secrets.choice(CODE_ALPHABET) for _ in range(CODE_LENGTH))
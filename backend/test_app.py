@@ -0,0 +1,93 @@
+import io
+import threading
+import time
+
+import app as quiz_app
+
+TEXT = ("Python is a programming language used by developers around the world. "
+        "The farmer harvested melons in the field. Elephants roam the savanna every summer. ") * 20
+
+
+def _wait(client, quiz_path):
+    for _ in range(250):
+        page = client.get(quiz_path)
+        if b"Submit Answers" in page.data:
+            return page
+        time.sleep(0.02)
+    raise AssertionError("quiz was not generated")
+
+
+def _upload(client, data, salt):
+    response = client.post("/upload", data={"file": (io.BytesIO(data), "notes.txt"), "salt": salt},
+                           content_type="multipart/form-data")
+    return response.headers["Location"]
+
+
+def _wait_for_bank(doc_key):
+    for _ in range(250):
+        if quiz_app.question_banks.has(doc_key):
+            return
+        time.sleep(0.02)
+    raise AssertionError("upload was not indexed")
+
+
+def test_large_upload_streams_first_quiz_then_indexes(monkeypatch):
+    monkeypatch.setattr(quiz_app, "STREAM_MIN_BYTES", 0)
+    # Hold indexing back until the streamed quiz has been opened.
+    opened = threading.Event()
+    index_upload = quiz_app.index_upload
+    monkeypatch.setattr(quiz_app, "index_upload", lambda *args: opened.wait(5) and index_upload(*args))
+    client = quiz_app.app.test_client()
+    quiz_path = _upload(client, TEXT.encode() + b"Streamed upload.", "streamed")
+    _wait(client, quiz_path)
+    opened.set()
+    snapshot = client.get(quiz_path + "/snapshot").get_json()
+    assert snapshot["streamed"] is True
+    stored = quiz_app.quiz_store.get(quiz_path.rsplit("/", 1)[1])
+    # The full analysis and the question bank follow in a second job, and
+    # the quiz already opened keeps its questions.
+    _wait_for_bank(snapshot["doc_key"])
+    assert quiz_app.analysis_cache.get(snapshot["doc_key"]) is not None
+    assert client.get(quiz_path + "/snapshot").get_json() == snapshot
+    assert quiz_app.quiz_store.get(quiz_path.rsplit("/", 1)[1]) == stored
+    assert client.post("/new_quiz?format=json").status_code == 200
+
+
+def test_two_uploads_of_a_large_file_give_the_same_quiz(monkeypatch):
+    monkeypatch.setattr(quiz_app, "STREAM_MIN_BYTES", 0)
+    client = quiz_app.app.test_client()
+    data = TEXT.encode() + b"Uploaded twice."
+    first = _upload(client, data, "twice")
+    first_id = first.rsplit("/", 1)[1]
+    for _ in range(250):
+        job = quiz_app.upload_jobs.get(first_id)
+        if job.result is not None and job.result.get("streamed") is False:
+            break
+        time.sleep(0.02)
+    # Indexing replaced the streamed quiz before anyone opened it.
+    assert job.result["streamed"] is False
+    second = _upload(client, data, "twice")
+    _wait(client, first)
+    _wait(client, second)
+    records = [quiz_app.quiz_store.get(path.rsplit("/", 1)[1]) for path in (first, second)]
+    assert records[0]["quiz"] == records[1]["quiz"] and records[0]["puzzles"] == records[1]["puzzles"]
+    snapshots = [client.get(path + "/snapshot").get_json() for path in (first, second)]
+    assert snapshots[0] == snapshots[1] and snapshots[0]["streamed"] is False
+
+
+def test_long_upload_is_analysed_from_an_iterator(monkeypatch):
+    seen = {}
+
+    def spy(blocks, **kwargs):
+        seen["blocks"] = blocks
+        return real(blocks, **kwargs)
+
+    real = quiz_app.analyze_bounded
+    monkeypatch.setattr(quiz_app, "analyze_bounded", spy)
+    monkeypatch.setattr(quiz_app, "BOUNDED_MIN_CHARS", 500)
+    analysis = quiz_app._analyze_upload(TEXT.encode(), ".txt", "test-bounded-upload", quiz_app.StageTimer())
+    assert not isinstance(seen["blocks"], (list, str)) and analysis.sentences
+    seen.clear()
+    monkeypatch.setattr(quiz_app, "BOUNDED_MIN_CHARS", 10 * len(TEXT))
+    assert quiz_app._analyze_upload(TEXT.encode(), ".txt", "test-cached-upload", quiz_app.StageTimer()).sentences
+    assert not seen
@@ -0,0 +1,107 @@
+import asyncio
+import threading
+
+from flask import Flask
+
+import app as quiz_app
+from asgi import AsyncFlask, application, build_environ
+
+BOUNDARY = "quizsparkboundary"
+TEXT = ("Python is a programming language. Developers use Python for data science. "
+        "The language has a large community of developers. ") * 5
+
+
+def _multipart(filename, content):
+    return (
+        f"--{BOUNDARY}\r\n"
+        f'Content-Disposition: form-data; name="file"; filename="{filename}"\r\n'
+        "Content-Type: text/plain\r\n\r\n"
+    ).encode() + content + f"\r\n--{BOUNDARY}--\r\n".encode()
+
+
+def _request(method, path, body=b"", headers=(), chunk_size=None, app=application):
+    path, _, query = path.partition("?")
+    scope = {
+        "type": "http", "method": method, "path": path, "query_string": query.encode(),
+        "headers": [(k.encode(), v.encode()) for k, v in headers], "http_version": "1.1",
+    }
+    chunk_size = chunk_size or max(len(body), 1)
+    messages = [
+        {"type": "http.request", "body": body[i:i + chunk_size], "more_body": i + chunk_size < len(body)}
+        for i in range(0, max(len(body), 1), chunk_size)
+    ]
+    sent = []
+
+    async def receive():
+        return messages.pop(0)
+
+    async def send(message):
+        sent.append(message)
+
+    asyncio.run(app(scope, receive, send))
+    start = sent[0]
+    headers = {k.decode(): v.decode() for k, v in start["headers"]}
+    return start["status"], headers, b"".join(m.get("body", b"") for m in sent[1:])
+
+
+def test_build_environ_maps_headers_and_body():
+    scope = {
+        "method": "POST", "path": "/upload", "query_string": b"format=json",
+        "headers": [(b"content-type", b"text/plain"), (b"x-forwarded-for", b"1.2.3.4")],
+    }
+    environ = build_environ(scope, b"hello")
+    assert environ["CONTENT_TYPE"] == "text/plain"
+    assert environ["CONTENT_LENGTH"] == "5"
+    assert environ["HTTP_X_FORWARDED_FOR"] == "1.2.3.4"
+    assert environ["QUERY_STRING"] == "format=json"
+    assert environ["wsgi.input"].read() == b"hello"
+
+
+def test_upload_then_quiz_page_waits_for_job():
+    status, headers, _ = _request(
+        "POST", "/upload", _multipart("notes.txt", TEXT.encode()),
+        headers=[("content-type", f"multipart/form-data; boundary={BOUNDARY}")], chunk_size=64,
+    )
+    assert status == 302
+    quiz_path = headers["location"].replace("http://localhost", "")
+    cookie = headers["set-cookie"].split(";")[0] if "set-cookie" in headers else ""
+    status, _, body = _request("GET", quiz_path, headers=[("cookie", cookie)])
+    assert status == 200
+    assert b"Submit Answers" in body
+
+    # The bank went to the bank store rather than staying on the job.
+    job = application.jobs.get(quiz_path.rsplit("/", 1)[1])
+    assert "bank" not in job.result
+    assert quiz_app.question_banks.has(job.result["doc_key"])
+
+    # The stored quiz outlives its job.
+    with application.jobs._lock:
+        application.jobs._jobs.pop(quiz_path.rsplit("/", 1)[1])
+    status, _, body = _request("GET", quiz_path)
+    assert status == 200 and b"Submit Answers" in body
+
+
+def test_oversized_upload_is_rejected_without_reading_it_all():
+    limit = application.flask_app.config["MAX_CONTENT_LENGTH"]
+    application.flask_app.config["MAX_CONTENT_LENGTH"] = 1024
+    try:
+        status, _, _ = _request(
+            "POST", "/upload?format=json", _multipart("big.txt", b"x" * 10_000),
+            headers=[("content-type", f"multipart/form-data; boundary={BOUNDARY}")], chunk_size=512,
+        )
+    finally:
+        application.flask_app.config["MAX_CONTENT_LENGTH"] = limit
+    assert status == 413
+
+
+def test_views_run_off_the_event_loop_unless_inline():
+    flask_app = Flask(__name__)
+
+    @flask_app.route("/slow")
+    @flask_app.route("/metrics")
+    def where():
+        return threading.current_thread().name
+
+    adapter = AsyncFlask(flask_app, threads=1)
+    assert _request("GET", "/slow", app=adapter)[2].startswith(b"quizspark-asgi")
+    assert _request("GET", "/metrics", app=adapter)[2] == threading.current_thread().name.encode()
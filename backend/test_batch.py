@@ -0,0 +1,68 @@
+import json
+import os
+import zipfile
+
+import pytest
+
+from batch import ArchiveTooLarge, extract_archive, find_documents, iter_batch, main
+
+
+@pytest.fixture
+def corpus(tmp_path):
+    (tmp_path / "week1.txt").write_text("Python programming language provides powerful features for developers.")
+    (tmp_path / "sub").mkdir()
+    (tmp_path / "sub" / "week2.txt").write_text("The elephant is the largest land animal in the savanna.")
+    (tmp_path / "notes.md").write_text("ignored")
+    return tmp_path
+
+
+def test_find_documents_filters_extensions(corpus):
+    found = [os.path.relpath(p, corpus) for p in find_documents(str(corpus))]
+    assert found == [os.path.join("sub", "week2.txt"), "week1.txt"]
+
+
+def test_iter_batch_directory(corpus):
+    results = list(iter_batch(str(corpus), workers=1, files_per_task=1))
+    assert sorted(r["file"] for r in results) == [os.path.join("sub", "week2.txt"), "week1.txt"]
+    assert all("quiz" in r and "puzzles" in r for r in results)
+
+
+def test_extract_archive_skips_unsafe_members(tmp_path):
+    archive = tmp_path / "docs.zip"
+    with zipfile.ZipFile(archive, "w") as zf:
+        zf.writestr("lecture.txt", "content")
+        zf.writestr("../escape.txt", "bad")
+    out = tmp_path / "out"
+    out.mkdir()
+    extract_archive(str(archive), str(out))
+    assert (out / "lecture.txt").exists()
+    assert not (tmp_path / "escape.txt").exists()
+
+
+def test_extract_archive_enforces_file_and_size_caps(tmp_path):
+    archive = tmp_path / "docs.zip"
+    with zipfile.ZipFile(archive, "w", zipfile.ZIP_DEFLATED) as zf:
+        for i in range(3):
+            zf.writestr(f"lecture{i}.txt", "a" * 10_000)
+        zf.writestr("image.png", "not counted")
+    extract_archive(str(archive), str(tmp_path / "ok"), max_files=3, max_bytes=30_000)
+    assert sorted(os.listdir(tmp_path / "ok")) == ["lecture0.txt", "lecture1.txt", "lecture2.txt"]
+    with pytest.raises(ArchiveTooLarge):
+        extract_archive(str(archive), str(tmp_path / "files"), max_files=2)
+    with pytest.raises(ArchiveTooLarge):
+        extract_archive(str(archive), str(tmp_path / "bytes"), max_bytes=25_000)
+
+
+def test_iter_batch_uses_shared_pool(corpus):
+    from concurrent.futures import ThreadPoolExecutor
+    with ThreadPoolExecutor(max_workers=1) as pool:
+        results = list(iter_batch(str(corpus), files_per_task=1, pool=pool))
+    assert len(results) == 2
+
+
+def test_cli_writes_json_lines(corpus, tmp_path, capsys):
+    output = tmp_path / "out.jsonl"
+    assert main([str(corpus), "--workers", "1", "--output", str(output)]) == 0
+    lines = [json.loads(line) for line in output.read_text().splitlines()]
+    assert len(lines) == 2
+    assert "docs/s" in capsys.readouterr().err
@@ -0,0 +1,93 @@
+import pytest
+
+from cache import AnalysisCache, content_key
+from text_utils import DocumentAnalysis, SentenceCandidate
+
+
+def _entry(word="python"):
+    analysis = DocumentAnalysis([SentenceCandidate(f"About {word}.", [word])])
+    analysis.word_counts[word] += 1
+    return analysis
+
+
+def test_content_key_depends_on_bytes_and_params():
+    assert content_key(b"abc") == content_key(b"abc")
+    assert content_key(b"abc") != content_key(b"abd")
+    assert content_key(b"abc", ext=".pdf") != content_key(b"abc", ext=".txt")
+
+
+def test_cache_hit_and_miss_stats():
+    cache = AnalysisCache(max_entries=2)
+    assert cache.get("k") is None
+    cache.put("k", _entry())
+    analysis = cache.get("k")
+    assert analysis.sentences[0].text == "About python."
+    assert cache.stats()["hits"] == 1
+    assert cache.stats()["misses"] == 1
+
+
+def test_cache_lru_eviction():
+    cache = AnalysisCache(max_entries=2)
+    cache.put("a", _entry("alpha"))
+    cache.put("b", _entry("beta"))
+    cache.get("a")
+    cache.put("c", _entry("gamma"))
+    assert cache.get("b") is None
+    assert cache.get("a") is not None
+    assert cache.get("c") is not None
+
+
+def test_cache_disk_tier_survives_memory_eviction(tmp_path):
+    cache = AnalysisCache(max_entries=1, disk_dir=str(tmp_path))
+    cache.put("a", _entry("alpha"))
+    cache.put("b", _entry("beta"))
+    analysis = cache.get("a")
+    assert analysis.sentences[0].nouns == ["alpha"]
+    assert analysis.word_counts["alpha"] == 1
+    assert cache.stats()["disk_hits"] == 1
+
+
+@pytest.mark.parametrize("content", ['{"analysis": {"sent', '{"sentences": []}', '{"analysis": [1, 2]}'])
+def test_cache_treats_unreadable_disk_entries_as_misses(tmp_path, content):
+    cache = AnalysisCache(max_entries=1, disk_dir=str(tmp_path))
+    (tmp_path / "bad.json").write_text(content)
+    assert cache.get("bad") is None and cache.stats()["misses"] == 1
+    cache.put("bad", _entry("alpha"))
+    cache.clear()
+    assert cache.get("bad").sentences[0].nouns == ["alpha"]
+
+
+def test_upload_key_covers_analysis_limits():
+    import app as quiz_app
+    key = content_key(b"abc", ext=".pdf", **quiz_app.ANALYSIS_LIMITS)
+    assert key != content_key(b"abc", ext=".pdf", **{**quiz_app.ANALYSIS_LIMITS, "max_pages": 1})
+    assert key != content_key(b"abc", ext=".pdf", **{**quiz_app.ANALYSIS_LIMITS, "max_tokens": 10})
+
+
+def test_get_or_compute_calls_compute_once():
+    cache = AnalysisCache()
+    calls = []
+
+    def compute():
+        calls.append(1)
+        return _entry()
+
+    cache.get_or_compute("k", compute)
+    cache.get_or_compute("k", compute)
+    assert len(calls) == 1
+
+
+def test_cache_disk_tier_evicts_least_recently_used(tmp_path):
+    cache = AnalysisCache(max_entries=1, disk_dir=str(tmp_path))
+    cache.put("a", _entry("alpha"))
+    size = cache.stats()["disk_bytes"]
+    cache.max_disk_bytes = 2 * size + size // 2
+    cache.put("b", _entry("bravo"))
+    cache.get("a")
+    cache.put("c", _entry("gamma"))
+    assert sorted(p.name for p in tmp_path.iterdir()) == ["a.json", "c.json"]
+    assert cache.stats()["disk_bytes"] <= cache.max_disk_bytes
+    # A restarted cache picks up the files and the limit.
+    restarted = AnalysisCache(disk_dir=str(tmp_path), max_disk_bytes=size + size // 2)
+    assert len(list(tmp_path.iterdir())) == 1
+    assert restarted.stats()["disk_bytes"] <= size + size // 2
@@ -0,0 +1,60 @@
+import random
+
+from distractors import DistractorIndex
+
+STATS = {
+    "Paris": [5, "PROPN", "GPE"],
+    "London": [3, "PROPN", "GPE"],
+    "Berlin": [2, "PROPN", "GPE"],
+    "Einstein": [4, "PROPN", "PERSON"],
+    "apple": [6, "NOUN", ""],
+    "banana": [1, "NOUN", ""],
+}
+
+
+def test_distractors_prefer_same_bucket():
+    index = DistractorIndex(STATS)
+    picks = index.distractors("Paris", 2, random.Random(0))
+    assert sorted(picks) == ["Berlin", "London"]
+
+
+def test_distractors_fill_from_whole_document():
+    index = DistractorIndex(STATS)
+    picks = index.distractors("Einstein", 3, random.Random(0))
+    assert len(picks) == 3
+    assert "Einstein" not in picks
+    assert len(set(picks)) == 3
+
+
+def test_distractors_never_repeat_answer_case_insensitively():
+    index = DistractorIndex({"Apple": [1, "NOUN", ""], "apple": [1, "NOUN", ""], "pear": [1, "NOUN", ""]})
+    assert index.distractors("apple", 3) == ["pear"]
+
+
+def test_distractors_incremental_add():
+    index = DistractorIndex()
+    assert index.distractors("apple", 2) == []
+    index.add({"apple": [1, "NOUN", ""], "pear": [1, "NOUN", ""]})
+    index.add({"pear": [2, "NOUN", ""], "plum": [1, "NOUN", ""]})
+    assert sorted(index.distractors("apple", 2)) == ["pear", "plum"]
+    assert len(index) == 3
+
+
+class FakeVocab:
+    def __init__(self, table):
+        import numpy
+        self.table = {word: numpy.array(vector, dtype="float32") for word, vector in table.items()}
+        self.vectors = numpy.array(list(self.table.values()))
+
+    def has_vector(self, word):
+        return word in self.table
+
+    def get_vector(self, word):
+        return self.table[word]
+
+
+def test_distractors_prefer_vector_neighbours():
+    vocab = FakeVocab({"apple": [1, 0], "banana": [0.9, 0.1], "Paris": [0, 1], "London": [0.1, 0.9]})
+    index = DistractorIndex(STATS, vocab=vocab)
+    assert index.distractors("apple", 1, random.Random(0)) == ["banana"]
+    assert DistractorIndex(STATS, vocab=FakeVocab({})).distractors("apple", 1, random.Random(0))
@@ -0,0 +1,171 @@
+import io
+import os
+import tempfile
+import threading
+import time
+
+import pytest
+
+import extractors
+from extractors import ExtractionTimeout, PdfBackend, TimeBudget, backends_for, get_backend
+from text_utils import extract_text, extract_text_from_stream, iter_text
+
+
+class FakeBackend(PdfBackend):
+    """
+    In-memory backend: pages is a list of page texts, or an exception to
+    raise from open().
+    """
+
+    def __init__(self, name, pages, delay=0):
+        super().__init__()
+        self.name = name
+        self.pages = pages
+        self.delay = delay
+
+    def available(self):
+        return True
+
+    def open(self, source):
+        if isinstance(self.pages, Exception):
+            raise self.pages
+        return self.pages
+
+    def page_count(self, doc):
+        return len(doc)
+
+    def page_text(self, doc, index):
+        time.sleep(getattr(doc[index], "seconds", self.delay))
+        return str(doc[index])
+
+
+class StuckPage(str):
+    """
+    Page text that makes FakeBackend hang for seconds before returning it.
+    """
+
+    def __new__(cls, seconds):
+        page = super().__new__(cls, "stuck ")
+        page.seconds = seconds
+        return page
+
+
+@pytest.fixture
+def pdf_path():
+    from fpdf import FPDF
+    path = os.path.join(tempfile.gettempdir(), "test_extractors.pdf")
+    pdf = FPDF()
+    pdf.set_font("Arial", size=12)
+    for i in range(3):
+        pdf.add_page()
+        pdf.cell(200, 10, txt=f"Backend page {i} content.", ln=True)
+    pdf.output(path)
+    yield path
+    os.remove(path)
+
+
+@pytest.fixture
+def fake_registry(monkeypatch):
+    monkeypatch.setattr(extractors, "_registry", {})
+    return extractors._registry
+
+
+def test_backends_for_orders_by_priority_and_preference(fake_registry):
+    slow, fast = FakeBackend("slow", []), FakeBackend("fast", [])
+    extractors.register(".pdf", slow, 100)
+    extractors.register(".pdf", fast, 10)
+    assert [b.name for b in backends_for(".pdf")] == ["fast", "slow"]
+    assert [b.name for b in backends_for(".pdf", "slow")] == ["slow", "fast"]
+    assert get_backend(".pdf", "slow") is slow
+    with pytest.raises(KeyError):
+        get_backend(".pdf", "missing")
+
+
+def test_register_replaces_backend_with_same_name(fake_registry):
+    extractors.register(".pdf", FakeBackend("a", []), 10)
+    extractors.register(".pdf", FakeBackend("a", []), 50)
+    assert fake_registry[".pdf"][0][0] == 50 and len(fake_registry[".pdf"]) == 1
+
+
+def test_falls_back_when_backend_fails_or_finds_no_text(fake_registry, pdf_path):
+    extractors.register(".pdf", FakeBackend("broken", RuntimeError("bad xref")), 10)
+    extractors.register(".pdf", FakeBackend("empty", ["", " "]), 20)
+    extractors.register(".pdf", FakeBackend("good", ["one ", "two"]), 30)
+    assert extract_text(pdf_path) == "one two"
+    assert list(iter_text(pdf_path)) == ["one ", "two"]
+
+
+def test_time_budget_keeps_pages_read_so_far(fake_registry, pdf_path):
+    extractors.register(".pdf", FakeBackend("slow", [f"page{i} " for i in range(50)], delay=0.01), 10)
+    text = extract_text(pdf_path, time_budget=0.05)
+    assert text.startswith("page0 ") and "page49" not in text
+    assert 0 < len(list(iter_text(pdf_path, time_budget=0.05))) < 50
+
+
+def test_time_budget_counts_only_charged_time():
+    TimeBudget(None).check()
+    assert TimeBudget(None).remaining() is None
+    budget = TimeBudget(0.05)
+    time.sleep(0.1)
+    budget.check()
+    budget.charge(0.03)
+    assert budget.remaining() == pytest.approx(0.02)
+    budget.charge(0.03)
+    assert budget.remaining() == 0
+    with pytest.raises(ExtractionTimeout):
+        budget.check()
+
+
+def test_time_budget_ignores_time_spent_by_the_consumer(fake_registry, pdf_path):
+    extractors.register(".pdf", FakeBackend("fast", [f"page{i} " for i in range(5)]), 10)
+    pages = []
+    for page in iter_text(pdf_path, time_budget=0.5):
+        time.sleep(0.2)
+        pages.append(page)
+    assert len(pages) == 5
+
+
+def test_time_budget_kills_a_backend_stuck_inside_a_page(fake_registry, pdf_path):
+    pages = ["page0 ", "page1 ", StuckPage(30), "page3 "]
+    extractors.register(".pdf", FakeBackend("stuck", pages), 10)
+    start = time.monotonic()
+    assert extract_text(pdf_path, time_budget=1) == "page0 page1 "
+    assert time.monotonic() - start < 5
+    assert list(iter_text(pdf_path, time_budget=1)) == ["page0 ", "page1 "]
+
+
+@pytest.mark.parametrize("name", [b.name for b in backends_for(".pdf")])
+def test_installed_backends_extract_pdf(pdf_path, name):
+    text = extract_text(pdf_path, backend=name)
+    assert "Backend page 0 content." in text and "Backend page 2 content." in text
+    with open(pdf_path, "rb") as f:
+        stream = io.BytesIO(f.read())
+    assert extract_text_from_stream(stream, "upload.pdf", max_pages=1, backend=name).strip() == \
+        "Backend page 0 content."
+
+
+@pytest.mark.parametrize("name", [b.name for b in backends_for(".pdf")])
+def test_installed_backends_extract_from_many_threads(pdf_path, name):
+    texts = []
+
+    def extract():
+        texts.append(extract_text(pdf_path, pdf_workers=1, backend=name))
+
+    threads = [threading.Thread(target=extract) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert len(texts) == 8 and len(set(texts)) == 1 and "Backend page 2 content." in texts[0]
+
+
+def test_killable_backend_works_while_another_thread_holds_a_backend_lock(fake_registry, pdf_path):
+    extractors.register(".pdf", FakeBackend("fake", ["one ", "two"]), 10)
+    texts = []
+    worker = threading.Thread(target=lambda: texts.append(extract_text(pdf_path, time_budget=5)))
+    with extractors._PYMUPDF_LOCK:
+        # The fork waits for the lock, so the child never inherits it held.
+        worker.start()
+        time.sleep(0.1)
+    worker.join(10)
+    assert texts == ["one two"]
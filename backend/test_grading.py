@@ -0,0 +1,65 @@
+import pytest
+
+from grading import grade_quiz, grade_puzzles, grade_quiz_batch, grade_puzzles_batch
+
+QUIZ = [
+    {"question": "_____ is red.", "choices": ["apple", "banana", "grape"], "answer": "apple"},
+    {"question": "A _____ barks.", "choices": ["cat", "dog"], "answer": "dog"},
+]
+PUZZLES = [
+    {"puzzle": "Unscramble this word: nohtyp", "answer": "python"},
+    {"puzzle": "Unscramble this word: dlrow", "answer": "world"},
+]
+
+
+def test_grade_quiz_single_user():
+    results, score = grade_quiz(QUIZ, {"q0": "apple", "q1": "cat"})
+    assert score == 1
+    assert [r["status"] for r in results] == ["✅", "❌"]
+
+
+def test_grade_puzzles_normalises_answers():
+    results, correct = grade_puzzles(PUZZLES, {"p0": " Python ", "p1": "word"})
+    assert correct == 1
+    assert results[0]["is_correct"]
+
+
+def test_grade_quiz_batch_matches_per_user_loop():
+    submissions = [
+        {"q0": "apple", "q1": "dog"},
+        {"q0": "banana", "q1": "dog"},
+        {"q1": "cat"},
+        {"q0": "not an option", "q1": "dog"},
+    ]
+    batch = grade_quiz_batch(QUIZ, submissions)
+    assert batch.scores.tolist() == [grade_quiz(QUIZ, s)[1] for s in submissions]
+    data = batch.to_dict()
+    assert data["question_accuracy"] == [0.25, 0.75]
+    assert data["score_histogram"] == [1, 2, 1]
+
+
+def test_grade_quiz_batch_columnar_input():
+    columns = {"q0": ["apple", "grape", "apple"], "q1": ["dog", "dog", "cat"]}
+    assert grade_quiz_batch(QUIZ, columns).scores.tolist() == [2, 1, 1]
+
+
+def test_grade_batch_rejects_mismatched_columns():
+    with pytest.raises(ValueError):
+        grade_quiz_batch(QUIZ, {"q0": ["apple", "grape"], "q1": ["dog"]})
+    # Columns of other questions or fields count too.
+    with pytest.raises(ValueError):
+        grade_quiz_batch(QUIZ, {"q0": ["apple"], "participant": ["a", "b"]})
+    with pytest.raises(ValueError):
+        grade_puzzles_batch(PUZZLES, {"p0": "python"})
+
+
+def test_grade_puzzles_batch_matches_per_user_loop():
+    submissions = [{"p0": "PYTHON", "p1": "world"}, {"p0": "java"}, {}]
+    batch = grade_puzzles_batch(PUZZLES, submissions)
+    assert batch.scores.tolist() == [grade_puzzles(PUZZLES, s)[1] for s in submissions]
+
+
+def test_grade_batch_empty_quiz():
+    batch = grade_quiz_batch([], [{}, {}])
+    assert batch.to_dict()["submissions"] == 2
+    assert batch.scores.tolist() == [0, 0]
@@ -0,0 +1,47 @@
+import json
+import logging
+
+from instrumentation import (
+    Histogram, JsonLogFormatter, MetricsRegistry, begin_request, end_request, timed, annotate, registry,
+)
+
+
+def test_histogram_buckets():
+    histogram = Histogram((1, 10))
+    for value in (0.5, 5, 50):
+        histogram.observe(value)
+    data = histogram.to_dict()
+    assert data["count"] == 3
+    assert data["buckets"] == {"1": 1, "10": 1, "+Inf": 1}
+
+
+def test_timed_records_into_request_and_registry():
+    record = begin_request()
+    with timed("unit_stage"):
+        pass
+    annotate("unit_size", 42)
+    assert end_request() is record
+    assert "unit_stage" in record.stages
+    assert record.attrs["unit_size"] == 42
+    assert registry.to_dict()["unit_stage"]["count"] >= 1
+    assert record.server_timing(0.5).endswith("total;dur=500.00")
+
+
+def test_timed_as_decorator_outside_request():
+    metrics = MetricsRegistry()
+    metrics.observe("x", 0.2)
+
+    @timed("decorated_stage")
+    def work():
+        return 7
+
+    assert work() == 7
+    assert registry.to_dict()["decorated_stage"]["count"] >= 1
+    assert metrics.to_dict()["x"]["sum"] == 0.2
+
+
+def test_json_log_formatter_includes_extra_fields():
+    record = logging.makeLogRecord({"msg": "hello %s", "args": ("world",), "levelname": "INFO", "stage": "parse"})
+    data = json.loads(JsonLogFormatter().format(record))
+    assert data["msg"] == "hello world"
+    assert data["stage"] == "parse"
@@ -0,0 +1,130 @@
+import threading
+import time
+
+import pytest
+
+from jobs import JobQueue, QueueFull, StageTimer, DONE, FAILED
+
+
+def _work(value):
+    timer = StageTimer()
+    with timer.stage("double"):
+        result = value * 2
+    return result, timer.timings
+
+
+def _fail(value):
+    raise ValueError("bad input")
+
+
+def _wait(queue, job_id, timeout=5):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        job = queue.get(job_id)
+        if job.status in (DONE, FAILED):
+            return job
+        time.sleep(0.01)
+    raise AssertionError("job did not finish")
+
+
+def test_job_queue_runs_and_records_timings():
+    queue = JobQueue(max_workers=1)
+    job = _wait(queue, queue.submit(_work, 21))
+    assert job.status == DONE
+    assert job.result == 42
+    assert "double" in job.to_dict()["timings"]
+    stats = queue.stats()
+    assert stats["jobs"][DONE] == 1
+    assert stats["stages"]["double"]["count"] == 1
+    queue.shutdown()
+
+
+def test_job_queue_reports_failures():
+    queue = JobQueue(max_workers=1)
+    job = _wait(queue, queue.submit(_fail, 1))
+    assert job.status == FAILED
+    assert job.to_dict()["error"] == "bad input"
+    queue.shutdown()
+
+
+def test_job_queue_prunes_finished_jobs():
+    queue = JobQueue(max_workers=1, max_jobs=2)
+    ids = [queue.submit(_work, i) for i in range(2)]
+    for job_id in ids:
+        _wait(queue, job_id)
+    queue.submit(_work, 3)
+    assert queue.get(ids[0]) is None
+    queue.shutdown()
+
+
+def test_unknown_job_is_none():
+    queue = JobQueue(max_workers=1)
+    assert queue.get("missing") is None
+    queue.shutdown()
+
+
+def _block(event):
+    event.wait(5)
+    return None, {}
+
+
+def test_job_queue_rejects_work_beyond_max_pending():
+    queue = JobQueue(max_workers=1, max_pending=1)
+    release = threading.Event()
+    first = queue.submit(_block, release)
+    queue.submit(_block, release)
+    with pytest.raises(QueueFull):
+        queue.submit(_block, release)
+    assert queue.future(first) is not None
+    release.set()
+    _wait(queue, first)
+    assert queue.future(first) is None
+    queue.submit(_work, 1)
+    queue.shutdown()
+
+
+def test_job_queue_rejects_work_beyond_max_pending_bytes():
+    queue = JobQueue(max_workers=1, max_pending_bytes=100)
+    release = threading.Event()
+    # One job larger than the cap is accepted while nothing else is held.
+    first = queue.submit(_block, release, size=150)
+    with pytest.raises(QueueFull):
+        queue.submit(_block, release, size=1)
+    release.set()
+    _wait(queue, first)
+    queue.submit(_work, 1, size=60)
+    assert queue.stats()["max_pending_bytes"] == 100
+    queue.shutdown()
+
+
+def test_finished_jobs_drop_their_on_done_callback():
+    queue = JobQueue(max_workers=1)
+    payload = b"x" * 1000
+    done = _wait(queue, queue.submit(_work, 1, size=len(payload), on_done=lambda result: (payload, result)[1]))
+    failed = _wait(queue, queue.submit(_fail, 1, size=len(payload), on_done=lambda result: (payload, result)[1]))
+    assert done.result == 2 and failed.status == FAILED
+    assert done._on_done is None and failed._on_done is None
+    assert queue.stats()["pending_bytes"] == 0
+    queue.shutdown()
+
+
+def _timed_work(value):
+    from instrumentation import annotate, timed
+    with timed("inner"):
+        annotate("size", value)
+    return value, {}
+
+
+def test_job_keeps_timed_stages_and_annotations():
+    from instrumentation import begin_request, end_request, report
+    queue = JobQueue(max_workers=1)
+    job = _wait(queue, queue.submit(_timed_work, 7))
+    assert "inner" in job.stages and job.attrs == {"size": 7}
+    record = begin_request()
+    try:
+        report(job.stages, job.attrs, prefix="job.")
+    finally:
+        end_request()
+    assert "job.inner" in record.stages and record.attrs == {"job.size": 7}
+    assert "job.inner" in record.server_timing()
+    queue.shutdown()
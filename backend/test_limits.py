@@ -0,0 +1,102 @@
+import random
+
+import text_utils
+from limits import Reservoir, ResourceLimits, Vocabulary, rss_mb
+from text_utils import STREAM_CHUNK_SIZE, analyze_bounded, analyze_text, generate_puzzles, generate_quiz
+
+SENTENCES = [
+    f"The student number {i} studies the algorithm and the database carefully in the library."
+    for i in range(200)
+]
+
+
+def test_reservoir_keeps_at_most_size_items():
+    reservoir = Reservoir(10, random.Random(1))
+    for i in range(1000):
+        reservoir.offer(i)
+    assert len(reservoir) == 10 and reservoir.seen == 1000
+    assert len(set(reservoir.items)) == 10
+    # Not just the first items of the stream.
+    assert max(reservoir.items) >= 100
+
+
+def test_reservoir_is_roughly_uniform():
+    rng = random.Random(2)
+    hits = [0] * 10
+    for _ in range(2000):
+        reservoir = Reservoir(2, rng)
+        for i in range(10):
+            reservoir.offer(i)
+        for item in reservoir.items:
+            hits[item] += 1
+    assert all(300 < h < 500 for h in hits)
+
+
+def test_vocabulary_interns_and_counts():
+    vocab = Vocabulary(max_size=2)
+    assert vocab.add("apple") == 0
+    assert vocab.add("banana", 3) == 1
+    assert vocab.add("apple") == 0
+    assert vocab.add("cherry") is None and vocab.full()
+    assert vocab.count("apple") == 2 and vocab.count("banana") == 3 and vocab.count("cherry") == 0
+    assert "banana" in vocab and "cherry" not in vocab and len(vocab) == 2
+
+
+def test_rss_mb():
+    assert rss_mb() is None or rss_mb() > 0
+
+
+def test_analyze_bounded_samples_sentences_and_words():
+    text = " ".join(SENTENCES)
+    limits = ResourceLimits(sentence_sample=20, word_sample=3)
+    analysis, report = analyze_bounded(text, limits, random.Random(3))
+    full = analyze_text(text, chunk_size=STREAM_CHUNK_SIZE)
+    assert report["stopped"] is None and report["tokens"] == full.tokens
+    assert report["sentences_kept"] == len(analysis.sentences) == 20
+    assert report["sentences_seen"] == len([s for s in full.sentences if s.nouns])
+    assert set(analysis.word_counts) <= {w for w in full.word_counts if len(w) >= 6}
+    assert len(analysis.word_counts) == 3
+    assert all(analysis.word_counts[w] == full.word_counts[w] for w in analysis.word_counts)
+    # The sample keeps document order.
+    texts = [s.text for s in full.sentences]
+    positions = [texts.index(s.text) for s in analysis.sentences]
+    assert positions == sorted(positions)
+
+
+def test_analyze_bounded_stops_at_token_limit():
+    limits = ResourceLimits(max_tokens=100)
+    analysis, report = analyze_bounded(iter(SENTENCES), limits, chunk_size=500)
+    assert report["stopped"] == "tokens"
+    assert 100 <= report["tokens"] < analyze_text(" ".join(SENTENCES)).tokens
+    assert analysis.sentences
+
+
+def _growing_rss(monkeypatch, start_mb, step_mb):
+    # Each call reports the process step_mb larger than the last.
+    sizes = iter(range(10**6))
+    monkeypatch.setattr(text_utils, "rss_mb", lambda: start_mb + step_mb * next(sizes))
+
+
+def test_analyze_bounded_stops_at_memory_limit(monkeypatch):
+    _growing_rss(monkeypatch, 500, 1)
+    limits = ResourceLimits(max_memory_mb=3)
+    analysis, report = analyze_bounded(iter(SENTENCES), limits, chunk_size=500)
+    assert report["stopped"] == "memory" and analysis.sentences
+    assert report["rss_growth_mb"] == 4 and report["peak_rss_mb"] == 504
+
+
+def test_analyze_bounded_memory_limit_ignores_a_high_baseline(monkeypatch):
+    # A long-lived server already far past the cap still analyses documents
+    # that grow it by less than the cap.
+    _growing_rss(monkeypatch, 10_000, 0)
+    analysis, report = analyze_bounded(iter(SENTENCES), ResourceLimits(max_memory_mb=2048), chunk_size=500)
+    assert report["stopped"] is None and len(analysis.sentences) == len(SENTENCES)
+
+
+def test_generators_accept_limits():
+    text = " ".join(SENTENCES)
+    limits = ResourceLimits(max_tokens=200, sentence_sample=5, word_sample=5)
+    quiz = generate_quiz(text, limits=limits, rng=random.Random(4))
+    assert 0 < len(quiz) <= 5 and all(q["answer"] in q["choices"] for q in quiz)
+    puzzles = generate_puzzles(text, limits=limits, rng=random.Random(4))
+    assert 0 < len(puzzles) <= 5
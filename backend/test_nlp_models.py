@@ -0,0 +1,16 @@
+import nlp_models
+
+
+def test_get_nlp_is_cached():
+    assert nlp_models.get_nlp() is nlp_models.get_nlp()
+    assert nlp_models.is_loaded()
+
+
+def test_model_excludes_unused_components():
+    nlp = nlp_models.get_nlp()
+    assert not set(nlp_models.EXCLUDE) & set(nlp.pipe_names)
+
+
+def test_text_utils_nlp_attribute_is_lazy():
+    import text_utils
+    assert text_utils.nlp is nlp_models.get_nlp()
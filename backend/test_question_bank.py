@@ -0,0 +1,126 @@
+import random
+import threading
+
+import pytest
+
+from cache import AnalysisCache
+from question_bank import MemoryBankStore, QuestionBank, SQLiteBankStore, analyze_blocks, create_bank_store
+from text_utils import analyze_text, bank_from_analysis
+
+TEXT = ("The farmer harvested the melon from the field yesterday. "
+        "Programming languages provide powerful abstractions for developers. "
+        "The orchard grows apples, cherries and grapes every summer.")
+
+
+def _bank(n_questions=10, n_puzzles=6):
+    questions = [[f"a{i} is a sentence.", [[0, len(f"a{i}")]], [f"a{i}"]] for i in range(n_questions)]
+    puzzles = [{"puzzle": f"Unscramble this word: w{i}", "answer": f"w{i}"} for i in range(n_puzzles)]
+    return QuestionBank(questions, puzzles)
+
+
+def test_bank_from_analysis_covers_every_answer():
+    questions, puzzles = bank_from_analysis(analyze_text(TEXT), rng=random.Random(1))
+    sentences = {q[0] for q in questions}
+    assert len(sentences) == 3
+    assert len(questions) >= 3
+    answers = [q[0][q[1][0][0]:q[1][0][1]] for q in questions]
+    assert all(answer in q[2] for answer, q in zip(answers, questions))
+    assert {p["answer"] for p in puzzles} >= {"harvested", "programming", "orchard"}
+
+
+def test_draws_are_without_replacement_until_exhausted():
+    bank = _bank()
+    rng = random.Random(3)
+    drawn = [q["answer"] for _ in range(2) for q in bank.draw_quiz(5, rng)]
+    assert len(drawn) == 10 and len(set(drawn)) == 10
+    assert bank.remaining["questions"] == 0
+    # A new round starts once the bank is exhausted.
+    assert len(bank.draw_quiz(5, rng)) == 5
+    assert bank.remaining["questions"] == 5
+
+
+def test_draw_never_repeats_within_a_quiz():
+    bank = _bank(n_questions=3)
+    rng = random.Random(0)
+    for _ in range(10):
+        quiz = bank.draw_quiz(3, rng)
+        assert len({q["answer"] for q in quiz}) == 3
+
+
+def test_bank_round_trip_keeps_draw_state():
+    bank = _bank()
+    bank.draw_puzzles(4, random.Random(5))
+    restored = QuestionBank.from_dict(bank.to_dict())
+    assert restored.remaining == {"questions": 10, "puzzles": 2}
+    left = {p["answer"] for p in restored.draw_puzzles(2, random.Random(6))}
+    assert left == {p["answer"] for p in bank.puzzles[:2]}
+
+
+def test_analyze_blocks_reuses_unchanged_blocks():
+    cache = AnalysisCache()
+    blocks = ["The farmer harvested the melon.", "Programming languages provide abstractions.", "Grapes grow."]
+    first, analysed = analyze_blocks(blocks, cache)
+    assert analysed == 3
+    edited = blocks[:1] + ["Programming languages provide powerful abstractions."] + blocks[2:]
+    second, analysed = analyze_blocks(edited, cache)
+    assert analysed == 1
+    assert [s.text for s in second.sentences][0] == first.sentences[0].text
+    assert second.sentences[1].text == edited[1]
+
+
+@pytest.fixture(params=["memory", "sqlite"])
+def banks(request, tmp_path):
+    if request.param == "memory":
+        return MemoryBankStore()
+    return SQLiteBankStore(str(tmp_path / "banks.db"))
+
+
+def test_bank_store_draws_without_replacement(banks):
+    assert banks.draw("doc", 3, 3) is None and not banks.has("doc")
+    banks.put("doc", _bank())
+    assert banks.has("doc")
+    first = banks.draw("doc", 5, 3, random.Random(1))
+    second = banks.draw("doc", 5, 3, random.Random(1))
+    assert len(first["quiz"]) == 5 and len(first["puzzles"]) == 3
+    assert not {q["answer"] for q in first["quiz"]} & {q["answer"] for q in second["quiz"]}
+    assert not {p["answer"] for p in first["puzzles"]} & {p["answer"] for p in second["puzzles"]}
+    # The bank is exhausted, so the next draw starts a new round.
+    third = banks.draw("doc", 10, 6, random.Random(2))
+    assert len({q["answer"] for q in third["quiz"]}) == 10
+
+
+def test_sqlite_bank_store_draws_match_memory_bank(tmp_path):
+    banks = SQLiteBankStore(str(tmp_path / "banks.db"))
+    banks.put("doc", _bank())
+    bank = _bank()
+    for seed in range(4):
+        drawn = banks.draw("doc", 4, 4, random.Random(seed))
+        rng = random.Random(seed)
+        assert drawn == {"quiz": bank.draw_quiz(4, rng), "puzzles": bank.draw_puzzles(4, rng)}
+
+
+def test_sqlite_bank_store_concurrent_draws_do_not_repeat(tmp_path):
+    path = str(tmp_path / "banks.db")
+    SQLiteBankStore(path).put("doc", _bank(n_questions=40))
+    answers = []
+
+    def draw():
+        # One store per thread, as with several worker processes.
+        answers.extend(q["answer"] for q in SQLiteBankStore(path).draw("doc", 4, 0)["quiz"])
+
+    threads = [threading.Thread(target=draw) for _ in range(10)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert len(answers) == 40 and len(set(answers)) == 40
+
+
+def test_memory_bank_store_evicts_least_recently_used():
+    banks = MemoryBankStore(max_entries=2)
+    for key in ("a", "b"):
+        banks.put(key, _bank())
+    banks.draw("a", 1, 1)
+    banks.put("c", _bank())
+    assert banks.has("a") and banks.has("c") and not banks.has("b")
+    assert isinstance(create_bank_store("memory"), MemoryBankStore)
@@ -0,0 +1,54 @@
+import pytest
+
+from quiz_store import MemoryStore, SQLiteStore, create_store, decode, encode
+
+RECORD = {
+    "quiz": [{"question": "A _____ sentence.", "choices": ["long", "short"], "answer": "long"}],
+    "puzzles": [{"puzzle": "Unscramble this word: nohtyp", "answer": "python"}],
+}
+
+
+def test_encode_roundtrip_is_compact():
+    blob = encode(RECORD)
+    assert decode(blob) == RECORD
+    assert isinstance(blob, bytes)
+
+
+@pytest.fixture(params=["memory", "sqlite"])
+def store(request, tmp_path):
+    if request.param == "memory":
+        return MemoryStore()
+    return SQLiteStore(str(tmp_path / "quizzes.db"))
+
+
+def test_store_put_get_delete(store):
+    quiz_id = store.put(RECORD)
+    assert store.get(quiz_id) == RECORD
+    store.delete(quiz_id)
+    assert store.get(quiz_id) is None
+    assert store.get(None) is None
+
+
+def test_store_ttl_expiry(store):
+    store.ttl = -1
+    quiz_id = store.put(RECORD)
+    assert store.get(quiz_id) is None
+    store.purge_expired()
+
+
+def test_memory_store_lru_eviction():
+    store = MemoryStore(max_entries=2)
+    first = store.put(RECORD)
+    second = store.put(RECORD)
+    store.get(first)
+    store.put(RECORD)
+    assert store.get(second) is None
+    assert store.get(first) == RECORD
+    assert len(store) == 2
+
+
+def test_create_store(tmp_path):
+    assert isinstance(create_store("memory"), MemoryStore)
+    assert isinstance(create_store(f"sqlite:///{tmp_path / 'q.db'}"), SQLiteStore)
+    with pytest.raises(ValueError):
+        create_store("redis://localhost")
@@ -0,0 +1,99 @@
+import io
+import time
+
+from flask import Flask, render_template
+
+from grading import mark_quiz, mark_puzzles
+from rendering import (
+    CompiledPage, PageCache, Slot, compile_quiz_page, compile_quiz_result, compile_puzzle_result, fill_result,
+    new_marker,
+)
+
+flask_app = Flask(__name__, template_folder="../templates", static_folder="../static")
+flask_app.add_url_rule("/puzzle", "puzzle", lambda: "")  # linked from the result pages
+QUIZ = [
+    {"question": "A _____ barks.", "choices": ["cat", "dog"], "answer": "dog"},
+    {"question": "The _____ is <red>.", "choices": ["apple", "sky"], "answer": "apple"},
+]
+PUZZLES = [{"puzzle": "Unscramble this word: odg", "answer": "Dog"}]
+
+
+def test_compiled_page_fills_slots_and_escapes():
+    marker = new_marker()
+    page = CompiledPage(f"<p>{Slot('a', marker)}</p><b>{Slot('b', marker)}</b>", marker=marker)
+    assert page.slots == ["a", "b"]
+    assert page.fill({"a": "<script>", "b": 3}) == "<p>&lt;script&gt;</p><b>3</b>"
+    assert CompiledPage("static").fill() == "static"
+
+
+def test_filled_result_matches_direct_render():
+    form = {"q0": "dog", "q1": "sky"}
+    with flask_app.test_request_context():
+        page = compile_quiz_result(QUIZ)
+        users, flags = mark_quiz(page.data, form)
+        assert flags == [True, False]
+        direct = render_template("quiz_result.html", score=1, total=2, results=[
+            {"question": QUIZ[0]["question"], "correct": "dog", "user": "dog", "status": "✅", "status_class": "correct"},
+            {"question": QUIZ[1]["question"], "correct": "apple", "user": "sky", "status": "❌",
+             "status_class": "incorrect"},
+        ])
+    assert fill_result(page, users, flags) == direct
+
+
+def test_document_text_cannot_forge_slots():
+    quiz = [{"question": "Null \x00slot:x\x00 bytes and slot0123abcd markers.", "choices": ["a"], "answer": "a"}]
+    with flask_app.test_request_context():
+        page = compile_quiz_result(quiz)
+    assert sorted(page.slots) == ["class0", "score", "status0", "user0"]
+    assert "Null" in fill_result(page, *mark_quiz(page.data, {"q0": "a"}))
+
+
+def test_puzzle_result_marks_missing_answers():
+    with flask_app.test_request_context():
+        page = compile_puzzle_result(PUZZLES)
+    users, flags = mark_puzzles(page.data, {})
+    html = fill_result(page, users, flags, marks=("✅ Correct", "❌ Incorrect"))
+    assert "No Answer" in html and "❌ Incorrect" in html and ">dog<" in html
+
+
+def test_quiz_page_field_names_match_grading():
+    with flask_app.test_request_context():
+        html = compile_quiz_page(QUIZ).fill()
+    assert 'name="q0"' in html and 'name="q1"' in html and 'name="q2"' not in html
+
+
+def test_page_cache_compiles_once():
+    cache = PageCache(max_entries=1)
+    calls = []
+
+    def compile_page():
+        calls.append(1)
+        return CompiledPage("x")
+
+    first = cache.get_or_compile(("quiz", "quiz", None), compile_page)
+    assert cache.get_or_compile(("quiz", "quiz", None), compile_page) is first
+    cache.get_or_compile(("other", "quiz", None), compile_page)
+    cache.get_or_compile(("quiz", "quiz", None), compile_page)
+    assert len(calls) == 3
+    assert cache.stats()["hits"] == 1
+
+
+def test_quiz_and_puzzle_pages_support_conditional_get():
+    import app as quiz_app
+    client = quiz_app.app.test_client()
+    text = b"Python is a programming language used by developers around the world. " * 5
+    response = client.post("/upload", data={"file": (io.BytesIO(text), "notes.txt")},
+                           content_type="multipart/form-data")
+    quiz_path = response.headers["Location"]
+    for _ in range(200):
+        page = client.get(quiz_path)
+        if b"Submit Answers" in page.data:
+            break
+        time.sleep(0.02)
+    assert page.headers["ETag"]
+    assert client.get(quiz_path, headers={"If-None-Match": page.headers["ETag"]}).status_code == 304
+    puzzle = client.get("/puzzle")
+    assert puzzle.status_code == 200
+    assert client.get("/puzzle", headers={"If-None-Match": puzzle.headers["ETag"]}).status_code == 304
+    result = client.post("/submit", data={})
+    assert b"You scored <strong>0</strong>" in result.data
@@ -0,0 +1,107 @@
+import threading
+
+from rooms import RoomRegistry, ScoreAggregate
+
+
+def test_score_aggregate_incremental_totals():
+    agg = ScoreAggregate(3)
+    agg.record("a", [True, True, False])
+    agg.record("b", [False, True, False])
+    data = agg.to_dict()
+    assert data["submissions"] == 2
+    assert data["mean_score"] == 1.5
+    assert data["score_histogram"] == [0, 1, 1, 0]
+    assert data["question_accuracy"] == [0.5, 1.0, 0.0]
+
+
+def test_resubmission_replaces_previous_result():
+    agg = ScoreAggregate(2)
+    agg.record("a", [False, False])
+    agg.record("a", [True, True])
+    data = agg.to_dict()
+    assert data["submissions"] == 1
+    assert data["score_histogram"] == [0, 0, 1]
+    assert data["question_accuracy"] == [1.0, 1.0]
+
+
+def test_record_many_matches_single_records():
+    import numpy
+    single, batch = ScoreAggregate(2), ScoreAggregate(2)
+    rows = [[True, False], [True, True], [False, False]]
+    for participant, row in zip("abc", rows):
+        single.record(participant, row)
+    batch.record_many("abc", numpy.array(rows))
+    assert batch.to_dict() == single.to_dict()
+
+
+def test_registry_create_and_lookup_case_insensitive():
+    registry = RoomRegistry()
+    room = registry.create("quiz-1", 5, 5)
+    assert registry.get(room.code.lower()) is room
+    assert registry.get("NOPE00") is None
+    assert registry.get(None) is None
+
+
+def test_registry_drops_expired_rooms():
+    registry = RoomRegistry(ttl=-1)
+    registry.create("quiz-1", 1, 1)
+    registry.create("quiz-2", 1, 1)
+    assert len(registry) == 1
+
+
+def test_concurrent_submissions_are_all_counted():
+    room = RoomRegistry().create("quiz-1", 4, 0)
+
+    def submit(worker):
+        for i in range(50):
+            room.record_quiz(f"{worker}-{i}", [True, False, True, i % 2 == 0])
+
+    threads = [threading.Thread(target=submit, args=(w,)) for w in range(8)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    quiz = room.to_dict()["quiz"]
+    assert quiz["submissions"] == 400
+    assert quiz["question_accuracy"] == [1.0, 0.0, 1.0, 0.5]
+
+
+def test_room_submissions_endpoint_grades_a_batch():
+    import app as quiz_app
+    quiz = [{"question": "_____ is red.", "choices": ["apple", "pear"], "answer": "apple"}]
+    quiz_app._store_quiz("room-batch", {"quiz": quiz, "puzzles": [{"puzzle": "elppa", "answer": "apple"}]})
+    room = quiz_app.rooms.create("room-batch", 1, 1)
+    client = quiz_app.app.test_client()
+    url = f"/rooms/{room.code}/submissions"
+    owner = {"Authorization": f"Bearer {room.owner_token}"}
+    response = client.post(url, json=[{"participant": "a", "q0": "apple", "p0": "Apple "},
+                                      {"participant": "b", "q0": "pear"}], headers=owner)
+    assert response.status_code == 200
+    assert response.get_json()["quiz"]["scores"] == [1, 0]
+    # Columns work too, and a resubmission replaces the earlier answers.
+    response = client.post(url, json={"participant": ["b"], "q0": ["apple"]}, headers=owner)
+    assert response.status_code == 200
+    data = room.to_dict()
+    assert data["quiz"]["submissions"] == 2 and data["quiz"]["mean_score"] == 1.0
+    assert data["puzzles"]["question_accuracy"] == [0.5]
+    assert client.post(url, json={"participant": ["c"], "q0": ["apple", "pear"]}, headers=owner).status_code == 400
+    assert client.post(url, json=[{"q0": "apple"}], headers=owner).status_code == 400
+
+
+def test_room_submissions_need_the_room_owner():
+    import app as quiz_app
+    quiz = [{"question": "_____ is red.", "choices": ["apple", "pear"], "answer": "apple"}]
+    quiz_app._store_quiz("room-owner", {"quiz": quiz, "puzzles": []})
+    owner = quiz_app.app.test_client()
+    created = owner.post("/rooms?format=json", data={"quiz_id": "room-owner"}).get_json()
+    url = f"/rooms/{created['code']}/submissions"
+    answers = [{"participant": "mallory", "q0": "apple"}]
+    stranger = quiz_app.app.test_client()
+    assert stranger.post(url, json=answers).status_code == 403
+    assert stranger.post(url, json=answers, headers={"Authorization": "Bearer wrong"}).status_code == 403
+    assert "owner_token" not in stranger.get(f"/rooms/{created['code']}/results").get_json()
+    assert quiz_app.rooms.get(created["code"]).to_dict()["quiz"]["submissions"] == 0
+    # The session that opened the room, or anyone with its owner token.
+    assert owner.post(url, json=answers).status_code == 200
+    headers = {"Authorization": f"Bearer {created['owner_token']}"}
+    assert stranger.post(url, json=answers, headers=headers).status_code == 200
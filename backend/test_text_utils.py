@@ -1,6 +1,7 @@
+import io
 import tempfile
 import os
-from text_utils import extract_text, generate_quiz, generate_puzzles
+from text_utils import extract_text, generate_quiz, generate_puzzles, iter_text_from_stream
 import pytest
 
 
@@ -56,6 +57,36 @@ def test_extract_text_docx():
     assert "Docx test paragraph." in result
     os.remove(path)
 
+def test_extract_text_docx_caps(monkeypatch, tmp_path):
+    from docx import Document
+    path = str(tmp_path / "long.docx")
+    doc = Document()
+    for i in range(5):
+        doc.add_paragraph(f"Paragraph {i}.")
+    doc.save(path)
+    monkeypatch.setattr("text_utils.MAX_DOCX_PARAGRAPHS", 2)
+    assert extract_text(path) == "Paragraph 0.\nParagraph 1."
+    with open(path, "rb") as f:
+        assert list(iter_text_from_stream(io.BytesIO(f.read()), "long.docx")) == ["Paragraph 0.", "Paragraph 1."]
+    monkeypatch.setattr("text_utils.MAX_DOCX_MB", 0)
+    assert extract_text(path) == ""
+
+def test_docx_paragraphs_match_python_docx(tmp_path):
+    from docx import Document
+    from text_utils import _docx_paragraphs
+    path = str(tmp_path / "rich.docx")
+    doc = Document()
+    doc.add_heading("Heading one", level=1)
+    paragraph = doc.add_paragraph("Bold ")
+    paragraph.add_run("and italic").italic = True
+    paragraph.add_run().add_tab()
+    paragraph.add_run("after a tab").add_break()
+    doc.add_paragraph("")
+    doc.add_table(rows=1, cols=1).cell(0, 0).text = "Inside a table."
+    doc.add_paragraph("Last <paragraph> & more.")
+    doc.save(path)
+    assert list(_docx_paragraphs(path)) == [p.text for p in Document(path).paragraphs]
+
 def test_extract_text_pdf():
     from fpdf import FPDF
     path = os.path.join(tempfile.gettempdir(), "test.pdf")
@@ -104,16 +135,19 @@ def test_extract_text_invalid_open(monkeypatch):
 def test_extract_text_docx_exception(monkeypatch):
     def fail_docx(path):
         raise Exception("DOCX failed to load!")
-    monkeypatch.setattr("text_utils.Document", fail_docx)
+    monkeypatch.setattr("text_utils._docx_paragraphs", fail_docx)
     result = extract_text("fake.docx")
     assert result == ""
 
-def test_extract_text_pdf_exception(monkeypatch):
-    class DummyPdfReader:
-        def __init__(self, file):
+def test_extract_text_pdf_exception(monkeypatch, tmp_path):
+    class DummyBackend:
+        name = "dummy"
+        def open(self, source):
             raise Exception("PDF failed to open")
-    monkeypatch.setattr("text_utils.PyPDF2.PdfReader", DummyPdfReader)
-    result = extract_text("some.pdf")
+    monkeypatch.setattr("text_utils.backends_for", lambda fmt, preferred=None: [DummyBackend()])
+    path = tmp_path / "some.pdf"
+    path.write_bytes(b"%PDF-1.4")
+    result = extract_text(str(path))
     assert result == ""
 
 def test_generate_quiz_basic():
@@ -323,3 +357,271 @@ def test_generate_quiz_high_min_nouns_filter():
     text = "Apple banana cat dog elephant giraffe fox."
     quiz = generate_quiz(text, min_nouns=10)  # higher than actual noun count
     assert quiz == []  # No quiz generated because noun count per sentence is less than min_nouns
+
+# Analysis is computed once and reused by both generators
+def test_analyze_text_collects_sentences_and_words():
+    from text_utils import analyze_text
+    analysis = analyze_text("The programming language has many features. Python is popular.")
+    assert len(analysis.sentences) == 2
+    assert analysis.word_counts["programming"] == 1
+    assert all(isinstance(s.nouns, list) for s in analysis.sentences)
+
+def test_generators_from_shared_analysis():
+    from text_utils import analyze_text, quiz_from_analysis, puzzles_from_analysis
+    analysis = analyze_text("This is a test sentence with some nouns like apple and banana. Another sentence with cat and dog.")
+    quiz = quiz_from_analysis(analysis)
+    puzzles = puzzles_from_analysis(analysis)
+    assert len(quiz) > 0
+    assert all(q["answer"] in q["choices"] for q in quiz)
+    assert all(len(p["answer"]) >= 6 for p in puzzles)
+
+def test_iter_chunks_respects_chunk_size():
+    from text_utils import iter_chunks
+    text = "word " * 1000
+    chunks = list(iter_chunks(text, chunk_size=100))
+    assert all(len(c) <= 100 for c in chunks)
+    assert "".join(chunks) == text
+
+def test_iter_chunks_packs_small_blocks():
+    from text_utils import iter_chunks
+    chunks = list(iter_chunks(["one", "two", "", "three"], chunk_size=100))
+    assert chunks == ["one\ntwo\nthree"]
+
+def test_stream_quiz_stops_at_max_questions():
+    from text_utils import stream_quiz
+    text = "Dog barked loudly at the stranger in the alley. " * 200
+    quiz = stream_quiz(text, max_questions=2, chunk_size=200)
+    assert len(quiz) == 2
+    assert all(q["answer"] in q["choices"] for q in quiz)
+
+def test_stream_puzzles_matches_word_filter():
+    from text_utils import stream_puzzles
+    text = "Python programming language provides powerful features.\n" * 50
+    puzzles = stream_puzzles(text, max_puzzles=3, chunk_size=100)
+    assert 0 < len(puzzles) <= 3
+    assert all(len(p["answer"]) >= 6 and p["answer"].isalpha() for p in puzzles)
+
+def _write_pdf(path, pages):
+    from fpdf import FPDF
+    pdf = FPDF()
+    pdf.set_font("Arial", size=12)
+    for i in range(pages):
+        pdf.add_page()
+        pdf.cell(200, 10, txt=f"Page number {i} content.", ln=True)
+    pdf.output(path)
+
+def test_extract_text_pdf_page_limits():
+    path = os.path.join(tempfile.gettempdir(), "test_pages.pdf")
+    _write_pdf(path, 5)
+    result = extract_text(path, max_pages=2)
+    assert "Page number 1" in result and "Page number 2" not in result
+    result = extract_text(path, page_range=(3, 5))
+    assert "Page number 3" in result and "Page number 0" not in result
+    os.remove(path)
+
+def test_extract_text_pdf_parallel_keeps_page_order():
+    path = os.path.join(tempfile.gettempdir(), "test_parallel.pdf")
+    _write_pdf(path, 12)
+    sequential = extract_text(path, pdf_workers=1)
+    parallel = extract_text(path, pdf_workers=3)
+    assert parallel == sequential
+    assert parallel.index("Page number 2 ") < parallel.index("Page number 11")
+    os.remove(path)
+
+def test_iter_text_txt_blocks():
+    from text_utils import iter_text
+    with tempfile.NamedTemporaryFile(mode="w+", suffix=".txt", delete=False) as f:
+        f.write("First block line one.\nline two.\n\nSecond block.\n")
+        path = f.name
+    blocks = list(iter_text(path))
+    assert blocks == ["First block line one.\nline two.\n", "Second block.\n"]
+    os.remove(path)
+
+def test_iter_text_docx_paragraphs():
+    from docx import Document
+    from text_utils import iter_text
+    path = os.path.join(tempfile.gettempdir(), "test_iter.docx")
+    doc = Document()
+    doc.add_paragraph("First paragraph.")
+    doc.add_paragraph("")
+    doc.add_paragraph("Second paragraph.")
+    doc.save(path)
+    assert list(iter_text(path)) == ["First paragraph.", "Second paragraph."]
+    os.remove(path)
+
+def test_iter_text_pdf_pages():
+    from text_utils import iter_text
+    path = os.path.join(tempfile.gettempdir(), "test_iter.pdf")
+    _write_pdf(path, 3)
+    pages = list(iter_text(path, max_pages=2))
+    assert len(pages) == 2
+    assert "Page number 1" in pages[1]
+    os.remove(path)
+
+def test_iter_text_unsupported_and_missing():
+    from text_utils import iter_text
+    assert list(iter_text("no_such_file.txt")) == []
+    assert list(iter_text(tempfile.gettempdir())) == []
+
+def test_stream_quiz_reads_blocks_lazily():
+    from text_utils import stream_quiz
+    consumed = []
+
+    def blocks():
+        for i in range(1000):
+            consumed.append(i)
+            yield "Dog barked loudly at the stranger in the alley."
+
+    quiz = stream_quiz(blocks(), max_questions=1, chunk_size=100, batch_size=1)
+    assert len(quiz) == 1
+    assert len(consumed) < 10
+
+def test_stream_from_seed_is_reproducible():
+    from text_utils import stream_from_seed
+    sentences = ["The farmer harvested the melon from the field yesterday.",
+                 "Programming languages provide powerful abstractions for developers."] * 10
+    first = stream_from_seed(lambda: iter(sentences), 42)
+    assert first == stream_from_seed(lambda: iter(sentences), 42)
+    assert first["streamed"] and first["quiz"] and first["puzzles"]
+
+def test_sniff_format_checks_magic_bytes():
+    from text_utils import sniff_format
+    assert sniff_format(b"%PDF-1.4 ...", "a.pdf") == ".pdf"
+    assert sniff_format(b"PK\x03\x04....", "a.docx") == ".docx"
+    assert sniff_format(b"plain text", "a.txt") == ".txt"
+    assert sniff_format(b"plain text", "a.pdf") is None
+    assert sniff_format(b"\x00\x01binary", "a.txt") is None
+    assert sniff_format(b"%PDF-1.4", "a.csv") is None
+
+def test_extract_text_from_stream_formats():
+    import io
+    from docx import Document
+    from text_utils import extract_text_from_stream
+    assert extract_text_from_stream(io.BytesIO(b"Hello, stream!"), "notes.txt") == "Hello, stream!"
+    buffer = io.BytesIO()
+    doc = Document()
+    doc.add_paragraph("Docx stream paragraph.")
+    doc.save(buffer)
+    buffer.seek(0)
+    assert "Docx stream paragraph." in extract_text_from_stream(buffer, "notes.docx")
+    path = os.path.join(tempfile.gettempdir(), "test_stream.pdf")
+    _write_pdf(path, 3)
+    with open(path, "rb") as f:
+        data = f.read()
+    os.remove(path)
+    result = extract_text_from_stream(io.BytesIO(data), "notes.pdf", max_pages=1)
+    assert "Page number 0" in result and "Page number 1" not in result
+
+def test_extract_text_from_stream_rejects_mismatch():
+    import io
+    from text_utils import extract_text_from_stream
+    assert extract_text_from_stream(io.BytesIO(b"not a pdf"), "fake.pdf") == ""
+    assert extract_text_from_stream(io.BytesIO(b"PK\x03\x04corrupt"), "bad.docx") == ""
+
+def test_generate_quiz_uses_document_wide_distractors():
+    text = ("The apple, banana, cherry, and grape grow in the orchard. "
+            "A farmer harvested the melon from the field yesterday.")
+    quiz = generate_quiz(text, sentence_length=10, max_options=3)
+    assert len(quiz) == 2
+    for q in quiz:
+        assert len(q["choices"]) == 4
+        assert len(set(c.lower() for c in q["choices"])) == 4
+
+def test_seeded_generation_is_reproducible():
+    import random
+    from text_utils import analyze_text, derive_seed, generate_from_seed
+    text = ("The apple, banana, cherry, and grape grow in the orchard. "
+            "A farmer harvested the melon from the field yesterday. "
+            "Programming languages provide powerful abstractions.")
+    analysis = analyze_text(text)
+    seed = derive_seed("doc-hash", "class-a")
+    assert seed == derive_seed("doc-hash", "class-a")
+    assert seed != derive_seed("doc-hash", "class-b")
+    first = generate_from_seed(analysis, seed)
+    second = generate_from_seed(analyze_text(text), seed)
+    assert first == second
+    assert generate_quiz(text, rng=random.Random(7)) == generate_quiz(text, rng=random.Random(7))
+    assert generate_puzzles(text, rng=random.Random(7)) == generate_puzzles(text, rng=random.Random(7))
+
+def test_iter_sentences_rough_boundaries():
+    from text_utils import iter_sentences
+    text = 'Dr. Smith met J. Doe on Monday. "Is it here?" she asked. Yes!\n\nA heading\nNext line.'
+    assert list(iter_sentences(text)) == [
+        "Dr. Smith met J. Doe on Monday.", '"Is it here?" she asked.', "Yes!", "A heading\nNext line.",
+    ]
+
+def test_fast_puzzles_match_full_pipeline():
+    import random
+    text = "Programming languages provide powerful abstractions. Developers appreciate readable programming."
+    assert generate_puzzles(text, fast=True, rng=random.Random(1)) == generate_puzzles(text, rng=random.Random(1))
+
+def test_fast_quiz_tags_only_candidate_sentences(monkeypatch):
+    import text_utils
+    nlp = text_utils.get_nlp()
+    tagged = []
+
+    class Spy:
+        pipe_names = nlp.pipe_names
+
+        def pipe(self, texts, **kwargs):
+            texts = list(texts)
+            tagged.extend(texts)
+            return nlp.pipe(texts, **kwargs)
+
+    monkeypatch.setattr(text_utils, "get_nlp", lambda: Spy())
+    text = "Short one. " * 50 + "The farmer harvested the melon from the field yesterday. " * 50
+    quiz = generate_quiz(text, max_questions=2, fast=True)
+    assert len(quiz) == 2
+    assert all("_____" in q["question"] and q["answer"] in q["choices"] for q in quiz)
+    assert len(tagged) == 2 * text_utils.FAST_POOL_FACTOR
+    assert "Short one." not in tagged
+
+def test_blanking_uses_token_offsets():
+    from text_utils import DistractorIndex, SentenceCandidate, _build_quiz
+    sentence = "The cat sat in the category about cat food."
+    candidate = SentenceCandidate(sentence, ["cat", "cat"], [[4, 7], [34, 37]])
+    quiz = _build_quiz([candidate], 10, 1, 0, 1, DistractorIndex())
+    assert quiz[0]["question"] == "The _____ sat in the category about _____ food."
+    assert quiz[0]["answer"] == "cat"
+    assert quiz[0]["blanks"] == [[4, 7], [34, 37]]
+
+def test_blanking_without_offsets_matches_whole_words():
+    from text_utils import DistractorIndex, SentenceCandidate, _build_quiz
+    candidate = SentenceCandidate("A category is not a cat at all.", ["cat"])
+    quiz = _build_quiz([candidate], 10, 1, 0, 1, DistractorIndex())
+    assert quiz[0]["question"] == "A category is not a _____ at all."
+
+def test_noun_chunk_answers():
+    import random
+    from text_utils import DistractorIndex, SentenceCandidate, _build_quiz
+    sentence = "Python is a programming language with a large standard library."
+    candidate = SentenceCandidate(sentence, ["Python", "language", "library"],
+                                  [[0, 6], [24, 32], [55, 62]], [[12, 32], [40, 62]])
+    answers = {q["answer"] for seed in range(30)
+               for q in _build_quiz([candidate], 10, 1, 0, 1, DistractorIndex(), random.Random(seed), True)}
+    assert "programming language" in answers
+    assert "large standard library" in answers
+    plain = {q["answer"] for seed in range(30)
+             for q in _build_quiz([candidate], 10, 1, 0, 1, DistractorIndex(), random.Random(seed))}
+    assert plain == {"Python", "language", "library"}
+
+def test_pack_question_round_trip():
+    from text_utils import pack_question, unpack_question
+    quiz = generate_quiz("Python is a language. Developers use Python to write programs in Python daily.",
+                         sentence_length=10, max_questions=2)
+    for q in quiz:
+        packed = pack_question(q)
+        assert len(packed) == 3 and "_____" not in packed[0]
+        assert unpack_question(packed) == q
+    legacy = {"question": "A _____ sentence.", "choices": ["long"], "answer": "long"}
+    assert unpack_question(pack_question(legacy)) == legacy
+
+def test_analysis_round_trip_keeps_offsets():
+    from text_utils import DocumentAnalysis, analyze_text
+    analysis = analyze_text("The farmer harvested the melon from the field yesterday.")
+    restored = DocumentAnalysis.from_dict(analysis.to_dict())
+    assert restored.sentences == analysis.sentences
+    sentence = restored.sentences[0]
+    assert [sentence.text[s:e] for s, e in sentence.spans] == sentence.nouns
+    legacy = DocumentAnalysis.from_dict({"sentences": [["About alpha.", ["alpha"]]]})
+    assert legacy.sentences[0].answer_spans() == [[6, 11]]
@@ -1,23 +1,87 @@
+import hashlib
+import io
+import logging
 import os
 import random
-import spacy
-import PyPDF2
-from docx import Document
+import re
+import threading
+import zipfile
+from concurrent.futures import ProcessPoolExecutor
+from collections import Counter
+from itertools import islice
+from dataclasses import dataclass, field
+from xml.etree.ElementTree import iterparse
+from distractors import DistractorIndex
+from extractors import ExtractionTimeout, KillableBackend, TimeBudget, backends_for, get_backend
+from instrumentation import annotate, timed
+from limits import Reservoir, ResourceLimits, Vocabulary, rss_mb
+from nlp_models import EXCLUDE, get_nlp
 
-# Load spaCy English model once for better performance
-nlp = spacy.load("en_core_web_sm")
+logger = logging.getLogger(__name__)
 
-def extract_text(path):
+# Documents are fed to spaCy in pieces of at most this many characters,
+# well below nlp.max_length, so large files never become a single Doc.
+DEFAULT_CHUNK_SIZE = 100_000
+DEFAULT_BATCH_SIZE = 8
+# Streaming generation uses smaller chunks and batches so the first
+# questions are ready after reading only the start of the document.
+STREAM_CHUNK_SIZE = 10_000
+STREAM_BATCH_SIZE = 2
+# Plain text files are yielded in blocks split at blank lines, or at this size.
+TXT_BLOCK_SIZE = 64 * 1024
+# Only the tagger (for POS) and parser (for sentences) are needed, and the
+# entity recogniser when the model was loaded with it (see nlp_models).
+PIPELINE_DISABLE = EXCLUDE
+# Streaming puzzles stop once this many candidates per puzzle have been seen.
+PUZZLE_POOL_FACTOR = 4
+# Replaces the answer in a question.
+BLANK = "_____"
+# Leading tokens dropped from noun chunks used as answers.
+CHUNK_SKIP_POS = ("DET", "PRON", "PUNCT")
+# Fast path: sentences and words are found with regular expressions, and
+# only sentences that may become questions are tagged, this many
+# (times max_questions) at a time, with everything but the tagger disabled.
+FAST_POOL_FACTOR = 4
+FAST_DISABLE = ("parser", "senter") + PIPELINE_DISABLE
+# Alphabetic runs, the regex equivalent of spaCy's token.is_alpha.
+WORD_RE = re.compile(r"[^\W\d_]+")
+# End punctuation (plus closing quotes/brackets) followed by whitespace and
+# a capitalised start, or a blank line.
+SENTENCE_BREAK_RE = re.compile(r"""([.!?]["')\]]*)\s+(?=["'(\[]?[A-Z0-9])|\n\s*\n""")
+ABBREVIATIONS = frozenset({"mr", "mrs", "ms", "dr", "prof", "sr", "jr", "st", "vs", "etc", "e.g", "i.e",
+                           "fig", "no", "vol", "approx", "dept", "inc", "ltd", "co"})
+# Worker processes used for page-parallel PDF extraction; 1 keeps it in-process.
+PDF_WORKERS = int(os.environ.get("QUIZSPARK_PDF_WORKERS", "1"))
+# PDFs with fewer pages than this are always extracted in-process.
+PDF_PARALLEL_MIN_PAGES = 8
+# A .docx is refused if its parts unpack to more than this, and only its
+# first MAX_DOCX_PARAGRAPHS paragraphs are read.
+MAX_DOCX_MB = int(os.environ.get("QUIZSPARK_MAX_DOCX_MB", "100"))
+MAX_DOCX_PARAGRAPHS = int(os.environ.get("QUIZSPARK_MAX_DOCX_PARAGRAPHS", "50000"))
+DOCX_NS = "{http://schemas.openxmlformats.org/wordprocessingml/2006/main}"
+# Seconds one document may spend in a PDF backend; unset means no limit.
+# With a limit, each backend runs in a child process that is killed once the
+# budget is spent (see extractors.KillableBackend).
+EXTRACT_TIME_BUDGET = float(os.environ.get("QUIZSPARK_EXTRACT_BUDGET") or 0) or None
+
+_pdf_pool = None
+_pdf_pool_workers = 0
+_pdf_pool_lock = threading.Lock()
+
+@timed("extract_text")
+def extract_text(path, pdf_workers=None, max_pages=None, page_range=None, backend=None, time_budget=None):
     """
     Extracts text from .txt, .pdf, .docx files.
     Returns empty string for unsupported, unreadable files or errors.
+    For PDFs, pdf_workers, max_pages, page_range, backend and time_budget
+    choose, limit and parallelise page extraction (see _extract_pdf_text).
     """
     if not os.path.isfile(path):
         return ""
     ext = os.path.splitext(path)[1].lower()
     try:
         if ext == ".pdf":
-            return _extract_pdf_text(path)
+            return _extract_pdf_text(path, path, pdf_workers, max_pages, page_range, backend, time_budget)
         elif ext == ".docx":
             return _extract_docx_text(path)
         elif ext == ".txt":
@@ -27,95 +91,894 @@ def extract_text(path):
             # Unsupported extensions return empty string
             return ""
     except Exception as e:
-        # You can connect this to logging for cleanup
-        print(f"Error extracting text from {path} ({ext}): {e}")
+        logger.warning("Error extracting text from %s (%s): %s", path, ext, e)
         return ""
 
-def _extract_pdf_text(path):
-    text = ""
+# Leading bytes that identify each binary format. PDF headers may be preceded
+# by junk, so the PDF marker is searched for in the first kilobyte.
+PDF_MAGIC = b"%PDF-"
+DOCX_MAGIC = b"PK\x03\x04"
+SNIFF_BYTES = 1024
+
+def sniff_format(head, filename):
+    """
+    Return the extension (".pdf", ".docx", ".txt") that both the filename
+    and the leading bytes agree on, or None if they do not match or the
+    type is unsupported.
+    """
+    ext = os.path.splitext(filename or "")[1].lower()
+    if ext == ".pdf":
+        return ext if PDF_MAGIC in head[:SNIFF_BYTES] else None
+    if ext == ".docx":
+        return ext if head.startswith(DOCX_MAGIC) else None
+    if ext == ".txt":
+        return ext if b"\x00" not in head[:SNIFF_BYTES] else None
+    return None
+
+@timed("extract_text")
+def extract_text_from_stream(stream, filename, max_pages=None, page_range=None, backend=None, time_budget=None):
+    """
+    Extract text from an open binary stream, such as an upload or an
+    in-memory buffer, without writing it to disk. The format comes from
+    sniff_format(); the stream must be seekable.
+    Returns empty string for unsupported, mismatched or unreadable input.
+    """
+    head = stream.read(SNIFF_BYTES)
+    stream.seek(0)
+    ext = sniff_format(head, filename)
     try:
-        with open(path, "rb") as f:
-            reader = PyPDF2.PdfReader(f)
-            for page in reader.pages:
-                try:
-                    page_text = page.extract_text()
-                    if page_text:
-                        text += page_text
-                except Exception as e:
-                    print(f"PDF page extraction error in {path}: {e}")
+        if ext == ".pdf":
+            return _extract_pdf_text(stream, filename, 1, max_pages, page_range, backend, time_budget)
+        elif ext == ".docx":
+            return "\n".join(_docx_paragraphs(stream)).strip()
+        elif ext == ".txt":
+            return stream.read().decode("utf-8", errors="ignore")
+        return ""
     except Exception as e:
-        print(f"PDF file open error: {e}")
+        logger.warning("Error extracting text from upload %s (%s): %s", filename, ext, e)
         return ""
-    return text
+
+def _extract_pdf_text(source, name, workers=None, max_pages=None, page_range=None, backend=None,
+                      time_budget=None):
+    """
+    Extract PDF text page by page and join the pages in order.
+    source is a path or a seekable binary stream. page_range is a (start,
+    stop) pair of 0-based page indices and max_pages caps how many pages are
+    read. With more than one worker, pages of a file on disk are split into
+    contiguous batches and extracted in a shared process pool.
+
+    Installed backends (see extractors.backends_for) are tried fastest
+    first, or backend first when named; if one cannot open the file or
+    finds no text, the next is tried. Once backends have spent time_budget
+    seconds on the document, extraction stops, even in the middle of a
+    page, and keeps the text read so far; budgeted extraction runs one page
+    at a time in a child process rather than on the worker pool.
+    """
+    workers = PDF_WORKERS if workers is None else workers
+    for pdf in _pdf_backends(backend, time_budget):
+        parts = []
+        try:
+            _read_pdf_pages(pdf, source, name, parts, workers, max_pages, page_range)
+        except ExtractionTimeout as e:
+            logger.warning("%s: %s; keeping %d pages read with %s", name, e, len(parts), pdf.name)
+            annotate("extract_truncated", 1)
+            return "".join(parts)
+        except Exception as e:
+            logger.warning("PDF file open error in %s with %s: %s", name, pdf.name, e)
+            continue
+        text = "".join(parts)
+        if text.strip():
+            annotate("pdf_pages", len(parts))
+            return text
+        logger.info("No text found in %s with %s", name, pdf.name)
+    return ""
+
+def _pdf_backends(backend=None, time_budget=None):
+    """
+    Backends to try for a PDF; with a time budget (or EXTRACT_TIME_BUDGET),
+    each runs in a killable child process charged to one shared budget.
+    """
+    budget = TimeBudget(EXTRACT_TIME_BUDGET if time_budget is None else time_budget)
+    for pdf in backends_for(".pdf", backend):
+        yield pdf if budget.budget is None else KillableBackend(pdf, budget)
+
+def _is_path(source):
+    return isinstance(source, (str, os.PathLike))
+
+def _read_pdf_pages(pdf, source, name, parts, workers, max_pages, page_range):
+    # Pages are appended to parts as they are read, so the caller keeps
+    # them when the time budget interrupts.
+    if not _is_path(source):
+        source.seek(0)
+    doc = pdf.open(source)
+    try:
+        indices = _select_pages(pdf.page_count(doc), max_pages, page_range)
+        parallel = (workers > 1 and len(indices) >= PDF_PARALLEL_MIN_PAGES and _is_path(source)
+                    and not isinstance(pdf, KillableBackend))
+        if not parallel:
+            for i in indices:
+                parts.append(_extract_page_text(pdf, doc, i, name))
+    finally:
+        pdf.close(doc)
+    if parallel:
+        _extract_pdf_pages_parallel(source, indices, workers, pdf.name, parts)
+
+def _select_pages(page_count, max_pages=None, page_range=None):
+    start, stop = page_range if page_range else (0, page_count)
+    indices = range(max(start, 0), min(stop, page_count))
+    if max_pages is not None:
+        indices = indices[:max_pages]
+    return indices
+
+def _extract_page_text(pdf, doc, index, name):
+    try:
+        return pdf.page_text(doc, index)
+    except ExtractionTimeout:
+        raise
+    except Exception as e:
+        logger.warning("PDF page extraction error in %s with %s: %s", name, pdf.name, e)
+        return ""
+
+def _extract_pdf_pages(path, indices, backend):
+    # Runs in a worker process: document handles cannot be pickled, so each
+    # worker opens the file itself with the backend the parent chose.
+    pdf = get_backend(".pdf", backend)
+    doc = pdf.open(path)
+    try:
+        return [_extract_page_text(pdf, doc, i, path) for i in indices]
+    finally:
+        pdf.close(doc)
+
+def _get_pdf_pool(workers):
+    global _pdf_pool, _pdf_pool_workers
+    with _pdf_pool_lock:
+        if _pdf_pool is None or _pdf_pool_workers != workers:
+            if _pdf_pool is not None:
+                _pdf_pool.shutdown(wait=False)
+            _pdf_pool = ProcessPoolExecutor(max_workers=workers)
+            _pdf_pool_workers = workers
+        return _pdf_pool
+
+def _extract_pdf_pages_parallel(path, indices, workers, backend, parts):
+    batch_size = -(-len(indices) // workers)
+    batches = [indices[i:i + batch_size] for i in range(0, len(indices), batch_size)]
+    pool = _get_pdf_pool(workers)
+    futures = [pool.submit(_extract_pdf_pages, path, batch, backend) for batch in batches]
+    for batch, future in zip(batches, futures):
+        try:
+            parts.extend(future.result())
+        except Exception as e:
+            logger.warning("PDF batch extraction error in %s: %s", path, e)
+            parts.extend("" for _ in batch)
 
 def _extract_docx_text(path):
     try:
-        doc = Document(path)
-        return "\n".join(p.text for p in doc.paragraphs).strip()
+        return "\n".join(_docx_paragraphs(path)).strip()
     except Exception as e:
-        print(f"DOCX load error: {e}")
+        logger.warning("DOCX load error: %s", e)
         return ""
 
+def _docx_paragraphs(source):
+    """
+    Yield the paragraph texts of a .docx path or stream, at most
+    MAX_DOCX_PARAGRAPHS of them, with the same text python-docx gives for
+    the body's paragraphs. Raises ValueError before parsing when the
+    package unpacks to more than MAX_DOCX_MB; zipfile never reads past a
+    member's declared size, so the check holds for compressed bombs too.
+    word/document.xml is parsed incrementally and dropped paragraph by
+    paragraph, so reading stops at the cap rather than after a full parse.
+    """
+    with zipfile.ZipFile(source) as package:
+        unpacked = sum(info.file_size for info in package.infolist())
+        if unpacked > MAX_DOCX_MB * 1024 * 1024:
+            raise ValueError(f"document unpacks to {unpacked // (1024 * 1024)} MB, over the {MAX_DOCX_MB} MB limit")
+        with package.open("word/document.xml") as xml:
+            depth = read = 0
+            body = None
+            for event, element in iterparse(xml, events=("start", "end")):
+                if event == "start":
+                    depth += 1
+                    if depth == 2 and element.tag == DOCX_NS + "body":
+                        body = element
+                    continue
+                depth -= 1
+                if depth != 2 or body is None:
+                    continue
+                if element.tag == DOCX_NS + "p":
+                    if read == MAX_DOCX_PARAGRAPHS:
+                        logger.warning("Reading only the first %d paragraphs", MAX_DOCX_PARAGRAPHS)
+                        annotate("extract_truncated", 1)
+                        return
+                    read += 1
+                    yield "".join(_docx_run_text(run) for run in element.iterfind(DOCX_NS + "r"))
+                # Paragraphs, tables and section properties already read.
+                del body[:]
+
+def _docx_run_text(run):
+    parts = []
+    for child in run:
+        if child.tag == DOCX_NS + "t":
+            parts.append(child.text or "")
+        elif child.tag == DOCX_NS + "tab":
+            parts.append("\t")
+        elif child.tag in (DOCX_NS + "br", DOCX_NS + "cr"):
+            parts.append("\n")
+    return "".join(parts)
+
+def iter_text(path, max_pages=None, page_range=None, backend=None, time_budget=None):
+    """
+    Lazily yield the text of a .txt, .pdf or .docx file in blocks:
+    PDF pages, DOCX paragraphs, or blank-line separated TXT blocks.
+    Yields nothing for unsupported or unreadable files; stops at the first
+    file-level error, keeping whatever was already yielded.
+    """
+    if not os.path.isfile(path):
+        return
+    ext = os.path.splitext(path)[1].lower()
+    try:
+        if ext == ".pdf":
+            yield from _iter_pdf_pages(path, path, max_pages, page_range, backend, time_budget)
+        elif ext == ".docx":
+            yield from _iter_docx_paragraphs(path)
+        elif ext == ".txt":
+            yield from _iter_txt_blocks(path)
+    except Exception as e:
+        logger.warning("Error iterating text from %s (%s): %s", path, ext, e)
+
+def iter_text_from_stream(stream, filename, max_pages=None, page_range=None, backend=None, time_budget=None):
+    """
+    Same blocks as iter_text(), read from an open binary stream such as an
+    upload. The format comes from sniff_format(); the stream must be seekable.
+    """
+    head = stream.read(SNIFF_BYTES)
+    stream.seek(0)
+    ext = sniff_format(head, filename)
+    try:
+        if ext == ".pdf":
+            yield from _iter_pdf_pages(stream, filename, max_pages, page_range, backend, time_budget)
+        elif ext == ".docx":
+            yield from _iter_docx_paragraphs(stream)
+        elif ext == ".txt":
+            yield from _iter_txt_lines(io.TextIOWrapper(stream, encoding="utf-8", errors="ignore"))
+    except Exception as e:
+        logger.warning("Error iterating text from upload %s (%s): %s", filename, ext, e)
+
+def _iter_pdf_pages(source, name, max_pages=None, page_range=None, backend=None, time_budget=None):
+    """
+    Yield the non-empty pages of a PDF, trying backends as _extract_pdf_text
+    does. Yielded pages cannot be taken back, so the next backend is only
+    tried while nothing has been yielded; the time budget ends the
+    iteration early. Time the consumer spends between pages is not charged
+    to the budget.
+    """
+    for pdf in _pdf_backends(backend, time_budget):
+        if not _is_path(source):
+            source.seek(0)
+        try:
+            doc = pdf.open(source)
+        except ExtractionTimeout as e:
+            logger.warning("%s: %s while opening with %s", name, e, pdf.name)
+            annotate("extract_truncated", 1)
+            return
+        except Exception as e:
+            logger.warning("PDF file open error in %s with %s: %s", name, pdf.name, e)
+            continue
+        yielded = 0
+        try:
+            for i in _select_pages(pdf.page_count(doc), max_pages, page_range):
+                try:
+                    page_text = _extract_page_text(pdf, doc, i, name)
+                except ExtractionTimeout as e:
+                    logger.warning("%s: %s; keeping %d pages read with %s", name, e, yielded, pdf.name)
+                    annotate("extract_truncated", 1)
+                    return
+                if page_text.strip():
+                    yielded += 1
+                    yield page_text
+        finally:
+            pdf.close(doc)
+        if yielded:
+            return
+        logger.info("No text found in %s with %s", name, pdf.name)
+
+def _iter_docx_paragraphs(source):
+    for text in _docx_paragraphs(source):
+        if text:
+            yield text
+
+def _iter_txt_blocks(path):
+    with open(path, encoding="utf-8", errors="ignore") as f:
+        yield from _iter_txt_lines(f)
+
+def _iter_txt_lines(lines):
+    block = []
+    size = 0
+    for line in lines:
+        if not line.strip() or size >= TXT_BLOCK_SIZE:
+            if block:
+                yield "".join(block)
+                block, size = [], 0
+            if not line.strip():
+                continue
+        block.append(line)
+        size += len(line)
+    if block:
+        yield "".join(block)
+
+@dataclass
+class SentenceCandidate:
+    """
+    A sentence from the analysed document with its noun and proper noun tokens.
+    spans holds the [start, end] character offsets of each noun within text,
+    and chunks those of multi-word noun chunks (when the parser ran).
+    """
+    text: str
+    nouns: list
+    spans: list = field(default_factory=list)
+    chunks: list = field(default_factory=list)
+
+    def answer_spans(self, include_chunks=False):
+        """
+        Offsets of the possible answers, in sentence order. Candidates
+        built without offsets fall back to the first whole-word match.
+        """
+        spans = self.spans or _locate(self.text, self.nouns)
+        if include_chunks and self.chunks:
+            return sorted(spans + self.chunks)
+        return spans
+
+
+def _locate(text, words):
+    spans = []
+    for word in words:
+        match = re.search(rf"(?<!\w){re.escape(word)}(?!\w)", text)
+        if match:
+            spans.append([match.start(), match.end()])
+    return spans
+
+
+@dataclass
+class DocumentAnalysis:
+    """
+    Result of parsing a document once: sentences with their nouns,
+    counts of lowercased alphabetic tokens, and per-noun statistics
+    (text -> [count, pos, ent_type]) for the distractor index.
+    Shared by quiz and puzzle generation.
+    """
+    sentences: list = field(default_factory=list)
+    word_counts: Counter = field(default_factory=Counter)
+    tokens: int = 0
+    noun_stats: dict = field(default_factory=dict)
+
+    def extend(self, other):
+        self.sentences.extend(other.sentences)
+        self.word_counts.update(other.word_counts)
+        self.tokens += other.tokens
+        for text, (count, pos, ent_type) in other.noun_stats.items():
+            entry = self.noun_stats.get(text)
+            if entry is None:
+                self.noun_stats[text] = [count, pos, ent_type]
+            else:
+                entry[0] += count
+
+    def to_dict(self):
+        """
+        Plain JSON-serialisable form, used for caching analyses on disk.
+        """
+        return {
+            "sentences": [[s.text, s.nouns, s.spans, s.chunks] for s in self.sentences],
+            "word_counts": dict(self.word_counts),
+            "tokens": self.tokens,
+            "noun_stats": self.noun_stats,
+        }
+
+    @classmethod
+    def from_dict(cls, data):
+        # Entries written before offsets were recorded are [text, nouns].
+        sentences = [SentenceCandidate(*entry) for entry in data.get("sentences", [])]
+        noun_stats = data.get("noun_stats")
+        if noun_stats is None:
+            # Written before noun statistics existed: rebuild them from sentences.
+            noun_stats = {}
+            for sentence in sentences:
+                for noun in sentence.nouns:
+                    noun_stats.setdefault(noun, [0, "NOUN", ""])[0] += 1
+        return cls(sentences, Counter(data.get("word_counts", {})), data.get("tokens", 0),
+                   {text: list(entry) for text, entry in noun_stats.items()})
+
+
+def iter_chunks(text, chunk_size=DEFAULT_CHUNK_SIZE):
+    """
+    Split text, or an iterable of text blocks, into pieces of at most
+    chunk_size characters. Small blocks are packed together; long ones are
+    cut at the last newline or space before the limit.
+    """
+    blocks = [text] if isinstance(text, str) else text
+    pending = []
+    pending_size = 0
+    for block in blocks:
+        if not block:
+            continue
+        if pending and pending_size + len(block) + 1 > chunk_size:
+            yield "\n".join(pending)
+            pending, pending_size = [], 0
+        start = 0
+        while len(block) - start > chunk_size:
+            end = start + chunk_size
+            cut = block.rfind("\n", start, end)
+            if cut <= start:
+                cut = block.rfind(" ", start, end)
+            if cut <= start:
+                cut = end
+            yield block[start:cut]
+            start = cut
+        pending.append(block[start:] if start else block)
+        pending_size += len(block) - start + 1
+    if pending:
+        yield "\n".join(pending)
+
+def _nouns_in(tokens):
+    return [token.text for token in tokens if token.pos_ in ("NOUN", "PROPN")]
+
+def _noun_spans(tokens, offset):
+    return [[token.idx - offset, token.idx - offset + len(token.text)]
+            for token in tokens if token.pos_ in ("NOUN", "PROPN")]
+
+def _chunk_spans(sent, offset):
+    """
+    Multi-word noun chunks of sent without leading determiners and pronouns
+    ("the programming language" -> "programming language").
+    """
+    spans = []
+    for chunk in sent.noun_chunks:
+        start = chunk.start
+        while start < chunk.end and chunk.doc[start].pos_ in CHUNK_SKIP_POS:
+            start += 1
+        if chunk.end - start >= 2 and chunk.doc[chunk.end - 1].pos_ in ("NOUN", "PROPN"):
+            span = chunk.doc[start:chunk.end]
+            spans.append([span.start_char - offset, span.end_char - offset])
+    return spans
+
 def _get_nouns(sentence):
     """
     Extract noun and proper noun tokens from sentence string.
     """
-    doc = nlp(sentence)
-    return [token.text for token in doc if token.pos_ in ("NOUN", "PROPN")]
+    return _nouns_in(get_nlp()(sentence))
 
-def generate_quiz(text, sentence_length=30, max_questions=5, max_options=3, min_nouns=1):
+def _count_nouns(noun_stats, tokens):
+    for token in tokens:
+        if token.pos_ in ("NOUN", "PROPN"):
+            entry = noun_stats.get(token.text)
+            if entry is None:
+                noun_stats[token.text] = [1, token.pos_, token.ent_type_]
+            else:
+                entry[0] += 1
+
+def _analyze_doc(doc):
+    analysis = DocumentAnalysis()
+    has_chunks = doc.has_annotation("DEP")
+    for sent in doc.sents:
+        offset = sent.start_char
+        chunks = _chunk_spans(sent, offset) if has_chunks else []
+        analysis.sentences.append(SentenceCandidate(sent.text, _nouns_in(sent), _noun_spans(sent, offset), chunks))
+        # Chunks get their own distractor bucket, so a multi-word answer
+        # is offered multi-word alternatives.
+        for start, end in chunks:
+            entry = analysis.noun_stats.setdefault(sent.text[start:end], [0, "CHUNK", ""])
+            entry[0] += 1
+    analysis.word_counts.update(token.text.lower() for token in doc if token.is_alpha)
+    analysis.tokens = len(doc)
+    _count_nouns(analysis.noun_stats, doc)
+    return analysis
+
+def iter_analysis(text, chunk_size=DEFAULT_CHUNK_SIZE, batch_size=DEFAULT_BATCH_SIZE, n_process=1):
+    """
+    Yield one DocumentAnalysis per chunk of text. Chunks go through nlp.pipe
+    with unused pipeline components disabled, and Docs are dropped as soon as
+    they are analysed, so memory does not grow with the document.
+    """
+    for doc in _pipe(iter_chunks(text, chunk_size), batch_size, n_process):
+        yield _analyze_doc(doc)
+
+def _pipe(texts, batch_size, n_process, as_tuples=False):
+    nlp = get_nlp()
+    disable = [name for name in PIPELINE_DISABLE if name in nlp.pipe_names]
+    return nlp.pipe(texts, as_tuples=as_tuples, batch_size=batch_size, n_process=n_process, disable=disable)
+
+@timed("analyze_texts")
+def analyze_texts(texts, chunk_size=DEFAULT_CHUNK_SIZE, batch_size=DEFAULT_BATCH_SIZE, n_process=1):
+    """
+    Analyse several documents through a single nlp.pipe stream.
+    Returns one DocumentAnalysis per text, in the same order.
+    """
+    analyses = [DocumentAnalysis() for _ in texts]
+    chunks = ((chunk, i) for i, text in enumerate(texts) for chunk in iter_chunks(text, chunk_size))
+    for doc, i in _pipe(chunks, batch_size, n_process, as_tuples=True):
+        analyses[i].extend(_analyze_doc(doc))
+    return analyses
+
+@timed("analyze_text")
+def analyze_text(text, chunk_size=DEFAULT_CHUNK_SIZE, batch_size=DEFAULT_BATCH_SIZE, n_process=1):
+    """
+    Run the spaCy pipeline over text once and collect everything the
+    quiz and puzzle generators need.
+    """
+    analysis = DocumentAnalysis()
+    for part in iter_analysis(text, chunk_size, batch_size, n_process):
+        analysis.extend(part)
+    if isinstance(text, str):
+        annotate("doc_chars", len(text))
+    annotate("tokens", analysis.tokens)
+    return analysis
+
+@timed("analyze_bounded")
+def analyze_bounded(text, limits=None, rng=None, min_word_length=6, chunk_size=STREAM_CHUNK_SIZE,
+                    batch_size=DEFAULT_BATCH_SIZE):
+    """
+    Resource-governed analyze_text for documents of any size; text may be a
+    string or an iterable of blocks. Reading stops once limits.max_tokens
+    tokens have been parsed or the process has grown by limits.max_memory_mb
+    since this document started, whatever its size was then.
+    Sentences with nouns and distinct words of at least min_word_length
+    letters are kept as uniform reservoir samples, and words are counted in
+    an interned Vocabulary, so memory is bounded by the limits rather than
+    by the document. Returns the DocumentAnalysis and a usage report.
+    """
+    limits = limits or ResourceLimits()
+    rng = rng or random
+    sentences = Reservoir(limits.sentence_sample, rng)
+    words = Reservoir(limits.word_sample, rng)
+    vocab = Vocabulary(limits.max_vocabulary)
+    noun_stats = {}
+    tokens = 0
+    start_mb = peak_mb = rss_mb()
+    stopped = None
+    parts = iter_analysis(text, chunk_size, batch_size)
+    try:
+        for part in parts:
+            tokens += part.tokens
+            for sentence in part.sentences:
+                if sentence.nouns:
+                    # Tagged with its position so the sample keeps document order.
+                    sentences.offer((sentences.seen, sentence))
+            for word, count in part.word_counts.items():
+                new = word not in vocab
+                if vocab.add(word, count) is not None and new and len(word) >= min_word_length:
+                    words.offer(word)
+            for noun, (count, pos, ent_type) in part.noun_stats.items():
+                entry = noun_stats.get(noun)
+                if entry is not None:
+                    entry[0] += count
+                elif len(noun_stats) < limits.max_vocabulary:
+                    noun_stats[noun] = [count, pos, ent_type]
+            current_mb = rss_mb()
+            peak_mb = max(peak_mb or 0, current_mb or 0) or None
+            if tokens >= limits.max_tokens:
+                stopped = "tokens"
+            elif (limits.max_memory_mb and start_mb and current_mb
+                  and current_mb - start_mb > limits.max_memory_mb):
+                stopped = "memory"
+            if stopped:
+                break
+    finally:
+        parts.close()
+    analysis = DocumentAnalysis(
+        [sentence for _, sentence in sorted(sentences.items, key=lambda item: item[0])],
+        Counter({word: vocab.count(word) for word in words.items}), tokens, noun_stats,
+    )
+    report = {
+        "tokens": tokens, "stopped": stopped, "peak_rss_mb": peak_mb,
+        "rss_growth_mb": peak_mb - start_mb if peak_mb and start_mb else None,
+        "sentences_seen": sentences.seen, "sentences_kept": len(sentences),
+        "words_seen": words.seen, "words_kept": len(words),
+        "vocabulary": len(vocab), "vocabulary_full": vocab.full(),
+    }
+    annotate("tokens", tokens)
+    if stopped:
+        logger.warning("Document analysis stopped at %d tokens (%s limit); using what was read", tokens, stopped)
+        annotate("doc_truncated", 1)
+    return analysis, report
+
+def iter_sentences(text):
+    """
+    Rough sentence boundaries from punctuation and blank lines, without
+    spaCy. Periods after common abbreviations and initials do not end a
+    sentence.
+    """
+    start = 0
+    for match in SENTENCE_BREAK_RE.finditer(text):
+        if match.group(1):
+            if _ends_with_abbreviation(text[start:match.start(1)]):
+                continue
+            end = match.end(1)
+        else:
+            end = match.start()
+        sentence = text[start:end].strip()
+        if sentence:
+            yield sentence
+        start = match.end()
+    sentence = text[start:].strip()
+    if sentence:
+        yield sentence
+
+def _ends_with_abbreviation(text):
+    words = text[-12:].split()
+    word = words[-1].lstrip("\"'([").lower() if words else ""
+    return word in ABBREVIATIONS or (len(word) == 1 and word.isalpha())
+
+def _fast_candidates(text, sentence_length, pool_size, index):
+    """
+    Tag only sentences long enough to become questions, pool_size at a time,
+    adding their nouns to index before yielding them.
+    """
+    nlp = get_nlp()
+    disable = [name for name in FAST_DISABLE if name in nlp.pipe_names]
+    eligible = (sentence for sentence in iter_sentences(text) if len(sentence) > sentence_length)
+    while True:
+        batch = list(islice(eligible, pool_size))
+        if not batch:
+            return
+        candidates = []
+        noun_stats = {}
+        for doc in nlp.pipe(batch, disable=disable):
+            candidates.append(SentenceCandidate(doc.text, _nouns_in(doc), _noun_spans(doc, 0)))
+            _count_nouns(noun_stats, doc)
+        index.add(noun_stats)
+        yield from candidates
+
+@timed("generate_quiz")
+def generate_quiz(text, sentence_length=30, max_questions=5, max_options=3, min_nouns=1, rng=None, fast=False,
+                  answer_chunks=False, limits=None):
     """
     Create quiz questions from text by blanking nouns in sentences.
     Only use sentences longer than sentence_length having min_nouns nouns.
-    Randomly sample answer and choices per question.
+    Randomly sample answer and choices per question, using rng (a
+    random.Random) when given for reproducible output.
+    With fast=True, sentences are split with a regex and only the sentences
+    considered for questions are tagged; distractors then come from those
+    sentences rather than the whole document. With answer_chunks, multi-word
+    noun chunks such as "programming language" may also be answers (not
+    available on the fast path, which runs no parser). With limits (a
+    ResourceLimits), the document is analysed by analyze_bounded() and
+    questions come from its sentence sample.
     """
-    doc = nlp(text)
-    sentences = [s.text for s in doc.sents if len(s.text) > sentence_length]
-    quiz = []
+    if fast:
+        index = DistractorIndex()
+        candidates = _fast_candidates(text, sentence_length, max_questions * FAST_POOL_FACTOR, index)
+        return _build_quiz(candidates, sentence_length, max_questions, max_options, min_nouns, index, rng)
+    analysis = analyze_bounded(text, limits, rng)[0] if limits else analyze_text(text)
+    return quiz_from_analysis(analysis, sentence_length, max_questions, max_options, min_nouns,
+                              rng=rng, answer_chunks=answer_chunks)
 
-    for sentence in sentences:
-        nouns = _get_nouns(sentence)
-        if len(nouns) < min_nouns:
-            continue
+@timed("quiz_from_analysis")
+def quiz_from_analysis(analysis, sentence_length=30, max_questions=5, max_options=3, min_nouns=1,
+                       rng=None, answer_chunks=False):
+    """
+    Same as generate_quiz, but reads sentences and nouns from a DocumentAnalysis.
+    Distractors come from a DistractorIndex over the whole document; with a
+    model that has word vectors (en_core_web_md or _lg, not _sm), nouns close
+    in the vectors are preferred.
+    """
+    index = DistractorIndex(analysis.noun_stats, vocab=get_nlp().vocab)
+    return _build_quiz(analysis.sentences, sentence_length, max_questions, max_options, min_nouns, index, rng,
+                       answer_chunks)
 
-        ans = random.choice(nouns)
-        base_options = list(set(nouns))
-        if ans not in base_options:
-            base_options.append(ans)
+@timed("stream_quiz")
+def stream_quiz(text, sentence_length=30, max_questions=5, max_options=3, min_nouns=1,
+                chunk_size=STREAM_CHUNK_SIZE, batch_size=STREAM_BATCH_SIZE, n_process=1, rng=None,
+                answer_chunks=False):
+    """
+    Streaming variant of generate_quiz for large documents. text may be a
+    string or an iterable of blocks such as iter_text(path); it is parsed
+    chunk by chunk and reading stops once max_questions have been built.
+    """
+    parts = iter_analysis(text, chunk_size, batch_size, n_process)
+    index = DistractorIndex()
 
-        filtered_options = [opt for opt in base_options if opt != ans]
-        if filtered_options:
-            sample_options = random.sample(filtered_options, min(max_options, len(filtered_options)))
-        else:
-            sample_options = []
+    def candidates():
+        # Distractors come from every chunk read so far.
+        for part in parts:
+            index.add(part.noun_stats)
+            yield from part.sentences
+
+    try:
+        return _build_quiz(candidates(), sentence_length, max_questions, max_options, min_nouns, index, rng,
+                           answer_chunks)
+    finally:
+        parts.close()
+
+def _build_quiz(candidates, sentence_length, max_questions, max_options, min_nouns, index, rng=None,
+                answer_chunks=False):
+    rng = rng or random
+    quiz = []
 
-        choices = sample_options + [ans]
-        random.shuffle(choices)
+    for candidate in candidates:
+        sentence = candidate.text
+        if len(sentence) <= sentence_length:
+            continue
+        if len(candidate.nouns) < min_nouns:
+            continue
+        spans = candidate.answer_spans(answer_chunks)
+        if not spans:
+            continue
 
-        question = sentence.replace(ans, "_____")
-        quiz.append({"question": question, "choices": choices, "answer": ans})
+        start, end = rng.choice(spans)
+        quiz.append(unpack_question(_make_question(sentence, spans, sentence[start:end], index, max_options, rng)))
 
         if len(quiz) == max_questions:
             break
     return quiz
 
-def generate_puzzles(text, min_word_length=6, max_puzzles=5):
+def _make_question(sentence, spans, ans, index, max_options, rng):
+    """
+    Packed question (see pack_question) blanking ans in sentence.
+    """
+    choices = index.distractors(ans, max_options, rng) + [ans]
+    rng.shuffle(choices)
+
+    # Blank every token occurrence of the answer, by offset, so it is
+    # neither leaked elsewhere in the sentence nor matched inside other
+    # words; overlapping spans (a noun inside a chosen chunk) are skipped.
+    blanks = []
+    for span in spans:
+        if sentence[span[0]:span[1]] == ans and (not blanks or span[0] >= blanks[-1][1]):
+            blanks.append(span)
+    return [sentence, blanks, choices]
+
+@timed("bank_from_analysis")
+def bank_from_analysis(analysis, sentence_length=30, max_options=3, min_nouns=1, min_word_length=6,
+                       rng=None, answer_chunks=False):
+    """
+    Every question and puzzle a DocumentAnalysis can produce, for a question
+    bank: one packed question (see pack_question) per distinct answer of
+    each eligible sentence, and one puzzle per eligible word.
+    Returns (questions, puzzles).
+    """
+    rng = rng or random
+    index = DistractorIndex(analysis.noun_stats, vocab=get_nlp().vocab)
+    questions = []
+    for candidate in analysis.sentences:
+        sentence = candidate.text
+        if len(sentence) <= sentence_length or len(candidate.nouns) < min_nouns:
+            continue
+        spans = candidate.answer_spans(answer_chunks)
+        for ans in dict.fromkeys(sentence[start:end] for start, end in spans):
+            questions.append(_make_question(sentence, spans, ans, index, max_options, rng))
+    words = [word for word in analysis.word_counts if len(word) >= min_word_length]
+    return questions, _build_puzzles(words, len(words), rng)
+
+def pack_question(question):
+    """
+    Compact [sentence, blanks, choices] form of a quiz question, where
+    blanks are the [start, end] offsets of the answer in the sentence.
+    The question text and answer are rebuilt from it by unpack_question().
+    Questions without offsets (built elsewhere) are returned unchanged.
+    """
+    if "blanks" not in question:
+        return question
+    answer, text = question["answer"], question["question"]
+    shift = len(BLANK) - len(answer)
+    parts = []
+    pos = 0
+    for i, (start, _) in enumerate(question["blanks"]):
+        at = start + i * shift
+        parts += [text[pos:at], answer]
+        pos = at + len(BLANK)
+    parts.append(text[pos:])
+    return ["".join(parts), question["blanks"], question["choices"]]
+
+def unpack_question(packed):
+    """
+    Question dict from pack_question() output; dicts are returned as is.
+    """
+    if isinstance(packed, dict):
+        return packed
+    sentence, blanks, choices = packed
+    parts = []
+    pos = 0
+    for start, end in blanks:
+        parts += [sentence[pos:start], BLANK]
+        pos = end
+    parts.append(sentence[pos:])
+    start, end = blanks[0]
+    return {"question": "".join(parts), "choices": choices, "answer": sentence[start:end], "blanks": blanks}
+
+@timed("generate_puzzles")
+def generate_puzzles(text, min_word_length=6, max_puzzles=5, rng=None, fast=False, limits=None):
     """
     Generate word scramble puzzles from words in text.
     Only words with length >= min_word_length considered.
+    With fast=True, words are found with a regex instead of spaCy; with
+    limits, words come from analyze_bounded()'s word sample.
+    """
+    if fast:
+        words = (word.lower() for word in WORD_RE.findall(text) if len(word) >= min_word_length)
+        return _build_puzzles(list(dict.fromkeys(words)), max_puzzles, rng)
+    analysis = analyze_bounded(text, limits, rng, min_word_length)[0] if limits else analyze_text(text)
+    return puzzles_from_analysis(analysis, min_word_length, max_puzzles, rng)
+
+@timed("puzzles_from_analysis")
+def puzzles_from_analysis(analysis, min_word_length=6, max_puzzles=5, rng=None):
+    """
+    Same as generate_puzzles, but reads word counts from a DocumentAnalysis.
     """
-    words = [token.text.lower() for token in nlp(text) if token.is_alpha and len(token.text) >= min_word_length]
-    unique_words = list(set(words))
-    random.shuffle(unique_words)
+    unique_words = [word for word in analysis.word_counts if len(word) >= min_word_length]
+    return _build_puzzles(unique_words, max_puzzles, rng)
+
+@timed("stream_puzzles")
+def stream_puzzles(text, min_word_length=6, max_puzzles=5,
+                   chunk_size=STREAM_CHUNK_SIZE, batch_size=STREAM_BATCH_SIZE, n_process=1, rng=None):
+    """
+    Streaming variant of generate_puzzles for large documents. Accepts the
+    same inputs as stream_quiz; reading stops once
+    PUZZLE_POOL_FACTOR * max_puzzles distinct words have been seen.
+    """
+    pool_size = max_puzzles * PUZZLE_POOL_FACTOR
+    unique_words = {}
+    parts = iter_analysis(text, chunk_size, batch_size, n_process)
+    try:
+        for part in parts:
+            for word in part.word_counts:
+                if len(word) >= min_word_length:
+                    unique_words[word] = None
+            if len(unique_words) >= pool_size:
+                break
+    finally:
+        parts.close()
+    return _build_puzzles(list(unique_words), max_puzzles, rng)
+
+def _build_puzzles(unique_words, max_puzzles, rng=None):
+    rng = rng or random
+    rng.shuffle(unique_words)
     puzzles = []
 
     for word in unique_words[:max_puzzles]:
         if len(word) < 2:
             continue
         try:
-            scrambled = "".join(random.sample(word, len(word)))
+            scrambled = "".join(rng.sample(word, len(word)))
             puzzles.append({"puzzle": f"Unscramble this word: {scrambled}", "answer": word})
         except Exception as e:
-            print(f"Error scrambling word {word}: {e}")
+            logger.warning("Error scrambling word %s: %s", word, e)
             continue
     return puzzles
+
+def derive_seed(doc_hash, salt=""):
+    """
+    Deterministic 48-bit seed from a document hash and an optional salt.
+    The same document and salt always give the same quiz and puzzles.
+    48 bits keeps the seed exact in JSON clients that use doubles.
+    """
+    digest = hashlib.sha256(f"{doc_hash}:{salt}".encode("utf-8")).digest()
+    return int.from_bytes(digest[:6], "big")
+
+def generate_from_seed(analysis, seed, quiz_params=None, puzzle_params=None):
+    """
+    Build the quiz and puzzles for a DocumentAnalysis from a seed alone.
+    Each generator gets its own random.Random, so calls are reproducible
+    and safe to run concurrently; storing (document, seed, params) is
+    enough to rebuild the exact same quiz later.
+    """
+    quiz = quiz_from_analysis(analysis, **(quiz_params or {}), rng=random.Random(f"{seed}:quiz"))
+    puzzles = puzzles_from_analysis(analysis, **(puzzle_params or {}), rng=random.Random(f"{seed}:puzzles"))
+    return {"quiz": quiz, "puzzles": puzzles, "seed": seed}
+
+def stream_from_seed(open_blocks, seed, quiz_params=None, puzzle_params=None):
+    """
+    Same as generate_from_seed, but reads the document as it goes instead of
+    from a finished analysis: open_blocks() returns a fresh iterable of its
+    blocks (such as iter_text(path)) and is called once for the quiz and
+    once for the puzzles, each of which stops reading as soon as it has
+    enough material. Reproducible from the seed as well, though it does not
+    give the same quiz as generate_from_seed.
+    """
+    quiz = stream_quiz(open_blocks(), **(quiz_params or {}), rng=random.Random(f"{seed}:quiz"))
+    puzzles = stream_puzzles(open_blocks(), **(puzzle_params or {}), rng=random.Random(f"{seed}:puzzles"))
+    return {"quiz": quiz, "puzzles": puzzles, "seed": seed, "streamed": True}
+
+def __getattr__(name):
+    # text_utils.nlp used to be loaded at import time; keep it reachable
+    # without paying for the load until something actually asks for it.
+    if name == "nlp":
+        return get_nlp()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
@@ -0,0 +1,180 @@
+"""
+Load test comparing the sync (Flask development server) and async (ASGI)
+serving modes under concurrent uploads.
+
+    python benchmarks/bench_concurrency.py --modes sync async --clients 1 8 32
+
+For each mode a server is started in a subprocess. Every client uploads a
+distinct document and polls its quiz page until the quiz is rendered, while
+a probe requests the home page every 50 ms to measure how responsive the
+server stays for cheap requests. Reports completed quizzes per second,
+end-to-end latency percentiles, 503 rejections and probe latency.
+The async mode runs analysis in worker processes, its default, and needs
+uvicorn installed.
+"""
+import argparse
+import http.cookiejar
+import json
+import os
+import socket
+import statistics
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import urllib.error
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+from bench_pipeline import make_pages, percentile  # noqa: E402
+
+BACKEND = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "backend")
+BOUNDARY = "quizsparkbench"
+PAGES_PER_DOCUMENT = 5
+
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def start_server(mode, port, workers, cwd):
+    env = dict(os.environ, PYTHONPATH=os.pathsep.join(filter(None, [BACKEND, os.environ.get("PYTHONPATH")])),
+               QUIZSPARK_JOB_WORKERS=str(workers), QUIZSPARK_PRELOAD_MODEL="1")
+    if mode == "sync":
+        command = [sys.executable, "-c",
+                   f"import app; app.app.run(host='127.0.0.1', port={port}, threaded=True)"]
+    else:
+        command = [sys.executable, "-m", "uvicorn", "asgi:application", "--host", "127.0.0.1",
+                   "--port", str(port), "--log-level", "warning"]
+    server = subprocess.Popen(command, cwd=cwd, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    deadline = time.time() + 60
+    while time.time() < deadline:
+        try:
+            urllib.request.urlopen(f"http://127.0.0.1:{port}/", timeout=1).read()
+            return server
+        except OSError:
+            if server.poll() is not None:
+                raise RuntimeError(f"{mode} server exited with status {server.returncode}")
+            time.sleep(0.2)
+    server.kill()
+    raise RuntimeError(f"{mode} server did not start")
+
+
+def multipart(filename, content):
+    return (
+        f"--{BOUNDARY}\r\n"
+        f'Content-Disposition: form-data; name="file"; filename="{filename}"\r\n'
+        "Content-Type: text/plain\r\n\r\n"
+    ).encode() + content + f"\r\n--{BOUNDARY}--\r\n".encode()
+
+
+def run_client(base, document, timeout):
+    """
+    Upload one document and poll until its quiz page is rendered.
+    Returns ("ok" | "rejected" | "error", seconds).
+    """
+    opener = urllib.request.build_opener(urllib.request.HTTPCookieProcessor(http.cookiejar.CookieJar()))
+    start = time.perf_counter()
+    request = urllib.request.Request(
+        f"{base}/upload", data=multipart("bench.txt", document),
+        headers={"Content-Type": f"multipart/form-data; boundary={BOUNDARY}"},
+    )
+    try:
+        # The redirect to /quiz/<job_id> is followed automatically.
+        with opener.open(request, timeout=timeout) as response:
+            page, url = response.read(), response.geturl()
+        while b"Submit Answers" not in page:
+            if time.perf_counter() - start > timeout:
+                return "error", time.perf_counter() - start
+            time.sleep(0.2)
+            with opener.open(url, timeout=timeout) as response:
+                page = response.read()
+    except urllib.error.HTTPError as e:
+        return ("rejected" if e.code == 503 else "error"), time.perf_counter() - start
+    except OSError:
+        return "error", time.perf_counter() - start
+    return "ok", time.perf_counter() - start
+
+
+def probe(base, stop, samples):
+    while not stop.is_set():
+        start = time.perf_counter()
+        try:
+            urllib.request.urlopen(f"{base}/", timeout=30).read()
+            samples.append(time.perf_counter() - start)
+        except OSError:
+            pass
+        stop.wait(0.05)
+
+
+def load(base, clients, requests_per_client, timeout):
+    # Documents distinct in every page, so neither the analysis cache nor the
+    # per-page block cache short-circuits the work.
+    documents = ["\n\n".join(make_pages(PAGES_PER_DOCUMENT, seed=i)).encode()
+                 for i in range(clients * requests_per_client)]
+    stop = threading.Event()
+    probe_samples = []
+    prober = threading.Thread(target=probe, args=(base, stop, probe_samples), daemon=True)
+    prober.start()
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=clients) as pool:
+        outcomes = list(pool.map(lambda d: run_client(base, d, timeout), documents))
+    elapsed = time.perf_counter() - start
+    stop.set()
+    prober.join()
+    latencies = [seconds for status, seconds in outcomes if status == "ok"]
+    return {
+        "clients": clients,
+        "requests": len(documents),
+        "completed": len(latencies),
+        "rejected": sum(1 for status, _ in outcomes if status == "rejected"),
+        "errors": sum(1 for status, _ in outcomes if status == "error"),
+        "quizzes_per_s": len(latencies) / elapsed if elapsed else None,
+        "p50_s": statistics.median(latencies) if latencies else None,
+        "p90_s": percentile(latencies, 90) if latencies else None,
+        "probe_p50_ms": statistics.median(probe_samples) * 1000 if probe_samples else None,
+        "probe_p99_ms": percentile(probe_samples, 99) * 1000 if probe_samples else None,
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="QuizSpark concurrent load test")
+    parser.add_argument("--modes", nargs="+", default=["sync", "async"], choices=["sync", "async"])
+    parser.add_argument("--clients", type=int, nargs="+", default=[1, 8, 32], help="concurrency levels")
+    parser.add_argument("--requests-per-client", type=int, default=2)
+    parser.add_argument("--workers", type=int, default=os.cpu_count(), help="job workers per server")
+    parser.add_argument("--timeout", type=float, default=120.0, help="seconds before a client gives up")
+    parser.add_argument("--json", dest="json_path", help="write results to this file")
+    args = parser.parse_args(argv)
+
+    results = {"meta": {"workers": args.workers, "pages_per_document": PAGES_PER_DOCUMENT}, "results": {}}
+    for mode in args.modes:
+        with tempfile.TemporaryDirectory() as cwd:  # app creates uploads/ in its cwd
+            port = free_port()
+            server = start_server(mode, port, args.workers, cwd)
+            try:
+                for clients in args.clients:
+                    print(f"{mode}: {clients} clients ...", file=sys.stderr)
+                    stats = load(f"http://127.0.0.1:{port}", clients, args.requests_per_client, args.timeout)
+                    results["results"][f"{mode}/{clients}"] = stats
+                    print(f"{mode:5s} {clients:4d} clients  {stats['quizzes_per_s'] or 0:7.2f} quizzes/s  "
+                          f"p50 {stats['p50_s'] or 0:6.2f}s  probe p99 {stats['probe_p99_ms'] or 0:8.1f} ms  "
+                          f"rejected {stats['rejected']}  errors {stats['errors']}", file=sys.stderr)
+            finally:
+                server.terminate()
+                server.wait(timeout=30)
+    output = json.dumps(results, indent=2)
+    if args.json_path:
+        with open(args.json_path, "w") as f:
+            f.write(output)
+    else:
+        print(output)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,88 @@
+"""
+Compare the installed PDF extraction backends on the same documents.
+
+    python benchmarks/bench_extractors.py --sizes 10 100 500
+    python benchmarks/bench_extractors.py --file lecture.pdf --backends pymupdf pypdf2
+
+For each document and backend, reports the p50 extraction time, pages per
+second, extracted characters, and how closely the text matches the first
+backend's (word-set Jaccard), so a faster backend that loses text shows up.
+"""
+import argparse
+import json
+import os
+import statistics
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "backend"))
+from bench_pipeline import write_corpus  # noqa: E402
+
+DEFAULT_SIZES = [10, 100, 500]
+
+
+def bench_backend(path, backend, repeat):
+    from extractors import get_backend
+    from text_utils import extract_text
+
+    pdf = get_backend(".pdf", backend)
+    doc = pdf.open(path)
+    pages = pdf.page_count(doc)
+    pdf.close(doc)
+    samples = []
+    text = ""
+    for _ in range(repeat):
+        start = time.perf_counter()
+        text = extract_text(path, pdf_workers=1, backend=backend)
+        samples.append(time.perf_counter() - start)
+    p50 = statistics.median(samples)
+    return text, {"pages": pages, "p50_s": p50, "pages_per_s": pages / p50 if p50 else None, "chars": len(text)}
+
+
+def jaccard(a, b):
+    a, b = set(a.split()), set(b.split())
+    return len(a & b) / len(a | b) if a | b else 1.0
+
+
+def main(argv=None):
+    from extractors import backends_for
+
+    installed = [b.name for b in backends_for(".pdf")]
+    parser = argparse.ArgumentParser(description="QuizSpark PDF backend comparison")
+    parser.add_argument("--sizes", type=int, nargs="+", default=DEFAULT_SIZES, help="synthetic sizes in pages")
+    parser.add_argument("--file", action="append", default=[], help="benchmark a real PDF instead")
+    parser.add_argument("--backends", nargs="+", default=installed, choices=installed)
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--json", dest="json_path", help="write results to this file")
+    args = parser.parse_args(argv)
+
+    results = {}
+    with tempfile.TemporaryDirectory() as directory:
+        if args.file:
+            inputs = {os.path.basename(path): path for path in args.file}
+        else:
+            inputs = {f"synthetic/{pages}": write_corpus(directory, "pdf", pages) for pages in args.sizes}
+        for name, path in inputs.items():
+            reference = None
+            for backend in args.backends:
+                print(f"{name} with {backend} ...", file=sys.stderr)
+                text, stats = bench_backend(path, backend, args.repeat)
+                reference = text if reference is None else reference
+                stats["word_jaccard"] = jaccard(reference, text)
+                results[f"{name}/{backend}"] = stats
+                print(f"{name:20s} {backend:8s} {stats['pages_per_s'] or 0:9.1f} pages/s  "
+                      f"p50 {stats['p50_s']:7.3f}s  chars {stats['chars']:9d}  "
+                      f"Jaccard {stats['word_jaccard']:.3f}", file=sys.stderr)
+    output = json.dumps({"repeat": args.repeat, "backends": args.backends, "results": results}, indent=2)
+    if args.json_path:
+        with open(args.json_path, "w") as f:
+            f.write(output)
+    else:
+        print(output)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
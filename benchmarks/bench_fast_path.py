@@ -0,0 +1,111 @@
+"""
+Compare the rule-based fast path (fast=True) with the full spaCy pipeline
+for quiz and puzzle generation.
+
+    python benchmarks/bench_fast_path.py --sizes 1 10 100
+    python benchmarks/bench_fast_path.py --file lecture.pdf
+
+Speed is the p50 of generate_quiz / generate_puzzles in each mode. Quality
+is measured against the full pipeline: precision, recall and F1 of the
+regex sentence boundaries against spaCy's sentences, Jaccard overlap of the
+puzzle word pools, and the share of fast-path quiz answers that the full
+pipeline also tags as nouns.
+"""
+import argparse
+import json
+import os
+import statistics
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "backend"))
+from bench_pipeline import make_pages  # noqa: E402
+
+DEFAULT_SIZES = [1, 10, 100]
+
+
+def p50(fn, repeat):
+    samples = []
+    result = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = fn()
+        samples.append(time.perf_counter() - start)
+    return result, statistics.median(samples)
+
+
+def quality(text, min_word_length=6):
+    from text_utils import WORD_RE, analyze_text, generate_quiz, iter_sentences
+
+    analysis = analyze_text(text)
+    full_sentences = {s.text.strip() for s in analysis.sentences if s.text.strip()}
+    fast_sentences = set(iter_sentences(text))
+    matched = len(full_sentences & fast_sentences)
+    precision = matched / len(fast_sentences) if fast_sentences else 0.0
+    recall = matched / len(full_sentences) if full_sentences else 0.0
+
+    full_words = {w for w in analysis.word_counts if len(w) >= min_word_length}
+    fast_words = {w.lower() for w in WORD_RE.findall(text) if len(w) >= min_word_length}
+    union = full_words | fast_words
+
+    nouns = set(analysis.noun_stats)
+    answers = [q["answer"] for q in generate_quiz(text, max_questions=20, fast=True)]
+    return {
+        "sentence_precision": precision,
+        "sentence_recall": recall,
+        "sentence_f1": 2 * precision * recall / (precision + recall) if precision + recall else 0.0,
+        "puzzle_word_jaccard": len(full_words & fast_words) / len(union) if union else 1.0,
+        "quiz_answer_noun_rate": sum(a in nouns for a in answers) / len(answers) if answers else None,
+    }
+
+
+def bench_text(text, repeat):
+    from text_utils import generate_puzzles, generate_quiz
+
+    stats = {"chars": len(text)}
+    for fast in (False, True):
+        mode = "fast" if fast else "full"
+        quiz, stats[f"{mode}_quiz_s"] = p50(lambda: generate_quiz(text, fast=fast), repeat)
+        _, stats[f"{mode}_puzzles_s"] = p50(lambda: generate_puzzles(text, fast=fast), repeat)
+        stats[f"{mode}_questions"] = len(quiz)
+    stats["quiz_speedup"] = stats["full_quiz_s"] / stats["fast_quiz_s"] if stats["fast_quiz_s"] else None
+    stats["puzzle_speedup"] = stats["full_puzzles_s"] / stats["fast_puzzles_s"] if stats["fast_puzzles_s"] else None
+    stats.update(quality(text))
+    return stats
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="QuizSpark fast path vs full pipeline")
+    parser.add_argument("--sizes", type=int, nargs="+", default=DEFAULT_SIZES, help="synthetic sizes in pages")
+    parser.add_argument("--file", action="append", default=[], help="benchmark a real document instead")
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--json", dest="json_path", help="write results to this file")
+    args = parser.parse_args(argv)
+
+    from nlp_models import preload
+    from text_utils import extract_text
+    preload()
+    if args.file:
+        inputs = {os.path.basename(path): extract_text(path) for path in args.file}
+    else:
+        inputs = {f"synthetic/{pages}": "\n\n".join(make_pages(pages)) for pages in args.sizes}
+
+    results = {}
+    for name, text in inputs.items():
+        print(f"benchmarking {name} ...", file=sys.stderr)
+        stats = results[name] = bench_text(text, args.repeat)
+        print(f"{name:20s} quiz x{stats['quiz_speedup'] or 0:6.1f}  puzzles x{stats['puzzle_speedup'] or 0:7.1f}  "
+              f"sentence F1 {stats['sentence_f1']:.3f}  word Jaccard {stats['puzzle_word_jaccard']:.3f}",
+              file=sys.stderr)
+    output = json.dumps({"repeat": args.repeat, "results": results}, indent=2)
+    if args.json_path:
+        with open(args.json_path, "w") as f:
+            f.write(output)
+    else:
+        print(output)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,81 @@
+"""
+Compare batch grading with the per-user grading loop.
+
+Builds a synthetic quiz and N random submissions, then times grading all
+of them with grade_quiz/grade_puzzles one user at a time versus a single
+grade_quiz_batch/grade_puzzles_batch call.
+
+Usage: python benchmarks/bench_grading.py [--questions 20] [--submissions 1000 10000] [--json out.json]
+"""
+import argparse
+import json
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "backend"))
+
+from grading import grade_quiz, grade_puzzles, grade_quiz_batch, grade_puzzles_batch  # noqa: E402
+
+SEED = 1234
+
+
+def make_quiz(questions, rng):
+    quiz = []
+    for i in range(questions):
+        choices = [f"option{i}_{j}" for j in range(4)]
+        quiz.append({"question": f"Question {i} _____.", "choices": choices, "answer": rng.choice(choices)})
+    puzzles = [{"puzzle": "Unscramble this word: ...", "answer": f"answer{i}"} for i in range(questions)]
+    return quiz, puzzles
+
+
+def make_submissions(quiz, puzzles, count, rng):
+    quiz_answers = [{f"q{i}": rng.choice(q["choices"]) for i, q in enumerate(quiz)} for _ in range(count)]
+    puzzle_answers = [
+        {f"p{i}": p["answer"].upper() if rng.random() < 0.5 else "wrong" for i, p in enumerate(puzzles)}
+        for _ in range(count)
+    ]
+    return quiz_answers, puzzle_answers
+
+
+def best_of(fn, repeat=3):
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        timings.append(time.perf_counter() - start)
+    return min(timings)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Batch vs per-user grading benchmark")
+    parser.add_argument("--questions", type=int, default=20)
+    parser.add_argument("--submissions", type=int, nargs="+", default=[100, 1000, 10000])
+    parser.add_argument("--json", dest="json_path")
+    args = parser.parse_args(argv)
+
+    rng = random.Random(SEED)
+    quiz, puzzles = make_quiz(args.questions, rng)
+    results = {}
+    for count in args.submissions:
+        quiz_answers, puzzle_answers = make_submissions(quiz, puzzles, count, rng)
+        row = {
+            "quiz_loop_s": best_of(lambda: [grade_quiz(quiz, a) for a in quiz_answers]),
+            "quiz_batch_s": best_of(lambda: grade_quiz_batch(quiz, quiz_answers)),
+            "puzzles_loop_s": best_of(lambda: [grade_puzzles(puzzles, a) for a in puzzle_answers]),
+            "puzzles_batch_s": best_of(lambda: grade_puzzles_batch(puzzles, puzzle_answers)),
+        }
+        results[str(count)] = row
+        print(f"{count:6d} submissions: quiz loop {row['quiz_loop_s'] * 1000:8.1f} ms, "
+              f"batch {row['quiz_batch_s'] * 1000:8.1f} ms | puzzles loop {row['puzzles_loop_s'] * 1000:8.1f} ms, "
+              f"batch {row['puzzles_batch_s'] * 1000:8.1f} ms")
+
+    if args.json_path:
+        with open(args.json_path, "w") as f:
+            json.dump({"questions": args.questions, "results": results}, f, indent=2)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,88 @@
+"""
+Peak memory of full vs resource-governed (analyze_bounded) analysis.
+
+    python benchmarks/bench_memory.py --sizes 100 1000 5000
+    python benchmarks/bench_memory.py --max-tokens 200000 --sentence-sample 1000
+
+Each run happens in a fresh subprocess, so the peak RSS it reports belongs
+to that run alone. Also reports the peak of Python allocations (tracemalloc),
+wall time, tokens read and how many sentences and words were kept.
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+BACKEND = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "backend")
+
+DEFAULT_SIZES = [100, 1000, 5000]
+
+RUNNER = """
+import json, resource, sys, time, tracemalloc
+sys.path[:0] = {paths!r}
+from bench_pipeline import make_pages
+from limits import ResourceLimits
+from nlp_models import preload
+from text_utils import analyze_bounded, analyze_text
+preload()
+pages = make_pages({pages})
+tracemalloc.start()
+start = time.perf_counter()
+if {bounded!r}:
+    analysis, report = analyze_bounded(pages, ResourceLimits(**{limits!r}))
+else:
+    analysis = analyze_text("\\n\\n".join(pages))
+    report = {{}}
+seconds = time.perf_counter() - start
+print(json.dumps({{
+    "seconds": seconds,
+    "python_peak_mb": tracemalloc.get_traced_memory()[1] / 2**20,
+    "peak_rss_mb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024,
+    "tokens": analysis.tokens,
+    "sentences": len(analysis.sentences),
+    "words": len(analysis.word_counts),
+    "stopped": report.get("stopped"),
+}}))
+"""
+
+
+def run(pages, bounded, limits):
+    paths = [os.path.dirname(os.path.abspath(__file__)), BACKEND]
+    code = RUNNER.format(paths=paths, pages=pages, bounded=bounded, limits=limits)
+    output = subprocess.run([sys.executable, "-c", code], check=True, capture_output=True, text=True).stdout
+    return json.loads(output.strip().splitlines()[-1])
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="QuizSpark analysis memory benchmark")
+    parser.add_argument("--sizes", type=int, nargs="+", default=DEFAULT_SIZES, help="synthetic sizes in pages")
+    parser.add_argument("--max-tokens", type=int, default=None)
+    parser.add_argument("--sentence-sample", type=int, default=None)
+    parser.add_argument("--word-sample", type=int, default=None)
+    parser.add_argument("--json", dest="json_path", help="write results to this file")
+    args = parser.parse_args(argv)
+
+    limits = {name: value for name, value in (("max_tokens", args.max_tokens),
+                                               ("sentence_sample", args.sentence_sample),
+                                               ("word_sample", args.word_sample)) if value is not None}
+    results = {}
+    for pages in args.sizes:
+        for mode in ("full", "bounded"):
+            print(f"{pages} pages, {mode} ...", file=sys.stderr)
+            stats = results[f"{pages}/{mode}"] = run(pages, mode == "bounded", limits)
+            print(f"{pages:6d} pages {mode:8s} {stats['seconds']:8.2f}s  python peak {stats['python_peak_mb']:8.1f} MB  "
+                  f"rss {stats['peak_rss_mb']:8.1f} MB  sentences {stats['sentences']:7d}  "
+                  f"stopped {stats['stopped']}", file=sys.stderr)
+    output = json.dumps({"limits": limits, "results": results}, indent=2)
+    if args.json_path:
+        with open(args.json_path, "w") as f:
+            f.write(output)
+    else:
+        print(output)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
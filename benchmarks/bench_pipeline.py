@@ -0,0 +1,226 @@
+"""
+Benchmark harness for QuizSpark's extraction, generation and grading paths.
+
+Builds synthetic TXT/DOCX/PDF corpora of increasing size, times each stage
+several times and records latency percentiles, peak traced memory and
+throughput. Results are written as JSON so two runs can be compared:
+
+    python benchmarks/bench_pipeline.py --sizes 1 10 100 --json new.json
+    python benchmarks/bench_pipeline.py --compare old.json new.json
+
+--compare exits with status 1 when any stage's p50 regressed by more than
+--threshold percent.
+"""
+import argparse
+import io
+import json
+import os
+import platform
+import random
+import resource
+import statistics
+import sys
+import tempfile
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "backend"))
+
+DEFAULT_SIZES = [1, 10, 50, 100, 500]
+DEFAULT_FORMATS = ["txt", "docx", "pdf"]
+WORDS_PER_PAGE = 300
+SEED = 1234
+
+NOUNS = ("algorithm database network protocol compiler variable function teacher student library "
+         "chapter equation molecule reaction planet history economy language document computer "
+         "system process memory theorem experiment hypothesis population government literature").split()
+VERBS = "explains describes contains requires produces measures supports changes improves defines".split()
+ADJECTIVES = "important complex simple modern efficient accurate general specific practical careful".split()
+
+
+def make_sentence(rng):
+    return (f"The {rng.choice(ADJECTIVES)} {rng.choice(NOUNS)} {rng.choice(VERBS)} "
+            f"the {rng.choice(NOUNS)} of every {rng.choice(ADJECTIVES)} {rng.choice(NOUNS)} "
+            f"in the {rng.choice(NOUNS)}.")
+
+
+def make_pages(pages, seed=SEED):
+    """
+    Deterministic synthetic document: a list of page strings.
+    """
+    rng = random.Random(seed)
+    result = []
+    for _ in range(pages):
+        sentences = []
+        words = 0
+        while words < WORDS_PER_PAGE:
+            sentence = make_sentence(rng)
+            sentences.append(sentence)
+            words += sentence.count(" ") + 1
+        result.append(" ".join(sentences))
+    return result
+
+
+def write_corpus(directory, fmt, pages):
+    path = os.path.join(directory, f"corpus_{pages}.{fmt}")
+    content = make_pages(pages)
+    if fmt == "txt":
+        with open(path, "w", encoding="utf-8") as f:
+            f.write("\n\n".join(content))
+    elif fmt == "docx":
+        from docx import Document
+        doc = Document()
+        for page in content:
+            doc.add_paragraph(page)
+        doc.save(path)
+    elif fmt == "pdf":
+        from fpdf import FPDF
+        pdf = FPDF()
+        pdf.set_font("Arial", size=10)
+        for page in content:
+            pdf.add_page()
+            pdf.multi_cell(0, 5, page)
+        pdf.output(path)
+    return path
+
+
+def percentile(samples, pct):
+    ordered = sorted(samples)
+    index = min(len(ordered) - 1, max(0, round(pct / 100 * (len(ordered) - 1))))
+    return ordered[index]
+
+
+def measure(fn, repeat, units):
+    """
+    Run fn repeat times and once more under tracemalloc.
+    units is the amount of work per call (pages) used for throughput.
+    """
+    samples = []
+    result = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = fn()
+        samples.append(time.perf_counter() - start)
+    tracemalloc.start()
+    fn()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    p50 = statistics.median(samples)
+    return result, {
+        "p50_s": p50,
+        "p90_s": percentile(samples, 90),
+        "p99_s": percentile(samples, 99),
+        "mean_s": statistics.mean(samples),
+        "peak_traced_mb": peak / (1024 * 1024),
+        "pages_per_s": units / p50 if p50 else None,
+    }
+
+
+def bench_document(path, pages, repeat):
+    import app as quiz_app
+    from grading import grade_quiz
+    from text_utils import extract_text, generate_quiz, generate_puzzles
+
+    stages = {}
+    text, stages["extract_text"] = measure(lambda: extract_text(path), repeat, pages)
+    quiz, stages["generate_quiz"] = measure(lambda: generate_quiz(text), repeat, pages)
+    _, stages["generate_puzzles"] = measure(lambda: generate_puzzles(text), repeat, pages)
+    answers = {f"q{i}": q["answer"] for i, q in enumerate(quiz)}
+    _, stages["grade_quiz"] = measure(lambda: grade_quiz(quiz, answers), repeat, pages)
+    _, stages["route_upload_to_quiz"] = measure(lambda: _upload_round_trip(quiz_app, path), repeat, pages)
+    stages["_meta"] = {"chars": len(text)}
+    return stages
+
+
+def _upload_round_trip(quiz_app, path):
+    # Clear the caches and banks so every run pays for extraction, parsing
+    # and building the question bank.
+    quiz_app.analysis_cache.clear()
+    quiz_app.block_cache.clear()
+    quiz_app.question_banks.clear()
+    client = quiz_app.app.test_client()
+    with open(path, "rb") as f:
+        data = f.read()
+    response = client.post("/upload?format=json", content_type="multipart/form-data",
+                           data={"file": (io.BytesIO(data), os.path.basename(path))})
+    job_id = response.get_json()["job_id"]
+    while client.get(f"/jobs/{job_id}").get_json()["status"] not in ("done", "failed"):
+        time.sleep(0.005)
+    client.get(f"/quiz/{job_id}")
+    client.post("/submit", data={})
+    client.post("/check_puzzles", data={})
+
+
+def run(sizes, formats, repeat):
+    from nlp_models import preload
+    preload()
+    results = {
+        "meta": {
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "repeat": repeat,
+            "words_per_page": WORDS_PER_PAGE,
+        },
+        "results": {},
+    }
+    with tempfile.TemporaryDirectory() as directory:
+        cwd = os.getcwd()
+        os.chdir(directory)  # app writes uploads/ relative to the cwd
+        try:
+            for fmt in formats:
+                for pages in sizes:
+                    path = write_corpus(directory, fmt, pages)
+                    key = f"{fmt}/{pages}"
+                    print(f"benchmarking {key} ...", file=sys.stderr)
+                    results["results"][key] = bench_document(path, pages, repeat)
+        finally:
+            os.chdir(cwd)
+    results["meta"]["max_rss_mb"] = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+    return results
+
+
+def compare(old_path, new_path, threshold):
+    with open(old_path) as f:
+        old = json.load(f)["results"]
+    with open(new_path) as f:
+        new = json.load(f)["results"]
+    regressions = []
+    for key in sorted(set(old) & set(new)):
+        for stage, stats in new[key].items():
+            before = old[key].get(stage, {}).get("p50_s")
+            if stage.startswith("_") or not before:
+                continue
+            change = (stats["p50_s"] - before) / before * 100
+            flag = "REGRESSION" if change > threshold else ""
+            print(f"{key:12s} {stage:22s} {before * 1000:10.2f} ms -> {stats['p50_s'] * 1000:10.2f} ms "
+                  f"{change:+7.1f}% {flag}")
+            if flag:
+                regressions.append((key, stage))
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="QuizSpark pipeline benchmarks")
+    parser.add_argument("--sizes", type=int, nargs="+", default=DEFAULT_SIZES, help="document sizes in pages")
+    parser.add_argument("--formats", nargs="+", default=DEFAULT_FORMATS, choices=DEFAULT_FORMATS)
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--json", dest="json_path", help="write results to this file")
+    parser.add_argument("--compare", nargs=2, metavar=("OLD", "NEW"), help="compare two result files")
+    parser.add_argument("--threshold", type=float, default=10.0, help="regression threshold in percent")
+    args = parser.parse_args(argv)
+
+    if args.compare:
+        return 1 if compare(*args.compare, args.threshold) else 0
+
+    results = run(args.sizes, args.formats, args.repeat)
+    output = json.dumps(results, indent=2)
+    if args.json_path:
+        with open(args.json_path, "w") as f:
+            f.write(output)
+    else:
+        print(output)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,66 @@
+"""
+Import-time benchmark for QuizSpark's backend modules.
+
+Each measurement runs in a fresh interpreter so module caches do not leak
+between runs. Compares importing text_utils/app (lazy model) against the
+old eager behaviour of loading the spaCy model at import, and reports the
+cost of the first get_nlp() call separately.
+
+Usage: python benchmarks/bench_startup.py [--repeat 5] [--json out.json]
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+
+BACKEND = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "backend")
+
+SNIPPETS = {
+    "import_text_utils": "import text_utils",
+    "import_app": "import app",
+    "eager_model_load": "import spacy; spacy.load('en_core_web_sm')",
+    "first_get_nlp": "import nlp_models; nlp_models.get_nlp()",
+}
+
+
+def time_snippet(code):
+    timed = (
+        "import time; _t = time.perf_counter()\n"
+        f"{code}\n"
+        "print(time.perf_counter() - _t)"
+    )
+    env = dict(os.environ, PYTHONPATH=os.pathsep.join(filter(None, [BACKEND, os.environ.get("PYTHONPATH")])))
+    # Run from a scratch directory: importing app creates uploads/ in the cwd.
+    with tempfile.TemporaryDirectory() as cwd:
+        out = subprocess.run([sys.executable, "-c", timed], cwd=cwd, env=env,
+                             capture_output=True, text=True, check=True)
+    return float(out.stdout.strip().splitlines()[-1])
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--json", dest="json_path")
+    args = parser.parse_args(argv)
+
+    results = {}
+    for name, code in SNIPPETS.items():
+        samples = [time_snippet(code) for _ in range(args.repeat)]
+        results[name] = {
+            "median_s": statistics.median(samples),
+            "min_s": min(samples),
+            "max_s": max(samples),
+        }
+        print(f"{name:20s} median {results[name]['median_s'] * 1000:8.1f} ms")
+
+    if args.json_path:
+        with open(args.json_path, "w") as f:
+            json.dump(results, f, indent=2)
+    return results
+
+
+if __name__ == "__main__":
+    main()